@@ -0,0 +1,50 @@
+"""Cold start benchmark: `import nomad` and `nomad.Nomad()` in fresh interpreters.
+
+Usage:
+    python benchmarks/import_time.py [runs]
+
+The "all endpoints" scenario touches every endpoint property, which is what
+`nomad.Nomad()` used to do eagerly before endpoints were created lazily.
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+SCENARIOS = {
+    "import nomad": "import nomad",
+    "import + Nomad()": "import nomad; n = nomad.Nomad()",
+    "import + Nomad() + jobs": "import nomad; n = nomad.Nomad(); n.jobs",
+    "import + Nomad() + all endpoints": (
+        "import nomad; n = nomad.Nomad(); "
+        "[getattr(n, name) for name, value in vars(nomad.Nomad).items() if isinstance(value, property)]"
+    ),
+}
+
+CHILD = """
+import time
+start = time.perf_counter()
+{code}
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def measure(code, runs):
+    """ Median wall time in ms of code executed in `runs` fresh interpreters """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, "-c", CHILD.format(code=code)], env=env)
+        samples.append(float(output))
+    return statistics.median(samples)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for name, code in SCENARIOS.items():
+        print(f"{name:<36} {measure(code, runs):8.2f} ms (median of {runs})")
+
+
+if __name__ == "__main__":
+    main()
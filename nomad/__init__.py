@@ -1,5 +1,8 @@
 """Nomad Python library"""
+import copy
+import itertools
 import os
+import threading
 
 from nomad import api
 
@@ -7,7 +10,7 @@ class Nomad():  # pylint: disable=too-many-public-methods,too-many-instance-attr
     """
     Nomad API
     """
-    def __init__(self,  # pylint: disable=too-many-arguments
+    def __init__(self,  # pylint: disable=too-many-arguments,too-many-locals
                  host='127.0.0.1',
                  secure=False,
                  port=4646,
@@ -20,7 +23,11 @@ class Nomad():  # pylint: disable=too-many-public-methods,too-many-instance-attr
                  verify=False,
                  cert=(os.getenv('NOMAD_CLIENT_CERT', None),
                        os.getenv('NOMAD_CLIENT_KEY', None)),
-                 session=None):
+                 session=None,
+                 cache=None,
+                 rate_limiter=None,
+                 concurrency_limiter=None,
+                 client_router=None):
         """ Nomad api client
 
           https://github.com/jrxFive/python-nomad/
@@ -41,7 +48,20 @@ class Nomad():  # pylint: disable=too-many-public-methods,too-many-instance-attr
             - token (defaults to None), Specifies to append ACL token to the headers to
                                 make authentication on secured based nomad environemnts.
             - session (defaults to None), allows for injecting a prepared requests.Session object that
-                                all requests to Nomad should use.
+                                all requests to Nomad should use. If None a nomad.api.SessionPool,
+                                safe to use from many threads and after os.fork(), is shared by
+                                every endpoint.
+            - cache (defaults to None), nomad.api.cache.DiskCache used to persist slowly changing
+                                responses (regions, namespaces, agent, ACL and scaling policies)
+                                between processes.
+            - rate_limiter (defaults to None), nomad.api.RateLimiter applied to every request of
+                                the client and of the views derived from it.
+            - concurrency_limiter (defaults to None), nomad.api.AdaptiveLimiter adapting the number of
+                                concurrent calls of the bulk and parallel helpers (register_jobs,
+                                dispatch_jobs, hydrate, fan_out, ...) to the cluster health.
+            - client_router (defaults to None), nomad.api.ClientRouter sending the client/* requests
+                                (files, logs, allocation and node stats) straight to the client agent
+                                of the node concerned instead of through the servers.
            returns: Nomad api client object
 
            raises:
@@ -59,7 +79,12 @@ class Nomad():  # pylint: disable=too-many-public-methods,too-many-instance-attr
         self.token = token
         self.verify = verify
         self.cert = cert if all(cert) else ()
-        self.session = session
+        self._session = session
+        self._session_lock = threading.Lock()
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        self.client_router = client_router
         self.__namespace = namespace
 
         self.requester_settings = {
@@ -73,36 +98,115 @@ class Nomad():  # pylint: disable=too-many-public-methods,too-many-instance-attr
             "verify": self.verify,
             "cert": self.cert,
             "region": self.region,
-            "session": self.session,
+            "session": session,
+            "cache": self.cache,
+            "rate_limiter": self.rate_limiter,
+            "concurrency_limiter": self.concurrency_limiter,
+            "client_router": self.client_router,
         }
 
-        self._acl = api.Acl(**self.requester_settings)
-        self._agent = api.Agent(**self.requester_settings)
-        self._allocation = api.Allocation(**self.requester_settings)
-        self._allocations = api.Allocations(**self.requester_settings)
-        self._client = api.Client(**self.requester_settings)
-        self._deployment = api.Deployment(**self.requester_settings)
-        self._deployments = api.Deployments(**self.requester_settings)
-        self._evaluation = api.Evaluation(**self.requester_settings)
-        self._evaluations = api.Evaluations(**self.requester_settings)
-        self._event = api.Event(**self.requester_settings)
-        self._job = api.Job(**self.requester_settings)
-        self._jobs = api.Jobs(**self.requester_settings)
-        self._metrics = api.Metrics(**self.requester_settings)
-        self._namespace = api.Namespace(**self.requester_settings)
-        self._namespaces = api.Namespaces(**self.requester_settings)
-        self._node = api.Node(**self.requester_settings)
-        self._nodes = api.Nodes(**self.requester_settings)
-        self._operator = api.Operator(**self.requester_settings)
-        self._regions = api.Regions(**self.requester_settings)
-        self._scaling = api.Scaling(**self.requester_settings)
-        self._sentinel = api.Sentinel(**self.requester_settings)
-        self._search = api.Search(**self.requester_settings)
-        self._status = api.Status(**self.requester_settings)
-        self._system = api.System(**self.requester_settings)
-        self._validate = api.Validate(**self.requester_settings)
-        self._variable = api.Variable(**self.requester_settings)
-        self._variables = api.Variables(**self.requester_settings)
+        self._endpoints = {}
+
+    @property
+    def session(self):
+        """
+        Session shared by every endpoint, a nomad.api.SessionPool unless one was given
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = api.SessionPool()
+        return self._session
+
+    @session.setter
+    def session(self, session):
+        """
+        Replace the session, the endpoints built from now on use it
+        """
+        with self._session_lock:
+            self._session = session
+            self.requester_settings["session"] = session
+            self._endpoints = {}
+
+    def _endpoint(self, name):
+        """
+        Build an endpoint object on first access
+        """
+        endpoint = self._endpoints.get(name)
+        if endpoint is None:
+            settings = dict(self.requester_settings, session=self.session)
+            endpoint = self._endpoints.setdefault(name, getattr(api, name)(**settings))
+        return endpoint
+
+    def _derive(self, **settings):
+        """
+        Build a view of this client with some requester settings replaced.
+        The view shares the session (connection pool) and the cache of this client.
+        """
+        derived = copy.copy(self)
+        derived.requester_settings = dict(self.requester_settings, **settings)
+        derived.token = derived.requester_settings["token"]
+        derived.region = derived.requester_settings["region"]
+        derived.timeout = derived.requester_settings["timeout"]
+        derived.__namespace = derived.requester_settings["namespace"]  # pylint: disable=protected-access,unused-private-member
+        derived._session = self.session  # pylint: disable=protected-access
+        derived._endpoints = {}  # pylint: disable=protected-access
+        return derived
+
+    def with_token(self, token):
+        """
+        Nomad client using the given ACL token, sharing this client's connection pool and cache
+        """
+        return self._derive(token=token)
+
+    def with_namespace(self, namespace):
+        """
+        Nomad client using the given namespace, sharing this client's connection pool and cache
+        """
+        return self._derive(namespace=namespace)
+
+    def with_region(self, region):
+        """
+        Nomad client using the given region, sharing this client's connection pool and cache
+        """
+        return self._derive(region=region)
+
+    def fan_out(self, func, regions=None, namespaces=None, max_workers=8, timeout=None):  # pylint: disable=too-many-arguments
+        """
+        Run func concurrently against every region / namespace pair and yield the results as they complete.
+
+        Usage:
+            for outcome in n.fan_out(lambda c: c.jobs.get_jobs(), regions="*", namespaces="*"):
+                region, namespace = outcome.item
+                if outcome.error is None:
+                    for job in outcome.result:
+                        print(region, namespace, job["ID"])
+
+        arguments:
+          - func: callable receiving a scoped Nomad client (see with_region / with_namespace)
+        optional arguments:
+          - regions: list of regions, "*" for every known region, None for the client region
+          - namespaces: list of namespaces, "*" for every namespace, None for the client namespace
+          - max_workers: (int) maximum number of targets queried at once, default 8
+          - timeout: (int) request timeout for each target, defaults to the client timeout
+        returns: generator of nomad.api.concurrency.BulkResult(item=(region, namespace), result, error),
+                 a failing target is reported through error and does not stop the others
+        """
+        if regions == "*":
+            regions = self.regions.get_regions()
+        if namespaces == "*":
+            namespaces = [namespace["Name"] for namespace in self.namespaces.get_namespaces()]
+
+        scope = {} if timeout is None else {"timeout": timeout}
+        targets = itertools.product(regions or [self.region], namespaces or [self.__namespace])
+
+        def query(target):
+            region, namespace = target
+            return func(self._derive(region=region, namespace=namespace, **scope))
+
+        return api.concurrency.run_concurrently(
+            query, targets, max_workers=max_workers, limiter=self.concurrency_limiter
+        )
 
     def get_uri(self):
         """
@@ -131,186 +235,186 @@ class Nomad():  # pylint: disable=too-many-public-methods,too-many-instance-attr
         """
         Jobs API
         """
-        return self._jobs
+        return self._endpoint("Jobs")
 
     @property
     def job(self):
         """
         Job API
         """
-        return self._job
+        return self._endpoint("Job")
 
     @property
     def nodes(self):
         """
         Nodes API
         """
-        return self._nodes
+        return self._endpoint("Nodes")
 
     @property
     def node(self):
         """
         Node API
         """
-        return self._node
+        return self._endpoint("Node")
 
     @property
     def allocations(self):
         """
         Allocations API
         """
-        return self._allocations
+        return self._endpoint("Allocations")
 
     @property
     def allocation(self):
         """
         Allocation API
         """
-        return self._allocation
+        return self._endpoint("Allocation")
 
     @property
     def evaluations(self):
         """
         Evaluations API
         """
-        return self._evaluations
+        return self._endpoint("Evaluations")
 
     @property
     def evaluation(self):
         """
         Evaluation API
         """
-        return self._evaluation
+        return self._endpoint("Evaluation")
 
     @property
     def event(self):
         """
         Event API
         """
-        return self._event
+        return self._endpoint("Event")
 
     @property
     def agent(self):
         """
         Agent API
         """
-        return self._agent
+        return self._endpoint("Agent")
 
     @property
     def client(self):
         """
         Client API
         """
-        return self._client
+        return self._endpoint("Client")
 
     @property
     def deployments(self):
         """
         Deployments API
         """
-        return self._deployments
+        return self._endpoint("Deployments")
 
     @property
     def deployment(self):
         """
         Deployment API
         """
-        return self._deployment
+        return self._endpoint("Deployment")
 
     @property
     def regions(self):
         """
         Regions API
         """
-        return self._regions
+        return self._endpoint("Regions")
 
     @property
     def scaling(self):
         """
         Scaling API
         """
-        return self._scaling
+        return self._endpoint("Scaling")
 
     @property
     def status(self):
         """
         Status API
         """
-        return self._status
+        return self._endpoint("Status")
 
     @property
     def system(self):
         """
         System API
         """
-        return self._system
+        return self._endpoint("System")
 
     @property
     def operator(self):
         """
         Operator API
         """
-        return self._operator
+        return self._endpoint("Operator")
 
     @property
     def validate(self):
         """
         Validate API
         """
-        return self._validate
+        return self._endpoint("Validate")
 
     @property
     def namespaces(self):
         """
         Namespaces API
         """
-        return self._namespaces
+        return self._endpoint("Namespaces")
 
     @property
     def namespace(self):
         """
         Namespace API
         """
-        return self._namespace
+        return self._endpoint("Namespace")
 
     @property
     def acl(self):
         """
         ACL API
         """
-        return self._acl
+        return self._endpoint("Acl")
 
     @property
     def sentinel(self):
         """
         Sentinel API
         """
-        return self._sentinel
+        return self._endpoint("Sentinel")
 
     @property
     def search(self):
         """
         Search API
         """
-        return self._search
+        return self._endpoint("Search")
 
     @property
     def metrics(self):
         """
         Metrics API
         """
-        return self._metrics
+        return self._endpoint("Metrics")
 
     @property
     def variable(self):
         """
         Variable API
         """
-        return self._variable
+        return self._endpoint("Variable")
 
     @property
     def variables(self):
         """
         Variables API
         """
-        return self._variables
+        return self._endpoint("Variables")
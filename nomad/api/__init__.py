@@ -1,30 +1,75 @@
-"""Nomad Python library"""
-import nomad.api.exceptions
-from nomad.api.acl import Acl
-from nomad.api.agent import Agent
-from nomad.api.allocation import Allocation
-from nomad.api.allocations import Allocations
-from nomad.api.base import Requester
-from nomad.api.client import Client
-from nomad.api.deployment import Deployment
-from nomad.api.deployments import Deployments
-from nomad.api.evaluation import Evaluation
-from nomad.api.evaluations import Evaluations
-from nomad.api.event import Event
-from nomad.api.job import Job
-from nomad.api.jobs import Jobs
-from nomad.api.metrics import Metrics
-from nomad.api.namespace import Namespace
-from nomad.api.namespaces import Namespaces
-from nomad.api.node import Node
-from nomad.api.nodes import Nodes
-from nomad.api.operator import Operator
-from nomad.api.regions import Regions
-from nomad.api.scaling import Scaling
-from nomad.api.sentinel import Sentinel
-from nomad.api.search import Search
-from nomad.api.status import Status
-from nomad.api.system import System
-from nomad.api.validate import Validate
-from nomad.api.variable import Variable
-from nomad.api.variables import Variables
+"""Nomad Python library
+
+Endpoint classes and submodules are imported on first access, so that
+`import nomad` does not pay for the endpoints (and `requests`) a program never uses.
+"""
+import importlib
+
+_LAZY_ATTRIBUTES = {
+    "Acl": "nomad.api.acl",
+    "AdaptiveLimiter": "nomad.api.concurrency",
+    "AclCache": "nomad.api.cache",
+    "Agent": "nomad.api.agent",
+    "Allocation": "nomad.api.allocation",
+    "Allocations": "nomad.api.allocations",
+    "Requester": "nomad.api.base",
+    "DiskCache": "nomad.api.cache",
+    "BulkResult": "nomad.api.concurrency",
+    "Client": "nomad.api.client",
+    "ClientRouter": "nomad.api.routing",
+    "Deployment": "nomad.api.deployment",
+    "Deployments": "nomad.api.deployments",
+    "Evaluation": "nomad.api.evaluation",
+    "Evaluations": "nomad.api.evaluations",
+    "Event": "nomad.api.event",
+    "Job": "nomad.api.job",
+    "Jobs": "nomad.api.jobs",
+    "Metrics": "nomad.api.metrics",
+    "Namespace": "nomad.api.namespace",
+    "Namespaces": "nomad.api.namespaces",
+    "Node": "nomad.api.node",
+    "Nodes": "nomad.api.nodes",
+    "Operator": "nomad.api.operator",
+    "RateLimiter": "nomad.api.ratelimit",
+    "Regions": "nomad.api.regions",
+    "Scaling": "nomad.api.scaling",
+    "Sentinel": "nomad.api.sentinel",
+    "SessionPool": "nomad.api.sessions",
+    "StatsSampler": "nomad.api.sampling",
+    "HostStatsSnapshot": "nomad.api.sampling",
+    "FileFollower": "nomad.api.streaming",
+    "FrameStream": "nomad.api.streaming",
+    "LogMultiplexer": "nomad.api.streaming",
+    "Search": "nomad.api.search",
+    "Status": "nomad.api.status",
+    "System": "nomad.api.system",
+    "Validate": "nomad.api.validate",
+    "Variable": "nomad.api.variable",
+    "Variables": "nomad.api.variables",
+    "VariablesCache": "nomad.api.cache",
+}
+
+_LAZY_SUBMODULES = (
+    "acl", "agent", "allocation", "allocations", "base", "cache", "client", "concurrency", "deployment", "deployments",
+    "evaluation", "evaluations", "event", "exceptions", "job", "jobs", "metrics", "namespace", "namespaces",
+    "node", "nodes", "operator", "ratelimit", "regions", "routing", "sampling", "scaling", "search", "sentinel",
+    "sessions", "status", "streaming", "system", "validate", "variable", "variables",
+)
+
+__all__ = sorted(_LAZY_ATTRIBUTES) + ["exceptions"]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    elif name in _LAZY_SUBMODULES:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | set(_LAZY_SUBMODULES))
@@ -64,18 +64,20 @@ class Acl(Requester):
         """
         return self.request("token", _id, method="get").json()
 
-    def get_self_token(self):
+    def get_self_token(self, token=None):
         """ Retrieve self token used for auth.
 
             https://www.nomadproject.io/api/acl-tokens.html
 
+            optional_arguments:
+              - token, secret ID to look up instead of the token of the client.
             returns: dict
 
             raises:
               - nomad.api.exceptions.BaseNomadException
               - nomad.api.exceptions.URLNotFoundNomadException
         """
-        return self.request("token", "self", method="get").json()
+        return self.request("token", "self", method="get", token=token).json()
 
     def create_token(self, token):
         """ Create token.
@@ -132,7 +134,7 @@ class Acl(Requester):
               - nomad.api.exceptions.BaseNomadException
               - nomad.api.exceptions.URLNotFoundNomadException
         """
-        return self.request("policies", method="get").json()
+        return self.request("policies", method="get", cacheable=True).json()
 
     def create_policy(self, _id, policy):
         """ Create policy.
@@ -30,7 +30,7 @@ class Agent(Requester):
               - nomad.api.exceptions.BaseNomadException
               - nomad.api.exceptions.URLNotFoundNomadException
         """
-        return self.request("self", method="get").json()
+        return self.request("self", method="get", cacheable=True).json()
 
     def get_members(self):
         """Lists the known members of the gossip pool.
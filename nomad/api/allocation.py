@@ -1,7 +1,13 @@
 """Nomad allocation: https://developer.hashicorp.com/nomad/api-docs/allocations"""
+import time
+
 import nomad.api.exceptions
 
 from nomad.api.base import Requester
+from nomad.api.concurrency import run_concurrently
+from nomad.api.evaluation import Evaluation
+
+TERMINAL_CLIENT_STATUSES = ("complete", "failed", "lost")
 
 
 class Allocation(Requester):
@@ -47,17 +53,43 @@ class Allocation(Requester):
         except nomad.api.exceptions.URLNotFoundNomadException as exc:
             raise KeyError from exc
 
-    def get_allocation(self, _id):
+    def get_allocation(self, _id, index=None, wait=None):
         """ Query a specific allocation.
 
            https://www.nomadproject.io/docs/http/alloc.html
 
+            optional_arguments:
+              - index (int): blocking query, wait for a ModifyIndex newer than index
+              - wait (int): maximum number of seconds a blocking query waits, default 300
             returns: dict
             raises:
               - nomad.api.exceptions.BaseNomadException
               - nomad.api.exceptions.URLNotFoundNomadException
         """
-        return self.request(_id, method="get").json()
+        params, timeout = self._blocking_query(index, wait)
+        return self.request(_id, method="get", params=params, timeout=timeout).json()
+
+    def wait_for_client_status(self, _id, statuses=("running",), wait=None, timeout=None):
+        """ Block until the ClientStatus of an allocation is one of statuses or terminal, using blocking queries.
+
+            arguments:
+              - _id
+              - statuses: ClientStatus values to wait for, default ("running",)
+              - wait (int): maximum number of seconds a single blocking query waits, default 300
+              - timeout (float): maximum number of seconds to wait overall, default no limit
+            returns: dict
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.URLNotFoundNomadException
+              - nomad.api.exceptions.TimeoutNomadException
+        """
+        return self._wait_until(
+            lambda index, wait: self.get_allocation(_id, index=index, wait=wait),
+            lambda allocation: allocation["ClientStatus"] in statuses
+            or allocation["ClientStatus"] in TERMINAL_CLIENT_STATUSES,
+            wait=wait,
+            timeout=timeout,
+        )
 
     def stop_allocation(self, _id):
         """ Stop a specific allocation.
@@ -70,3 +102,60 @@ class Allocation(Requester):
               - nomad.api.exceptions.URLNotFoundNomadException
         """
         return self.request(_id, "stop", method="post").json()
+
+    def stop_allocations(  # pylint: disable=too-many-arguments
+        self, ids, max_workers=8, wait_for_replacement=True, wait=None, progress=None, timeout=None
+    ):
+        """ Stop many allocations concurrently and track the replacements scheduled by Nomad.
+
+            For every allocation the resulting evaluation is waited for, then the allocations it
+            placed to replace it (PreviousAllocation) until they are running, all with blocking queries.
+
+            arguments:
+              - ids: iterable of allocation ids
+            optional_arguments:
+              - max_workers (int): maximum number of allocations handled at once, default 8
+              - wait_for_replacement (bool): wait for the evaluation and replacements, default True
+              - wait (int): maximum number of seconds a single blocking query waits, default 300
+              - progress: callable(alloc_id, stage, data) called from the worker threads as an
+                          allocation goes through the "stopped", "evaluated" and "replaced" stages
+              - timeout (float): maximum number of seconds to wait for the evaluation and replacements
+                                 of one allocation, it then fails with TimeoutNomadException,
+                                 default no limit
+            returns: generator of nomad.api.concurrency.BulkResult(item=alloc id, result=dict, error=Exception)
+                     the result holds EvalID, Evaluation and Replacements
+        """
+        evaluation = self._sibling(Evaluation)
+
+        def report(_id, stage, data):
+            if progress is not None:
+                progress(_id, stage, data)
+
+        def stop(_id):
+            result = self.stop_allocation(_id)
+            report(_id, "stopped", result)
+            if not wait_for_replacement:
+                return result
+
+            deadline = None if timeout is None else time.monotonic() + timeout
+
+            def remaining():
+                return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+            result["Evaluation"] = evaluation.wait_for_evaluation(
+                result["EvalID"], index=result.get("Index", 0), wait=wait, timeout=remaining()
+            )
+            report(_id, "evaluated", result["Evaluation"])
+
+            placed = evaluation.get_allocations(result["EvalID"])
+            replacements = [alloc for alloc in placed if alloc.get("PreviousAllocation") == _id]
+            result["Replacements"] = [
+                self.wait_for_client_status(replacement["ID"], wait=wait, timeout=remaining())
+                for replacement in replacements
+            ]
+            report(_id, "replaced", result["Replacements"])
+            return result
+
+        # waiting for replacements is scheduler time, not request latency the limiter could adapt to
+        limiter = None if wait_for_replacement else self.concurrency_limiter
+        return run_concurrently(stop, ids, max_workers=max_workers, limiter=limiter)
@@ -1,7 +1,14 @@
 """Requester"""
+import copy
+import json as jsonlib
+import math
+import time
+
 import requests
 
 import nomad.api.exceptions
+from nomad.api.concurrency import hydrate_stubs
+from nomad.api.sessions import SessionPool
 
 
 class Requester():  # pylint: disable=too-many-instance-attributes,too-few-public-methods
@@ -11,7 +18,7 @@ class Requester():  # pylint: disable=too-many-instance-attributes,too-few-publi
 
     ENDPOINT = ""
 
-    def __init__(  # pylint: disable=too-many-arguments
+    def __init__(  # pylint: disable=too-many-arguments,too-many-locals
         self,
         address=None,
         uri="http://127.0.0.1",
@@ -23,7 +30,11 @@ class Requester():  # pylint: disable=too-many-instance-attributes,too-few-publi
         verify=False,
         cert=(),
         region=None,
-        session=None
+        session=None,
+        cache=None,
+        rate_limiter=None,
+        concurrency_limiter=None,
+        client_router=None,
     ):
         self.uri = uri
         self.port = port
@@ -34,8 +45,131 @@ class Requester():  # pylint: disable=too-many-instance-attributes,too-few-publi
         self.verify = verify
         self.cert = cert
         self.address = address
-        self.session = session or requests.Session()
+        self.session = session or SessionPool()
         self.region = region
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        self.client_router = client_router
+
+    def _derive(self, **settings):
+        derived = copy.copy(self)
+        for key, value in settings.items():
+            setattr(derived, key, value)
+        return derived
+
+    def with_token(self, token):
+        """
+        Same endpoint using the given ACL token for its requests, it shares the session and cache.
+
+        Usage:
+            n.job.with_token(token).get_job("example")
+        """
+        return self._derive(token=token)
+
+    def with_namespace(self, namespace):
+        """
+        Same endpoint using the given namespace for its requests, it shares the session and cache.
+        """
+        return self._derive(namespace=namespace)
+
+    def with_region(self, region):
+        """
+        Same endpoint using the given region for its requests, it shares the session and cache.
+        """
+        return self._derive(region=region)
+
+    def _sibling(self, cls):
+        """
+        Endpoint of another class sharing the settings, session and cache of this one
+        """
+        sibling = cls.__new__(cls)
+        sibling.__dict__.update(self.__dict__)
+        return sibling
+
+    def _hydrate(  # pylint: disable=too-many-arguments
+        self, endpoint_cls, stubs, max_workers=8, meter=None, namespaced=True, cached=True
+    ):
+        """
+        Fetch the full objects of list stubs concurrently with endpoint_cls, yielding each one as soon
+        as it arrives. Duplicated stubs are fetched once. When the client has a cache and cached is set,
+        a stored object is reused as long as its ModifyIndex matches the stub.
+
+        returns: generator of nomad.api.concurrency.BulkResult(item=stub, result=dict, error=Exception)
+        """
+        endpoint = self._sibling(endpoint_cls)
+
+        def fetch(stub):
+            params = {"namespace": stub.get("Namespace")} if namespaced else None
+            return endpoint._versioned_json(  # pylint: disable=protected-access
+                stub["ID"], params=params, modify_index=stub.get("ModifyIndex") if cached else None
+            )
+
+        return hydrate_stubs(fetch, stubs, max_workers=max_workers, meter=meter, limiter=self.concurrency_limiter)
+
+    def _versioned_json(self, *args, params=None, modify_index=None):
+        """
+        GET an object as json. With a cache configured, the copy stored there is served as long as
+        its ModifyIndex matches modify_index (e.g. taken from a list stub), without any TTL.
+        """
+        if self.cache is None or modify_index is None:
+            return self.request(*args, params=params, method="get").json()
+
+        endpoint = self._endpoint_builder(self.ENDPOINT, *args)
+        params = {key: val for key, val in (params or {}).items() if val is not None}
+        params.update(self._query_string_builder(endpoint=endpoint, params=params))
+        cache_key = self.cache.key(self._url_builder(endpoint), params, self.token)
+
+        entry = self.cache.get(cache_key)
+        if entry is not None and entry.get("modify_index") == modify_index:
+            return jsonlib.loads(entry["body"])
+
+        response = self.request(*args, params=params, method="get")
+        self.cache.put(
+            cache_key, {"url": response.url, "index": None, "modify_index": modify_index, "body": response.text}
+        )
+        return response.json()
+
+    def _blocking_query(self, index=None, wait=None):
+        """
+        Query string and request timeout of a blocking query, the request waits up to `wait`
+        seconds (Nomad default 300) for a change newer than `index`.
+        """
+        if index is None:
+            return {}, self.timeout
+
+        wait = 300 if wait is None else wait
+        # Nomad adds up to wait / 16 of random jitter to the wait of blocking queries
+        return {"index": index, "wait": f"{wait}s"}, wait + wait / 16 + self.timeout
+
+    def _wait_until(self, fetch, done, index=0, wait=None, timeout=None):  # pylint: disable=too-many-arguments
+        """
+        Fetch an object with fetch(index, wait), then again with blocking queries until done(object).
+        A blocking query the client gives up on before Nomad answers counts as no change. After
+        `timeout` seconds, when given, nomad.api.exceptions.TimeoutNomadException is raised.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        obj = fetch(None, None)
+        index = max(index, obj["ModifyIndex"])
+        while not done(obj):
+            query_wait = wait
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise nomad.api.exceptions.TimeoutNomadException(
+                        f"not done after {timeout}s, last ModifyIndex {index}"
+                    )
+                query_wait = min(300 if wait is None else wait, math.ceil(remaining))
+            try:
+                obj = fetch(index, query_wait)
+            except nomad.api.exceptions.BaseNomadException as error:
+                if not isinstance(error.nomad_resp, requests.exceptions.Timeout):
+                    raise
+                continue
+            except nomad.api.exceptions.TimeoutNomadException:
+                continue
+            index = max(index, obj["ModifyIndex"])
+        return obj
 
     def _endpoint_builder(self, *args):
         if args:
@@ -110,11 +244,33 @@ class Requester():  # pylint: disable=too-many-instance-attributes,too-few-publi
             allow_redirects=kwargs.get("allow_redirects", False),
             timeout=kwargs.get("timeout", self.timeout),
             stream=kwargs.get("stream", False),
+            cacheable=kwargs.get("cacheable", False),
+            token=kwargs.get("token", None),
         )
 
         return response
 
-    def _request( # pylint: disable=too-many-arguments, too-many-branches
+    def _cached_request(self, endpoint, params, headers, timeout, token):  # pylint: disable=too-many-arguments
+        """
+        Serve a GET request from the persistent cache, revalidating expired entries
+        """
+        cache_key = self.cache.key(self._url_builder(endpoint), params, token)
+        entry = self.cache.get(cache_key)
+        if self.cache.is_fresh(entry):
+            return self.cache.to_response(entry)
+
+        response = self._request(
+            method="get",
+            endpoint=endpoint,
+            params=params,
+            headers=headers,
+            allow_redirects=False,
+            timeout=timeout,
+            token=token,
+        )
+        return self.cache.revalidate(cache_key, entry, response)
+
+    def _request( # pylint: disable=too-many-arguments, too-many-branches, too-many-locals
         self,
         method,
         endpoint,
@@ -125,6 +281,8 @@ class Requester():  # pylint: disable=too-many-instance-attributes,too-few-publi
         allow_redirects=None,
         timeout=None,
         stream=False,
+        cacheable=False,
+        token=None,
     ):
         url = self._url_builder(endpoint)
         query_string = self._query_string_builder(endpoint=endpoint, params=params)
@@ -134,59 +292,44 @@ class Requester():  # pylint: disable=too-many-instance-attributes,too-few-publi
         else:
             params = query_string
 
-        if self.token:
+        token = self.token if token is None else token
+
+        if cacheable and self.cache is not None and method.lower() == "get":
+            return self._cached_request(endpoint=endpoint, params=params, headers=headers, timeout=timeout, token=token)
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(method, endpoint.split("/", 1)[-1])
+
+        if token:
             if headers is not None:
-                headers["X-Nomad-Token"] = self.token
+                headers["X-Nomad-Token"] = token
             else:
-                headers = {"X-Nomad-Token": self.token}
+                headers = {"X-Nomad-Token": token}
 
-        response = None
+        route = None
+        if self.client_router is not None:
+            route = self.client_router.route(self, endpoint, params)
 
         try:
             method = method.lower()
-            if method == "get":
-                response = self.session.get(
-                    allow_redirects=allow_redirects,
-                    cert=self.cert,
-                    headers=headers,
-                    params=params,
-                    stream=stream,
-                    timeout=timeout,
-                    url=url,
-                    verify=self.verify,
-                )
-
-            elif method == "post":
-                response = self.session.post(
-                    allow_redirects=allow_redirects,
-                    cert=self.cert,
-                    data=data,
-                    headers=headers,
-                    json=json,
-                    params=params,
-                    timeout=timeout,
-                    url=url,
-                    verify=self.verify,
-                )
-            elif method == "put":
-                response = self.session.put(
-                    cert=self.cert,
-                    data=data,
-                    headers=headers,
-                    json=json,
-                    params=params,
-                    timeout=timeout,
-                    url=url,
-                    verify=self.verify,
-                )
-            elif method == "delete":
-                response = self.session.delete(
-                    cert=self.cert,
-                    headers=headers,
-                    params=params,
-                    timeout=timeout,
-                    url=url,
-                    verify=self.verify,
+            response = None
+            if route is not None:
+                # a (connect, read) timeout of the caller keeps its read part
+                read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+                try:
+                    response = self._send(
+                        self.client_router.session, method, f"{route}/{endpoint}", params=params, data=data,
+                        json=json, headers=headers, allow_redirects=allow_redirects,
+                        timeout=(self.client_router.connect_timeout, read_timeout), stream=stream,
+                    )
+                except requests.exceptions.ConnectionError as error:
+                    self.client_router.unreachable(route)
+                    if not self.client_router.resendable(method, error):
+                        raise
+            if response is None:
+                response = self._send(
+                    self.session, method, url, params=params, data=data, json=json, headers=headers,
+                    allow_redirects=allow_redirects, timeout=timeout, stream=stream,
                 )
 
             if response.ok:
@@ -210,3 +353,61 @@ class Requester():  # pylint: disable=too-many-instance-attributes,too-few-publi
 
         except requests.RequestException as error:
             raise nomad.api.exceptions.BaseNomadException(error)
+
+    def _send(  # pylint: disable=too-many-arguments
+        self,
+        session,
+        method,
+        url,
+        params=None,
+        data=None,
+        json=None,
+        headers=None,
+        allow_redirects=None,
+        timeout=None,
+        stream=False,
+    ):
+        if method == "get":
+            return session.get(
+                allow_redirects=allow_redirects,
+                cert=self.cert,
+                headers=headers,
+                params=params,
+                stream=stream,
+                timeout=timeout,
+                url=url,
+                verify=self.verify,
+            )
+        if method == "post":
+            return session.post(
+                allow_redirects=allow_redirects,
+                cert=self.cert,
+                data=data,
+                headers=headers,
+                json=json,
+                params=params,
+                timeout=timeout,
+                url=url,
+                verify=self.verify,
+            )
+        if method == "put":
+            return session.put(
+                cert=self.cert,
+                data=data,
+                headers=headers,
+                json=json,
+                params=params,
+                timeout=timeout,
+                url=url,
+                verify=self.verify,
+            )
+        if method == "delete":
+            return session.delete(
+                cert=self.cert,
+                headers=headers,
+                params=params,
+                timeout=timeout,
+                url=url,
+                verify=self.verify,
+            )
+        return None
@@ -0,0 +1,549 @@
+"""Client side caches"""
+import datetime
+import hashlib
+import json
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+
+import requests
+
+import nomad.api.exceptions
+
+
+class DiskCache():
+    """
+    On-disk cache for slowly changing GET responses (regions, namespaces, agent self,
+    ACL policies, scaling policies).
+
+    Every response is kept in its own file which is replaced atomically, so any number
+    of short-lived processes can share one cache directory without locking. An entry
+    younger than ttl is served without contacting Nomad. An older entry is revalidated:
+    the request is sent again and the entry is only replaced when the X-Nomad-Index of
+    the answer is not older than the cached one. Entries not written for max_age seconds
+    are removed by prune(), which put() also runs at most once every PRUNE_INTERVAL seconds.
+    """
+
+    INDEX_HEADER = "X-Nomad-Index"
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, path=None, ttl=300, max_age=86400):
+        """ Persistent cache
+
+            optional arguments:
+              - path (defaults to $XDG_CACHE_HOME/python-nomad or ~/.cache/python-nomad), directory
+                                  used to store the entries.
+              - ttl (defaults 300), number of seconds an entry is served without revalidation.
+              - max_age (defaults 86400), number of seconds after its last write an entry is pruned.
+        """
+        if path is None:
+            cache_home = os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+            path = os.path.join(cache_home, "python-nomad")
+
+        self.path = path
+        self.ttl = ttl
+        self.max_age = max_age
+        self._pruned = 0
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+
+    def __str__(self):
+        return f"{self.__dict__}"
+
+    def __repr__(self):
+        return f"{self.__dict__}"
+
+    @staticmethod
+    def key(url, params=None, token=None):
+        """ Build the cache key of a request.
+
+            The token is part of the key because ACLs change what Nomad returns,
+            it is never written to disk in clear text.
+        """
+        material = json.dumps(
+            {"url": url, "params": sorted((params or {}).items()), "token": token},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key):
+        """ Read an entry, returns None when it is missing or unreadable. """
+        try:
+            with open(self._entry_path(key), "r", encoding="utf-8") as entry_file:
+                return json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, entry):
+        """ True when the entry can be served without revalidation. """
+        return entry is not None and time.time() - entry["stored"] < self.ttl
+
+    def put(self, key, entry):
+        """ Atomically write an entry. """
+        entry["stored"] = time.time()
+        if entry["stored"] - self._pruned > self.PRUNE_INTERVAL:
+            self._pruned = entry["stored"]
+            self.prune()
+        tmp_fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(tmp_fd, "w", encoding="utf-8") as entry_file:
+                json.dump(entry, entry_file)
+            os.replace(tmp_path, self._entry_path(key))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    def revalidate(self, key, entry, response):
+        """ Merge a fresh response into the cache and return the response to serve.
+
+            When the cached entry carries a higher index than the response (e.g. answered
+            by a lagging server) the cached entry wins and only its age is reset.
+        """
+        index = _parse_index(response.headers.get(self.INDEX_HEADER))
+
+        if entry is not None and index is not None and entry.get("index") is not None and index <= entry["index"]:
+            self.put(key, entry)
+            return self.to_response(entry) if index < entry["index"] else response
+
+        self.put(key, {
+            "url": response.url,
+            "index": index,
+            "body": response.text,
+        })
+        return response
+
+    def to_response(self, entry):
+        """ Build a requests.Response from an entry so callers can keep using .json(). """
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry["url"]
+        response.encoding = "utf-8"
+        if entry.get("index") is not None:
+            response.headers[self.INDEX_HEADER] = str(entry["index"])
+        response._content = entry["body"].encode("utf-8")  # pylint: disable=protected-access
+        return response
+
+    def prune(self):
+        """ Remove the entries, and leftover temporary files, not written for max_age seconds.
+
+            returns: (int) number of files removed
+        """
+        removed = 0
+        limit = time.time() - self.max_age
+        for name in os.listdir(self.path):
+            if name.endswith((".json", ".tmp")):
+                try:
+                    if os.path.getmtime(os.path.join(self.path, name)) < limit:
+                        os.unlink(os.path.join(self.path, name))
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def clear(self):
+        """ Remove every entry from the cache directory. """
+        for name in os.listdir(self.path):
+            if name.endswith(".json"):
+                try:
+                    os.unlink(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+
+class VariablesCache():  # pylint: disable=too-many-instance-attributes
+    """
+    Local copy of the variables stored under a prefix.
+
+    Items are kept together with their ModifyIndex. The listing of the prefix is
+    refreshed through blocking queries, a variable is only fetched again when its
+    ModifyIndex changed. Writes use the cached ModifyIndex as cas value.
+
+    Usage:
+        variables = nomad.api.VariablesCache(n, prefix="app/")
+        variables.start()
+
+        config = variables["app/config"]["Items"]
+        variables.put("app/config", {"debug": "false"})
+    """
+
+    def __init__(self, nomad_client, prefix="", namespace=None, wait=300):
+        """ Variables cache
+
+            arguments:
+              - nomad_client: (nomad.Nomad) client used to reach the variable endpoints
+            optional arguments:
+              - prefix (defaults ""), only variables under this path prefix are cached
+              - namespace (defaults to None), namespace of the variables, client namespace if None
+              - wait (defaults 300), maximum number of seconds a blocking query waits for a change
+        """
+        self.variable = nomad_client.variable
+        self.variables = nomad_client.variables
+        self.prefix = prefix
+        self.namespace = namespace
+        self.wait = wait
+        self.index = 0
+        self._items = {}
+        self._modify_indexes = {}
+        self._lock = threading.Lock()
+        self._exit_event = threading.Event()
+        self._watcher = None
+
+    def __str__(self):
+        return f"{self.__dict__}"
+
+    def __repr__(self):
+        return f"{self.__dict__}"
+
+    def __contains__(self, item):
+        try:
+            self.get(item)
+            return True
+        except nomad.api.exceptions.URLNotFoundNomadException:
+            return False
+
+    def __getitem__(self, item):
+        try:
+            return self.get(item)
+        except nomad.api.exceptions.URLNotFoundNomadException as exc:
+            raise KeyError from exc
+
+    def _store(self, var):
+        with self._lock:
+            cached = self._items.get(var["Path"])
+            if cached is None or cached["ModifyIndex"] <= var["ModifyIndex"]:
+                self._items[var["Path"]] = var
+                self._modify_indexes[var["Path"]] = var["ModifyIndex"]
+
+    def invalidate(self, var_path):
+        """ Drop a variable from the cache, next read fetches it from Nomad. """
+        with self._lock:
+            self._items.pop(var_path, None)
+
+    def refresh(self, block=False):
+        """ Refresh the listing of the prefix and drop variables which changed since they were cached.
+
+            arguments:
+              - block: (bool) wait up to `wait` seconds for a change newer than the last seen index
+            returns: (int) X-Nomad-Index of the listing
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+        """
+        params, timeout = self.variables._blocking_query(  # pylint: disable=protected-access
+            self.index if block and self.index else None, self.wait
+        )
+        params.update({"prefix": self.prefix, "namespace": self.namespace})
+        response = self.variables.request(params=params, method="get", timeout=timeout)
+        modify_indexes = {stub["Path"]: stub["ModifyIndex"] for stub in response.json()}
+
+        with self._lock:
+            self.index = _parse_index(response.headers.get(DiskCache.INDEX_HEADER)) or self.index
+            self._modify_indexes = modify_indexes
+            for var_path in list(self._items):
+                if modify_indexes.get(var_path, -1) > self._items[var_path]["ModifyIndex"] or \
+                        var_path not in modify_indexes:
+                    del self._items[var_path]
+
+        return self.index
+
+    def load(self):
+        """ Fetch every variable under the prefix, so later reads are served locally. """
+        self.refresh()
+        for var_path in list(self._modify_indexes):
+            try:
+                self.get(var_path)
+            except nomad.api.exceptions.URLNotFoundNomadException:
+                self.invalidate(var_path)
+
+    def get(self, var_path):
+        """ Read a variable, from the cache when it is current.
+
+            returns: dict
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.URLNotFoundNomadException
+        """
+        with self._lock:
+            var = self._items.get(var_path)
+        if var is not None:
+            return var
+
+        var = self.variable.get_variable(var_path, namespace=self.namespace)
+        self._store(var)
+        return var
+
+    def _cas(self, var_path):
+        with self._lock:
+            return self._modify_indexes.get(var_path, 0)
+
+    def put(self, var_path, items):
+        """ Create or update a variable using the cached ModifyIndex as cas value.
+
+            On a conflict only the conflicting path is fetched again so the cache holds
+            the winning version, then the conflict is raised for the caller to retry.
+
+            arguments:
+              - var_path :(str), path to variable
+              - items :(dict), variable items
+            returns: dict
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.VariableConflict
+        """
+        try:
+            var = self.variable.create_variable(
+                var_path, {"Items": items}, namespace=self.namespace, cas=self._cas(var_path)
+            )
+        except nomad.api.exceptions.VariableConflict:
+            self._resolve_conflict(var_path)
+            raise
+
+        var.setdefault("Items", items)
+        self._store(var)
+        return var
+
+    def delete(self, var_path):
+        """ Delete a variable using the cached ModifyIndex as cas value.
+
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.VariableConflict
+        """
+        try:
+            self.variable.delete_variable(var_path, namespace=self.namespace, cas=self._cas(var_path))
+        except nomad.api.exceptions.VariableConflict:
+            self._resolve_conflict(var_path)
+            raise
+
+        with self._lock:
+            self._items.pop(var_path, None)
+            self._modify_indexes.pop(var_path, None)
+
+    def _resolve_conflict(self, var_path):
+        self.invalidate(var_path)
+        try:
+            self.get(var_path)
+        except nomad.api.exceptions.URLNotFoundNomadException:
+            with self._lock:
+                self._modify_indexes.pop(var_path, None)
+
+    def _watch(self):
+        while not self._exit_event.is_set():
+            try:
+                self.refresh(block=True)
+            except nomad.api.exceptions.BaseNomadException:
+                self._exit_event.wait(1)
+
+    def start(self):
+        """ Keep the cache current from a background thread using blocking queries.
+
+            returns: (threading.Thread)
+        """
+        self._exit_event.clear()
+        self.refresh()
+        self._watcher = threading.Thread(name="python-nomad-variables-cache", target=self._watch, daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop(self):
+        """ Stop the background refresh, the running blocking query is left to finish. """
+        self._exit_event.set()
+
+
+class AclCache():  # pylint: disable=too-many-instance-attributes
+    """
+    Resolution cache of ACL token -> policies -> rules.
+
+    A token is looked up once with its own secret and kept until its ExpirationTime
+    (or ttl, whichever comes first), policies are kept for ttl. Secrets which Nomad
+    rejects are remembered for negative_ttl so invalid tokens do not reach Nomad on
+    every request. When started, ACLToken and ACLPolicy events from the event stream
+    invalidate the affected entries.
+
+    Usage:
+        acl = nomad.api.AclCache(n)
+        acl.start()
+
+        token, policies = acl.resolve(request_secret_id)
+    """
+
+    def __init__(self, nomad_client, ttl=300, negative_ttl=30):
+        """ ACL cache
+
+            arguments:
+              - nomad_client: (nomad.Nomad) client used to look up policies and to read the event stream
+            optional arguments:
+              - ttl (defaults 300), maximum number of seconds tokens and policies are kept
+              - negative_ttl (defaults 30), number of seconds a rejected secret is remembered
+        """
+        self.acl = nomad_client.acl
+        self.event = nomad_client.event
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._tokens = {}
+        self._policies = {}
+        self._lock = threading.Lock()
+        self._exit_event = threading.Event()
+        self._stream_exit_event = None
+        self._watcher = None
+
+    def __str__(self):
+        return f"{self.__dict__}"
+
+    def __repr__(self):
+        return f"{self.__dict__}"
+
+    def get_token(self, secret_id):
+        """ Resolve a secret ID to its token.
+
+            returns: dict
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.URLNotAuthorizedNomadException
+              - nomad.api.exceptions.URLNotFoundNomadException
+        """
+        if not secret_id:
+            # without a secret the lookup would resolve the token of the client itself
+            raise nomad.api.exceptions.URLNotAuthorizedNomadException("missing ACL token secret ID")
+
+        now = time.time()
+        with self._lock:
+            cached = self._tokens.get(secret_id)
+        if cached is not None and cached[0] > now:
+            if isinstance(cached[1], nomad.api.exceptions.BaseNomadException):
+                raise cached[1]
+            return cached[1]
+
+        try:
+            token = self.acl.get_self_token(token=secret_id)
+        except (nomad.api.exceptions.URLNotAuthorizedNomadException,
+                nomad.api.exceptions.URLNotFoundNomadException) as exc:
+            with self._lock:
+                self._tokens[secret_id] = (now + self.negative_ttl, exc)
+            raise
+
+        expires = now + self.ttl
+        expiration_time = _parse_time(token.get("ExpirationTime"))
+        if expiration_time is not None:
+            expires = min(expires, expiration_time)
+        with self._lock:
+            self._tokens[secret_id] = (expires, token)
+        return token
+
+    def get_policy(self, name):
+        """ Read a policy, including its rules.
+
+            returns: dict
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.URLNotFoundNomadException
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._policies.get(name)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        policy = self.acl.get_policy(name)
+        with self._lock:
+            self._policies[name] = (now + self.ttl, policy)
+        return policy
+
+    def resolve(self, secret_id):
+        """ Resolve a secret ID to its token and the policies attached to it.
+
+            returns: (dict, list of dicts)
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.URLNotAuthorizedNomadException
+        """
+        token = self.get_token(secret_id)
+        policies = [self.get_policy(name) for name in token.get("Policies") or []]
+        return token, policies
+
+    def invalidate_token(self, accessor_id):
+        """ Drop the token with the given accessor ID. """
+        with self._lock:
+            for secret_id, (_, token) in list(self._tokens.items()):
+                if isinstance(token, dict) and token.get("AccessorID") == accessor_id:
+                    del self._tokens[secret_id]
+
+    def invalidate_policy(self, name):
+        """ Drop the policy with the given name. """
+        with self._lock:
+            self._policies.pop(name, None)
+
+    def clear(self):
+        """ Drop every cached token and policy, including rejected secrets. """
+        with self._lock:
+            self._tokens.clear()
+            self._policies.clear()
+
+    def handle_event(self, event):
+        """ Invalidate the entries touched by an event of the event stream. """
+        if event.get("Topic") == "ACLToken":
+            self.invalidate_token(event.get("Key"))
+        elif event.get("Topic") == "ACLPolicy":
+            self.invalidate_policy(event.get("Key"))
+
+    def _watch(self, events):
+        while not self._exit_event.is_set():
+            try:
+                msg = events.get(timeout=1)
+            except queue.Empty:
+                continue
+            for event in msg.get("Events") or []:
+                self.handle_event(event)
+            events.task_done()
+
+    def start(self, index=0):
+        """ Invalidate entries from ACL events of the event stream, the stream requires a management token.
+
+            returns: (threading.Thread)
+        """
+        self._exit_event.clear()
+        stream, self._stream_exit_event, events = self.event.stream.get_stream(
+            index=index, topic=["ACLToken", "ACLPolicy"]
+        )
+        stream.daemon = True
+        stream.start()
+        self._watcher = threading.Thread(
+            name="python-nomad-acl-cache", target=self._watch, args=(events,), daemon=True
+        )
+        self._watcher.start()
+        return self._watcher
+
+    def stop(self):
+        """ Stop consuming the event stream. """
+        self._exit_event.set()
+        if self._stream_exit_event is not None:
+            self._stream_exit_event.set()
+
+
+_FRACTION = re.compile(r"\.(\d{1,6})\d*")
+
+
+def _parse_time(value):
+    """ Parse a RFC3339 timestamp (with Go nanoseconds) into a unix timestamp. """
+    if not value:
+        return None
+    # before Python 3.11 fromisoformat only accepts 3 or 6 digit fractions, Go trims trailing zeros
+    value = _FRACTION.sub(lambda match: "." + match.group(1).ljust(6, "0"), value.replace("Z", "+00:00"))
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+def _parse_index(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
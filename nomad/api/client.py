@@ -1,7 +1,33 @@
 # we want to have backward compatibility here
 # pylint: disable=invalid-name,too-many-instance-attributes,too-many-arguments
 """Nomad Client: https://developer.hashicorp.com/nomad/api-docs/client"""
+import collections
+import fnmatch
+import hashlib
+import json
+import mmap
+import os
+import posixpath
+import re
+import threading
+import time
+
+import requests
+
+import nomad.api.exceptions
+
 from nomad.api.base import Requester
+from nomad.api.concurrency import expand_concurrently, run_concurrently
+from nomad.api.nodes import Nodes
+from nomad.api.sampling import HostStatsSnapshot, StatsSampler
+from nomad.api.streaming import (
+    FileFollower, FrameStream, LogMatch, copy_response, grep_lines, iter_lines, iter_lines_reversed
+)
+
+WalkEntry = collections.namedtuple("WalkEntry", ["alloc_id", "path", "dirs", "files"])
+WalkEntry.__doc__ = """Directory listed by ls.walk, dirs and files are the file info dicts returned by list_files"""
+
+
 class Client():
     """
     The /client endpoints are used to interact with the Nomad clients.
@@ -62,6 +88,55 @@ class ls(Requester):
 
         return self.request(params={"path": path}, method="get").json()
 
+    def walk(self, ids, top="/", include=None, exclude=None, max_depth=None, max_workers=8, onerror=None):
+        """ Walk the directory trees of allocations, like os.walk, listing directories concurrently.
+
+            Patterns are fnmatch patterns matched against the entry name and its full path.
+
+            arguments:
+              - ids: allocation id, or iterable of allocation ids walked in the same call
+            optional_arguments:
+              - top: (str) directory to start from, default "/"
+              - include: (list) patterns, only matching files are reported, default all
+              - exclude: (list) patterns of files and directories to skip, excluded directories
+                         are not descended into
+              - max_depth: (int) number of levels below top to descend, default no limit
+              - max_workers: (int) maximum number of directories listed at once, default 8
+              - onerror: callable(alloc_id, path, exception) called for a directory that could
+                         not be listed, errors are ignored by default like os.walk
+            returns: generator of nomad.api.client.WalkEntry(alloc_id, path, dirs, files),
+                     in no particular order
+        """
+        if isinstance(ids, str):
+            ids = [ids]
+
+        def matches(name, path, patterns):
+            return any(fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(path, pattern) for pattern in patterns)
+
+        def list_directory(item):
+            alloc_id, path, depth = item
+            dirs, files = [], []
+            for entry in self.list_files(alloc_id, path) or []:
+                entry_path = posixpath.join(path, entry["Name"])
+                if exclude and matches(entry["Name"], entry_path, exclude):
+                    continue
+                if entry["IsDir"]:
+                    dirs.append(entry)
+                elif not include or matches(entry["Name"], entry_path, include):
+                    files.append(entry)
+
+            children = []
+            if max_depth is None or depth < max_depth:
+                children = [(alloc_id, posixpath.join(path, entry["Name"]), depth + 1) for entry in dirs]
+            return WalkEntry(alloc_id, path, dirs, files), children
+
+        roots = [(alloc_id, top, 0) for alloc_id in ids]
+        for outcome in expand_concurrently(list_directory, roots, max_workers, limiter=self.concurrency_limiter):
+            if outcome.error is None:
+                yield outcome.result
+            elif onerror is not None:
+                onerror(outcome.item[0], outcome.item[1], outcome.error)
+
 
 class cat(Requester):
 
@@ -97,6 +172,26 @@ class cat(Requester):
 
         return self.request(params={"path": path}, method="get").text
 
+    def read_file_into(self, _id, sink, path="/", chunk_size=64 * 1024):
+        """ Read the contents of a file in an allocation directory as bytes, streamed into a sink
+            in constant memory.
+
+           https://www.nomadproject.io/docs/http/client-fs-cat.html
+
+            arguments:
+              - _id
+              - sink: file object, socket or callable receiving the chunks, or a writable buffer
+                      (bytearray, memoryview, mmap) filled with readinto up to its size
+              - path
+              - chunk_size: (int) bytes per chunk, default 64KiB
+            returns: (int) number of bytes written
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.URLNotFoundNomadException
+        """
+        response = self.request(_id, params={"path": path}, method="get", stream=True)
+        return copy_response(response, sink, chunk_size=chunk_size)
+
 
 class read_at(Requester):
 
@@ -133,6 +228,114 @@ class read_at(Requester):
         }
         return self.request(_id, params=params, method="get").text
 
+    def read_file_offset_into(self, _id, offset, limit, sink, path="/"):
+        """ Read contents of a file in an allocation directory at an offset as bytes, streamed
+            into a sink in constant memory.
+
+           https://www.nomadproject.io/api/client.html#read-file-at-offset
+
+            arguments:
+              - _id: (str) allocation_id required
+              - offset: (int) required
+              - limit: (int) required
+              - sink: file object, socket or callable receiving the chunks, or a writable buffer
+                      (bytearray, memoryview, mmap) filled with readinto up to its size
+              - path: (str) optional
+            returns: (int) number of bytes written
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.BadRequestNomadException
+        """
+        params = {
+            "path": path,
+            "offset": offset,
+            "limit": limit
+        }
+        response = self.request(_id, params=params, method="get", stream=True)
+        return copy_response(response, sink)
+
+    def download_file(self, _id, path, destination, chunk_size=4 * 1024 * 1024, max_workers=4, resume=True,  # pylint: disable=too-many-locals
+                      checksum=None):
+        """ Download a file of an allocation directory, fetching ranges concurrently.
+
+            The size is taken from stat_file, the destination is preallocated and every range is
+            written at its offset through a memory map. Completed ranges are recorded in
+            `destination + ".progress"` so a failed download resumes where it stopped, as long
+            as the remote file did not change. The remote file is checked again at the end.
+
+            arguments:
+              - _id: (str) allocation_id required
+              - path: (str) file path in the allocation directory
+              - destination: (str) local file path
+            optional_arguments:
+              - chunk_size: (int) bytes per ranged request, default 4MiB
+              - max_workers: (int) maximum number of ranges fetched at once, default 4
+              - resume: (bool) reuse the ranges of a previous attempt, default True
+              - checksum: (str) expected "algorithm:hexdigest" of the file, e.g. "sha256:9f86d0..."
+            returns: dict with Size, Chunks, Resumed (number of ranges reused) and Checksum when given
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.BadRequestNomadException
+              - nomad.api.exceptions.InvalidParameters, the file changed or does not match checksum
+        """
+        info = self._sibling(stat).stat_file(_id, path)
+        size = info["Size"]
+        progress_path = destination + ".progress"
+        state = {"Size": size, "ModTime": info.get("ModTime"), "ChunkSize": chunk_size, "Done": []}
+        if resume and os.path.exists(destination):
+            state["Done"] = _load_progress(progress_path, state)
+        resumed = len(state["Done"])
+
+        with open(destination, "r+b" if resumed else "w+b") as file:
+            file.truncate(size)
+            if size:
+                with mmap.mmap(file.fileno(), size) as memory:
+                    error = self._download_ranges(_id, path, memory, state, max_workers, progress_path)
+                if error is not None:
+                    raise error
+
+        changed = self._sibling(stat).stat_file(_id, path).get("ModTime") != info.get("ModTime")
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+        if changed:
+            raise nomad.api.exceptions.InvalidParameters(f"{path} changed during the download")
+
+        result = {"Size": size, "Chunks": -(-size // chunk_size), "Resumed": resumed}
+        if checksum is not None:
+            _verify_checksum(destination, checksum)
+            result["Checksum"] = checksum
+        return result
+
+    def _download_ranges(self, _id, path, memory, state, max_workers, progress_path):  # pylint: disable=too-many-arguments
+        """ Fetch the missing ranges into memory, recording progress, returns the first error. """
+        size, chunk_size = state["Size"], state["ChunkSize"]
+        done = set(state["Done"])
+        todo = [index for index in range(-(-size // chunk_size)) if index not in done]
+
+        def fetch(index):
+            offset = index * chunk_size
+            limit = min(chunk_size, size - offset)
+            with memoryview(memory)[offset:offset + limit] as view:
+                count = self.read_file_offset_into(_id, offset, limit, view, path=path)
+            if count != limit:
+                raise nomad.api.exceptions.InvalidParameters(
+                    f"{path}: expected {limit} bytes at offset {offset}, got {count}"
+                )
+
+        first_error = None
+        saved = time.monotonic()
+        for outcome in run_concurrently(fetch, todo, max_workers=max_workers, limiter=self.concurrency_limiter):
+            if outcome.error is not None:
+                first_error = first_error or outcome.error
+                continue
+            state["Done"].append(outcome.item)
+            if time.monotonic() - saved > 1:
+                _save_progress(progress_path, memory, state)
+                saved = time.monotonic()
+
+        _save_progress(progress_path, memory, state)
+        return first_error
+
 
 class stream_file(Requester):
 
@@ -169,6 +372,82 @@ class stream_file(Requester):
         }
         return self.request(_id, params=params, method="get").text
 
+    def iter_file(self, _id, offset, origin, path="/", timeout=None):
+        """ Stream the contents of a file in an allocation directory incrementally.
+
+            https://www.nomadproject.io/api/client.html#stream-file
+
+            arguments:
+              - _id: (str) allocation_id required
+              - offset: (int) required
+              - origin: (str) either start|end
+              - path: (str) optional
+              - timeout: (int) seconds to wait for data, default no limit, the stream follows the file
+            returns: nomad.api.streaming.FrameStream of (offset, bytes)
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.BadRequestNomadException
+        """
+        params = {
+            "path": path,
+            "offset": offset,
+            "origin": origin
+        }
+        response = self.request(
+            _id, params=params, method="get", stream=True, timeout=timeout or (self.timeout, None)
+        )
+        return FrameStream(response, offset=offset)
+
+    def stream_into(self, _id, offset, origin, sink, path="/", limit=None):
+        """ Stream the contents of a file in an allocation directory as bytes into a sink,
+            in constant memory.
+
+            The stream follows the file: it ends when limit bytes were written, the sink buffer
+            is full or Nomad closes the stream.
+
+            https://www.nomadproject.io/api/client.html#stream-file
+
+            arguments:
+              - _id: (str) allocation_id required
+              - offset: (int) required
+              - origin: (str) either start|end
+              - sink: file object, socket or callable receiving the chunks, or a writable buffer
+                      (bytearray, memoryview, mmap) filled up to its size
+              - path: (str) optional
+              - limit: (int) optional, maximum number of bytes
+            returns: (int) number of bytes written
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.BadRequestNomadException
+        """
+        return self.iter_file(_id, offset, origin, path=path).copy_to(sink, limit=limit)
+
+    def follow(self, _id, path, offset=0, origin="start", rotate=True, read_timeout=30):
+        """ Follow a file in an allocation directory like tail -F, surviving dropped connections,
+            truncation, deletion and rotation without sending any byte twice or skipping one.
+
+            https://www.nomadproject.io/api/client.html#stream-file
+
+            arguments:
+              - _id: (str) allocation_id required
+              - path: (str) file path in the allocation directory
+            optional_arguments:
+              - offset: (int) where to start, e.g. the offset of a previous follower, default 0
+              - origin: (str) either start|end, only used for the first connection, default "start"
+              - rotate: (bool) continue into path.N+1 for files ending with a number, default True
+              - read_timeout: (int) seconds without data nor heartbeat before reconnecting, default 30
+            returns: nomad.api.streaming.FileFollower of nomad.api.streaming.FileChunk(path, offset, data)
+        """
+        file_stat = self._sibling(stat)
+
+        def open_stream(path, offset, origin):
+            return self.iter_file(_id, offset, origin, path=path, timeout=(self.timeout, read_timeout))
+
+        def stat_file(path):
+            return file_stat.stat_file(_id, path)
+
+        return FileFollower(open_stream, stat_file, path, offset=offset, origin=origin, rotate=rotate)
+
 
 class stream_logs(Requester):
 
@@ -211,6 +490,132 @@ class stream_logs(Requester):
         }
         return self.request(_id, params=params, method="get").text
 
+    def iter_logs(self, _id, task, _type, follow=False, offset=0, origin="start", plain=False, timeout=None):
+        """ Stream a task's stderr/stdout logs incrementally, without buffering them.
+
+            Frames are decoded as they arrive, with follow=True the iteration ends only when
+            the task stops or the stream is closed. The `offset` attribute of the returned
+            stream is where to resume from, e.g. after a disconnection.
+
+            https://www.nomadproject.io/api/client.html#stream-logs
+
+            arguments:
+              - _id: (str) allocation_id required
+              - task: (str) name of the task inside the allocation to stream logs from
+              - _type: (str) Specifies the stream to stream. Either "stderr|stdout"
+              - follow: (bool) default false
+              - offset: (int) default 0
+              - origin: (str) either start|end, default "start"
+              - plain: (bool) request the plain text without framing, offsets are then
+                       counted from `offset`. default False
+              - timeout: (int) seconds to wait for data, default the client timeout
+                         without follow and no limit with follow
+            returns: nomad.api.streaming.FrameStream of (offset, bytes)
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.BadRequestNomadException
+        """
+        params = {
+            "task": task,
+            "type": _type,
+            "follow": follow,
+            "offset": offset,
+            "origin": origin,
+            "plain": plain
+        }
+        if timeout is None and follow:
+            timeout = (self.timeout, None)
+        response = self.request(
+            _id, params=params, method="get", stream=True, timeout=timeout or self.timeout
+        )
+        return FrameStream(response, offset=offset, plain=plain)
+
+    def grep(self, ids, task, pattern, types=("stdout", "stderr"), context=0, limit=None, reverse=False,  # pylint: disable=too-many-locals
+             max_workers=8):
+        """ Search the logs of a task in many allocations concurrently.
+
+            Forward searches read the log streams, reverse searches read the rotated log files
+            of alloc/logs from the newest byte backwards, block by block through read at offset,
+            for recent first results. Once `limit` matches are found, reading stops and no other log is opened.
+
+            arguments:
+              - ids: allocation id, or iterable of allocation ids
+              - task: (str) name of the task inside the allocations
+              - pattern: (str, bytes or compiled regex) searched in every line, with a str
+                         pattern lines are decoded as utf-8
+            optional_arguments:
+              - types: (tuple) logs searched, default ("stdout", "stderr")
+              - context: (int) number of lines given before and after each match, default 0
+              - limit: (int) maximum number of matches, default no limit
+              - reverse: (bool) search from the end of the logs, default False
+              - max_workers: (int) maximum number of logs read at once, default 8
+            returns: generator of nomad.api.streaming.LogMatch, matches of a log come together
+                     once it is searched; a log that cannot be read is skipped
+        """
+        if isinstance(ids, str):
+            ids = [ids]
+        regex = re.compile(pattern) if isinstance(pattern, (str, bytes)) else pattern
+        stop = threading.Event()
+        found = [0]
+        lock = threading.Lock()
+        search = self._grep_files if reverse else self._grep_stream
+
+        def grep_log(source):
+            matches = []
+            if stop.is_set():
+                return matches
+            for match in search(source[0], task, source[1], regex, context, stop):
+                matches.append(match)
+                with lock:
+                    found[0] += 1
+                    if limit is not None and found[0] >= limit:
+                        stop.set()
+            return matches
+
+        def sources():
+            for alloc_id in ids:
+                for _type in types:
+                    if stop.is_set():
+                        return
+                    yield alloc_id, _type
+
+        count = 0
+        for outcome in run_concurrently(grep_log, sources(), max_workers=max_workers, limiter=self.concurrency_limiter):
+            for match in outcome.result or []:
+                if limit is not None and count >= limit:
+                    return
+                count += 1
+                yield match
+
+    def _grep_stream(self, alloc_id, task, _type, regex, context, stop):  # pylint: disable=too-many-arguments
+        with self.iter_logs(alloc_id, task, _type, origin="start") as stream:
+            for offset, line, before, after in grep_lines(iter_lines(stream), regex, context, stop=stop):
+                yield LogMatch(alloc_id, _type, None, offset, line, before, after)
+
+    def _grep_files(self, alloc_id, task, _type, regex, context, stop):  # pylint: disable=too-many-arguments
+        reader = self._sibling(read_at)
+        for path, size in self._rotated_logs(alloc_id, task, _type):
+
+            def read(offset, limit, path=path):
+                buffer = bytearray(limit)
+                return bytes(buffer[:reader.read_file_offset_into(alloc_id, offset, limit, buffer, path=path)])
+
+            lines = iter_lines_reversed(read, size)
+            for offset, line, before, after in grep_lines(lines, regex, context, reverse=True, stop=stop):
+                yield LogMatch(alloc_id, _type, path, offset, line, before, after)
+            if stop.is_set():
+                return
+
+    def _rotated_logs(self, alloc_id, task, _type):
+        """ (path, size) of the log files of a task in alloc/logs, newest first """
+        rotated = re.compile(re.escape(f"{task}.{_type}.") + r"(\d+)$")
+        files = []
+        for entry in self._sibling(ls).list_files(alloc_id, "/alloc/logs") or []:
+            match = rotated.match(entry["Name"])
+            if match:
+                files.append((int(match.group(1)), f"/alloc/logs/{entry['Name']}", entry["Size"]))
+        return [(path, size) for _, path, size in sorted(files, reverse=True)]
+
 
 class stat(Requester):
     """
@@ -273,6 +678,51 @@ class stats(Requester):
         """
         return self.request(params={"node_id": node_id}, method="get").json()
 
+    def collect(self, node_ids=None, max_workers=32, deadline=5):
+        """ Read the host stats of many nodes concurrently into one columnar snapshot.
+
+            A node which has not answered `deadline` seconds after its read started ends up in the
+            errors of the snapshot with a TimeoutNomadException, as do unreachable nodes. The body
+            is read in chunks against the deadline, a stalled socket read is abandoned after at
+            most another `deadline` seconds. With a nomad.api.ClientRouter the reads go straight to the
+            client agents.
+
+            optional_arguments:
+              - node_ids: iterable of node ids, all the ready nodes if None
+              - max_workers (int): maximum number of reads in flight, default 32
+              - deadline (float): wall-clock limit in seconds of the read of one node, default 5
+            returns: nomad.api.sampling.HostStatsSnapshot
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+        """
+        if node_ids is None:
+            node_ids = [node["ID"] for node in self._sibling(Nodes).get_nodes() if node.get("Status") == "ready"]
+
+        def read(node_id):
+            expires = time.monotonic() + deadline
+            response = self.request(params={"node_id": node_id}, method="get", timeout=deadline, stream=True)
+            chunks = []
+            try:
+                for chunk in response.iter_content(16 * 1024):
+                    chunks.append(chunk)
+                    if time.monotonic() > expires:
+                        break
+            except requests.exceptions.RequestException as error:
+                raise nomad.api.exceptions.BaseNomadException(error)
+            finally:
+                response.close()
+            if time.monotonic() > expires:
+                raise nomad.api.exceptions.TimeoutNomadException(f"node {node_id} did not answer within {deadline}s")
+            return json.loads(b"".join(chunks))
+
+        snapshot = HostStatsSnapshot()
+        for outcome in run_concurrently(read, node_ids, max_workers=max_workers, limiter=self.concurrency_limiter):
+            if outcome.error is not None:
+                snapshot.errors[outcome.item] = outcome.error
+            else:
+                snapshot.add(outcome.item, outcome.result)
+        return snapshot
+
 
 class allocation(Requester):
 
@@ -303,6 +753,33 @@ class allocation(Requester):
         """
         return self.request(_id, "stats", method="get").json()
 
+    def sampler(self, ids, interval=10, window=360, max_workers=16, metrics=None):  # pylint: disable=too-many-arguments
+        """ Sampler of the resource usage of many allocations, see nomad.api.sampling.StatsSampler.
+
+            Every round reads the stats of all allocations concurrently and appends CPU and
+            memory metrics to per allocation ring buffers holding the last `window` samples.
+            Call sample() for one round or start() to sample every `interval` seconds.
+
+            arguments:
+              - ids: iterable of allocation ids, or callable returning them before every round
+            optional_arguments:
+              - interval (float): seconds between the start of two rounds, default 10
+              - window (int): number of samples kept per allocation, default 360
+              - max_workers (int): maximum number of reads in flight, default 16
+              - metrics (dict): metric name to key path in the stats response,
+                                default nomad.api.sampling.DEFAULT_METRICS
+            returns: nomad.api.sampling.StatsSampler
+        """
+        return StatsSampler(
+            self.read_allocation_stats,
+            ids,
+            interval=interval,
+            window=window,
+            max_workers=max_workers,
+            metrics=metrics,
+            limiter=self.concurrency_limiter,
+        )
+
     def restart_allocation(self, _id):
         """ Restart a specific allocation.
 
@@ -315,6 +792,27 @@ class allocation(Requester):
         """
         return self.request(_id, "restart", method="post").json()
 
+    def restart_allocations(self, ids, max_workers=8, progress=None):
+        """ Restart many allocations concurrently.
+
+           https://www.nomadproject.io/api-docs/allocations/#restart-allocation
+
+            arguments:
+              - ids: iterable of allocation ids
+            optional_arguments:
+              - max_workers (int): maximum number of restarts in flight, default 8
+              - progress: callable(alloc_id, stage, data) called with the "restarted" stage
+                          from the worker threads
+            returns: generator of nomad.api.concurrency.BulkResult(item=alloc id, result=dict, error=Exception)
+        """
+        def restart(_id):
+            result = self.restart_allocation(_id)
+            if progress is not None:
+                progress(_id, "restarted", result)
+            return result
+
+        return run_concurrently(restart, ids, max_workers=max_workers, limiter=self.concurrency_limiter)
+
 
 class gc_allocation(Requester):
 
@@ -367,3 +865,31 @@ class gc_all_allocations(Requester):
               - nomad.api.exceptions.BaseNomadException
         """
         self.request(params={"node_id": node_id}, method="get")
+
+
+def _load_progress(progress_path, state):
+    """ Ranges completed by a previous download of the same remote file """
+    if not os.path.exists(progress_path):
+        return []
+    with open(progress_path, encoding="utf-8") as progress_file:
+        previous = json.load(progress_file)
+    if all(previous.get(key) == state[key] for key in ("Size", "ModTime", "ChunkSize")):
+        return previous["Done"]
+    return []
+
+
+def _save_progress(progress_path, memory, state):
+    memory.flush()
+    with open(progress_path + ".tmp", "w", encoding="utf-8") as progress_file:
+        json.dump(state, progress_file)
+    os.replace(progress_path + ".tmp", progress_path)
+
+
+def _verify_checksum(destination, checksum):
+    algorithm, expected = checksum.split(":", 1)
+    digest = hashlib.new(algorithm)
+    with open(destination, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    if digest.hexdigest() != expected.lower():
+        raise nomad.api.exceptions.InvalidParameters(f"{destination} does not match {checksum}")
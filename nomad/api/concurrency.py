@@ -0,0 +1,326 @@
+"""Helpers used by the bulk and parallel endpoint methods"""
+import collections
+import concurrent.futures
+import threading
+import time
+
+import requests
+
+import nomad.api.exceptions
+
+BulkResult = collections.namedtuple("BulkResult", ["item", "result", "error"])
+BulkResult.__doc__ = """Outcome of one item of a bulk operation, error is None on success"""
+
+# set on the threads running a call which holds a limiter slot
+_SLOT = threading.local()
+
+
+class Meter():
+    """
+    Throughput of a bulk operation, safe to read while the operation runs.
+
+    Usage:
+        meter = nomad.api.concurrency.Meter()
+        for outcome in n.job.dispatch_jobs("batch", dispatches, meter=meter):
+            ...
+        print(meter.succeeded, meter.failed, meter.rate)
+    """
+
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f"{self.__dict__}"
+
+    def __repr__(self):
+        return f"{self.__dict__}"
+
+    def start(self):
+        """ Mark the beginning of the operation, only the first call counts. """
+        with self._lock:
+            if self.started is None:
+                self.started = time.monotonic()
+
+    def record(self, error=None):
+        """ Count one completed item. """
+        with self._lock:
+            if error is None:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self.finished = time.monotonic()
+
+    @property
+    def elapsed(self):
+        """ Seconds between the start and the last completed item. """
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rate(self):
+        """ Completed items per second. """
+        elapsed = self.elapsed
+        if not elapsed:
+            return 0.0
+        return (self.succeeded + self.failed) / elapsed
+
+
+class AdaptiveLimiter():  # pylint: disable=too-many-instance-attributes
+    """
+    Adaptive concurrency limit (AIMD) shared by the bulk and parallel helpers of a client.
+
+    The limit grows by one for every `limit` successful calls while latency stays close to its
+    long term average, and is multiplied by `backoff` on a timeout, a 429 response or when the
+    short term latency exceeds `tolerance` times the long term one. Calls started before the
+    last decrease do not decrease it again.
+
+    Usage:
+        limiter = nomad.api.AdaptiveLimiter(initial_limit=4, max_limit=32)
+        n = nomad.Nomad(concurrency_limiter=limiter)
+        list(n.jobs.hydrate(n.jobs.get_jobs(), max_workers=32))
+        print(limiter.metrics())
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, initial_limit=8, min_limit=1, max_limit=64, backoff=0.5, tolerance=2.0, smoothing=0.2
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.rejected = 0
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._short_latency = None
+        self._long_latency = None
+        self._last_decrease = None
+        self._condition = threading.Condition()
+
+    def __str__(self):
+        return f"{self.metrics()}"
+
+    def __repr__(self):
+        return f"{self.metrics()}"
+
+    @property
+    def limit(self):
+        """ Current number of calls allowed in flight. """
+        return max(self.min_limit, int(self._limit))
+
+    def metrics(self):
+        """ Current limit, calls in flight, rejected acquisitions and smoothed latencies. """
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "latency": self._short_latency,
+                "baseline_latency": self._long_latency,
+            }
+
+    def acquire(self, block=True):
+        """ Take a slot for one call, waiting for one with block=True.
+
+            returns: (bool) False when block is False and the limit is reached
+        """
+        with self._condition:
+            while self.in_flight >= self.limit:
+                if not block:
+                    self.rejected += 1
+                    return False
+                self._condition.wait()
+            self.in_flight += 1
+            return True
+
+    def release(self, started, error=None):
+        """ Give back the slot of a call started at time.monotonic() `started` and adapt the limit. """
+        now = time.monotonic()
+        with self._condition:
+            self.in_flight -= 1
+            congested = _is_overload(error)
+            if error is None:
+                congested = self._sample(now - started)
+
+            if congested:
+                if self._last_decrease is None or started >= self._last_decrease:
+                    self._limit = max(self.min_limit, self._limit * self.backoff)
+                    self._last_decrease = now
+            elif error is None:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+    def _sample(self, latency):
+        if self._short_latency is None:
+            self._short_latency = self._long_latency = latency
+            return False
+        self._short_latency += self.smoothing * (latency - self._short_latency)
+        self._long_latency += self.smoothing / 10 * (latency - self._long_latency)
+        return self._short_latency > self.tolerance * self._long_latency
+
+
+def _is_overload(error):
+    if error is None:
+        return False
+    if isinstance(error, nomad.api.exceptions.BaseNomadException):
+        error = error.nomad_resp
+    if isinstance(error, requests.Response):
+        return error.status_code == 429
+    return isinstance(error, (requests.exceptions.Timeout, nomad.api.exceptions.TimeoutNomadException))
+
+
+def _limited(func, limiter):
+    def call(item):
+        started = time.monotonic()
+        held = getattr(_SLOT, "held", False)
+        _SLOT.held = True
+        try:
+            result = func(item)
+        except Exception as error:
+            limiter.release(started, error)
+            raise
+        finally:
+            _SLOT.held = held
+        limiter.release(started)
+        return result
+
+    return call
+
+
+def _outer_limiter(limiter):
+    """ The limiter of a helper, None when it runs inside a call which already holds a slot.
+
+        A nested helper waiting for a slot of the same limiter could otherwise wait forever
+        on the slots its callers hold, the outer slot bounds the nested calls instead.
+    """
+    return None if getattr(_SLOT, "held", False) else limiter
+
+
+def run_concurrently(  # pylint: disable=too-many-arguments,too-many-branches
+    func, items, max_workers=8, fail_fast=False, meter=None, limiter=None
+):
+    """ Call func(item) for every item on a thread pool and yield results as they complete.
+
+        At most max_workers calls are in flight, items are consumed lazily so
+        generators of any size can be passed.
+
+        arguments:
+          - func: callable taking one item
+          - items: iterable of items
+          - max_workers: (int) maximum number of concurrent calls
+          - fail_fast: (bool) stop submitting new items after the first error,
+                       calls already in flight are still reported
+          - meter: (Meter) optional, updated with every completed item
+          - limiter: (AdaptiveLimiter) optional, further bounds the calls in flight,
+                     max_workers stays the upper bound, ignored when nested in a limited call
+        returns: generator of BulkResult
+    """
+    items = iter(items)
+    pending = []
+    limiter = _outer_limiter(limiter)
+    if meter is not None:
+        meter.start()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {}
+        stop = False
+
+        while True:
+            while not stop and len(in_flight) < max_workers:
+                if not pending:
+                    try:
+                        pending.append(next(items))
+                    except StopIteration:
+                        stop = True
+                        break
+                if limiter is None:
+                    item = pending.pop()
+                    in_flight[executor.submit(func, item)] = item
+                elif limiter.acquire(block=not in_flight):
+                    item = pending.pop()
+                    in_flight[executor.submit(_limited(func, limiter), item)] = item
+                else:
+                    break
+
+            if not in_flight:
+                return
+
+            done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                error = future.exception()
+                if meter is not None:
+                    meter.record(error)
+                if error is not None:
+                    stop = stop or fail_fast
+                    yield BulkResult(item, None, error)
+                else:
+                    yield BulkResult(item, future.result(), None)
+
+
+def expand_concurrently(func, roots, max_workers=8, limiter=None):
+    """ Call func(item) on a thread pool for work that discovers more work, e.g. a tree walk.
+
+        func returns (result, children), the children are processed like the roots, breadth
+        first, with at most max_workers calls in flight.
+
+        arguments:
+          - func: callable taking one item and returning (result, iterable of items)
+          - roots: iterable of the first items
+          - max_workers: (int) maximum number of concurrent calls
+          - limiter: (AdaptiveLimiter) optional, further bounds the calls in flight
+        returns: generator of BulkResult(item, result, error), a failed item has no children
+    """
+    pending = collections.deque(roots)
+    limiter = _outer_limiter(limiter)
+    if limiter is not None:
+        func = _limited(func, limiter)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {}
+        while pending or in_flight:
+            while pending and len(in_flight) < max_workers:
+                if limiter is not None and not limiter.acquire(block=not in_flight):
+                    break
+                item = pending.popleft()
+                in_flight[executor.submit(func, item)] = item
+
+            done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                error = future.exception()
+                if error is not None:
+                    yield BulkResult(item, None, error)
+                    continue
+                result, children = future.result()
+                pending.extend(children)
+                yield BulkResult(item, result, None)
+
+
+def hydrate_stubs(fetch, stubs, max_workers=8, meter=None, limiter=None):
+    """ Fetch the full objects of list stubs concurrently, yielding them as they arrive.
+
+        Stubs are deduplicated on their ID and Namespace before fetching.
+
+        arguments:
+          - fetch: callable taking a stub and returning the full object
+          - stubs: iterable of stubs, e.g. as returned by nomad.api.Jobs.get_jobs
+          - max_workers: (int) maximum number of concurrent fetches
+          - meter: (Meter) optional, updated with every fetched object
+          - limiter: (AdaptiveLimiter) optional, adaptive bound of the concurrent fetches
+        returns: generator of BulkResult(item=stub, result=dict, error=Exception)
+    """
+    def unique(stubs):
+        seen = set()
+        for stub in stubs:
+            key = (stub["ID"], stub.get("Namespace"))
+            if key not in seen:
+                seen.add(key)
+                yield stub
+
+    return run_concurrently(fetch, unique(stubs), max_workers=max_workers, meter=meter, limiter=limiter)
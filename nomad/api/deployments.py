@@ -2,6 +2,7 @@
 import nomad.api.exceptions
 
 from nomad.api.base import Requester
+from nomad.api.deployment import Deployment
 
 
 class Deployments(Requester):
@@ -75,3 +76,10 @@ class Deployments(Requester):
             params["namespace"] = namespace
 
         return self.request(params=params, method="get").json()
+
+    def hydrate(self, stubs=None, max_workers=8, meter=None):
+        """ Fetch the full objects of deployment stubs concurrently as they arrive, all deployments if stubs is None.
+
+            returns: generator of nomad.api.concurrency.BulkResult(item=stub, result=dict, error=Exception)
+        """
+        return self._hydrate(Deployment, self.get_deployments() if stubs is None else stubs, max_workers, meter)
@@ -3,6 +3,8 @@ import nomad.api.exceptions
 
 from nomad.api.base import Requester
 
+TERMINAL_STATUSES = ("complete", "failed", "canceled")
+
 
 class Evaluation(Requester):
 
@@ -45,19 +47,45 @@ class Evaluation(Requester):
         except nomad.api.exceptions.URLNotFoundNomadException as exc:
             raise KeyError from exc
 
-    def get_evaluation(self, _id):
+    def get_evaluation(self, _id, index=None, wait=None):
         """ Query a specific evaluation.
 
            https://www.nomadproject.io/docs/http/eval.html
 
             arguments:
               - _id
+            optional_arguments:
+              - index (int): blocking query, wait for a ModifyIndex newer than index
+              - wait (int): maximum number of seconds a blocking query waits, default 300
+            returns: dict
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.URLNotFoundNomadException
+        """
+        params, timeout = self._blocking_query(index, wait)
+        return self.request(_id, method="get", params=params, timeout=timeout).json()
+
+    def wait_for_evaluation(self, _id, index=0, wait=None, timeout=None):
+        """ Block until an evaluation is complete, failed or canceled, using blocking queries.
+
+            arguments:
+              - _id
+              - index (int): index to start waiting from, e.g. the Index returned with the EvalID
+              - wait (int): maximum number of seconds a single blocking query waits, default 300
+              - timeout (float): maximum number of seconds to wait overall, default no limit
             returns: dict
             raises:
               - nomad.api.exceptions.BaseNomadException
               - nomad.api.exceptions.URLNotFoundNomadException
+              - nomad.api.exceptions.TimeoutNomadException
         """
-        return self.request(_id, method="get").json()
+        return self._wait_until(
+            lambda index, wait: self.get_evaluation(_id, index=index, wait=wait),
+            lambda evaluation: evaluation["Status"] in TERMINAL_STATUSES,
+            index=index,
+            wait=wait,
+            timeout=timeout,
+        )
 
     def get_allocations(self, _id):
         """ Query the allocations created or modified by an evaluation.
@@ -2,6 +2,7 @@
 import nomad.api.exceptions
 
 from nomad.api.base import Requester
+from nomad.api.evaluation import Evaluation
 
 class Evaluations(Requester):
 
@@ -71,3 +72,13 @@ class Evaluations(Requester):
         """
         params = {"prefix": prefix}
         return self.request(method="get", params=params).json()
+
+    def hydrate(self, stubs=None, max_workers=8, meter=None):
+        """ Fetch the full objects of evaluation stubs concurrently as they arrive, all evaluations if stubs is None.
+
+            returns: generator of nomad.api.concurrency.BulkResult(item=stub, result=dict, error=Exception)
+        """
+        # evaluations are short lived and numerous, they are not worth keeping in the cache
+        return self._hydrate(
+            Evaluation, self.get_evaluations() if stubs is None else stubs, max_workers, meter, cached=False
+        )
@@ -30,6 +30,13 @@ class VariableConflict(BaseNomadException):
     """In the case of a compare-and-set variable conflict"""
 
 
+class RateLimitExceeded(BaseNomadException):
+    """The client side rate limit was reached and the limiter does not block"""
+    def __init__(self, nomad_resp, retry_after=None):
+        super().__init__(nomad_resp)
+        self.retry_after = retry_after
+
+
 class InvalidParameters(Exception):
     """Invalid parameters given"""
 
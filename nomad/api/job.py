@@ -1,7 +1,17 @@
 """Nomad job: https://developer.hashicorp.com/nomad/api-docs/jobs"""
+import base64
+import os
+import uuid
+
 import nomad.api.exceptions
 
 from nomad.api.base import Requester
+from nomad.api.client import stream_logs
+from nomad.api.concurrency import run_concurrently
+from nomad.api.streaming import LogMultiplexer
+
+# Nomad rejects dispatch payloads larger than 16KiB (before base64 encoding)
+DISPATCH_PAYLOAD_SIZE_LIMIT = 16 * 1024
 
 
 class Job(Requester):
@@ -218,22 +228,100 @@ class Job(Requester):
         """
         return self.request(_id, "periodic", "force", method="post").json()
 
-    def dispatch_job(self, _id, payload=None, meta=None):
+    def dispatch_job(self, _id, payload=None, meta=None, idempotency_token=None):
         """ Dispatches a new instance of a parameterized job.
 
            https://www.nomadproject.io/docs/http/job.html
 
             arguments:
               - _id
-              - payload
+              - payload, base64 encoded str, or bytes / binary file object which are encoded here.
+                         Payloads over 16KiB raise InvalidParameters before any request is made.
               - meta
+              - idempotency_token, optional, Nomad dispatches only one instance per token so
+                                   a dispatch can be retried safely.
             returns: dict
             raises:
               - nomad.api.exceptions.BaseNomadException
               - nomad.api.exceptions.URLNotFoundNomadException
+              - nomad.api.exceptions.InvalidParameters
+        """
+        dispatch_json = {"Meta": meta, "Payload": _encode_payload(payload)}
+        params = None
+        if idempotency_token is not None:
+            params = {"idempotency_token": idempotency_token}
+        return self.request(_id, "dispatch", params=params, json=dispatch_json, method="post").json()
+
+    def dispatch_jobs(self, _id, dispatches, max_workers=8, fail_fast=False, meter=None):  # pylint: disable=too-many-arguments
+        """ Dispatch many instances of a parameterized job concurrently over the pooled connections.
+
+           https://www.nomadproject.io/docs/http/job.html
+
+            arguments:
+              - _id
+              - dispatches: iterable of dicts with the optional keys "payload", "meta" and "idempotency_token"
+                            (see dispatch_job). A missing idempotency_token is generated, the dict given
+                            back in the result carries it so a failed dispatch can be retried safely.
+            optional_arguments:
+              - max_workers: (int) maximum number of dispatches in flight, default 8
+              - fail_fast: (bool) stop dispatching after the first failure, default False
+              - meter: (nomad.api.concurrency.Meter) optional, collects the dispatch throughput
+            returns: generator of nomad.api.concurrency.BulkResult(item=dict, result=dict, error=Exception)
+                     an oversized payload is reported as InvalidParameters without reaching Nomad
         """
-        dispatch_json = {"Meta": meta, "Payload": payload}
-        return self.request(_id, "dispatch", json=dispatch_json, method="post").json()
+        def prepare(dispatches):
+            for dispatch in dispatches:
+                dispatch = dict(dispatch)
+                dispatch.setdefault("idempotency_token", str(uuid.uuid4()))
+                yield dispatch
+
+        def dispatch_one(dispatch):
+            return self.dispatch_job(
+                _id,
+                payload=dispatch.get("payload"),
+                meta=dispatch.get("meta"),
+                idempotency_token=dispatch["idempotency_token"],
+            )
+
+        return run_concurrently(
+            dispatch_one, prepare(dispatches), max_workers=max_workers, fail_fast=fail_fast, meter=meter,
+            limiter=self.concurrency_limiter,
+        )
+
+    def tail_logs(self, _id, task, types=("stdout", "stderr"), follow=True, origin=None,  # pylint: disable=too-many-arguments
+                  buffer_size=64, wait=None):
+        """ Follow the logs of a task in every allocation of the job, merged into one stream.
+
+            With follow the job allocations are watched with blocking queries: running allocations
+            are attached as they appear and stopped ones detached, until close() is called.
+
+            arguments:
+              - _id
+              - task: (str) name of the task inside the allocations
+            optional_arguments:
+              - types: (tuple) streams to follow, default ("stdout", "stderr")
+              - follow: (bool) keep following the logs and the allocations, default True
+              - origin: (str) either start|end, default "end" with follow and "start" without
+              - buffer_size: (int) number of chunks buffered per stream, a stream whose buffer is
+                             full waits for the consumer, default 64
+              - wait: (int) maximum number of seconds a blocking query waits, default 300
+            returns: nomad.api.streaming.LogMultiplexer of nomad.api.streaming.LogChunk
+        """
+        logs = self._sibling(stream_logs)
+
+        def list_allocations(index):
+            params, timeout = self._blocking_query(index, wait)
+            response = self.request(_id, "allocations", method="get", params=params, timeout=timeout)
+            return response.json(), int(response.headers.get("X-Nomad-Index", 0))
+
+        def open_stream(alloc_id, _type, offset, origin):
+            return logs.iter_logs(alloc_id, task, _type, follow=follow, offset=offset, origin=origin)
+
+        if origin is None:
+            origin = "end" if follow else "start"
+        return LogMultiplexer(
+            list_allocations, open_stream, task, types=types, origin=origin, follow=follow, buffer_size=buffer_size
+        )
 
     def revert_job(self, _id, version, enforce_prior_version=None):
         """ This endpoint reverts the job to an older version.
@@ -300,3 +388,37 @@ class Job(Requester):
                         f"(expected type {type(bool())} but got {type(purge)})")
             params = {"purge": purge}
         return self.request(_id, params=params, method="delete").json()
+
+
+def _encode_payload(payload):
+    """ Base64 encode a dispatch payload given as bytes or binary file, str is expected to be encoded already.
+        The size limit applies to the decoded payload in every case. """
+    if payload is None:
+        return payload
+    if isinstance(payload, str):
+        stripped = payload.strip()
+        size = len(stripped) * 3 // 4 - (len(stripped) - len(stripped.rstrip("=")))
+        if size > DISPATCH_PAYLOAD_SIZE_LIMIT:
+            raise nomad.api.exceptions.InvalidParameters(
+                f"payload is {size} bytes, the limit is {DISPATCH_PAYLOAD_SIZE_LIMIT} bytes"
+            )
+        return payload
+
+    if hasattr(payload, "read"):
+        try:
+            size = os.fstat(payload.fileno()).st_size - payload.tell()
+        except (AttributeError, OSError, ValueError):
+            size = None
+        if size is not None and size > DISPATCH_PAYLOAD_SIZE_LIMIT:
+            raise nomad.api.exceptions.InvalidParameters(
+                f"payload is {size} bytes, the limit is {DISPATCH_PAYLOAD_SIZE_LIMIT} bytes"
+            )
+        # never read more than one byte past the limit
+        payload = payload.read(DISPATCH_PAYLOAD_SIZE_LIMIT + 1)
+
+    payload = memoryview(payload)
+    if payload.nbytes > DISPATCH_PAYLOAD_SIZE_LIMIT:
+        raise nomad.api.exceptions.InvalidParameters(
+            f"payload is over the limit of {DISPATCH_PAYLOAD_SIZE_LIMIT} bytes"
+        )
+    return base64.b64encode(payload).decode("ascii")
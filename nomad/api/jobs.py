@@ -3,6 +3,8 @@ from typing import Optional
 import nomad.api.exceptions
 
 from nomad.api.base import Requester
+from nomad.api.concurrency import run_concurrently
+from nomad.api.job import Job
 
 
 class Jobs(Requester):
@@ -107,6 +109,34 @@ class Jobs(Requester):
         """
         return self.request(json=job, method="post").json()
 
+    def register_jobs(self, jobs, max_workers=8, fail_fast=False, enforce_index=False, meter=None):  # pylint: disable=too-many-arguments
+        """ Register many jobs concurrently, yielding the outcome of each one as soon as it completes.
+
+           https://www.nomadproject.io/docs/http/jobs.html
+
+            arguments:
+              - jobs: iterable of job payloads as accepted by register_job, e.g. {"Job": {...}}
+            optional_arguments:
+              - max_workers: (int) maximum number of registrations in flight, default 8
+              - fail_fast: (bool) stop registering new jobs after the first failure, default False
+              - enforce_index: (bool) register with EnforceIndex, using the JobModifyIndex of the
+                               payload (0 when missing, i.e. only register jobs which do not exist)
+              - meter: (nomad.api.concurrency.Meter) optional, collects the registration throughput
+            returns: generator of nomad.api.concurrency.BulkResult(item=job ID, result=dict, error=Exception)
+                     the result holds EvalID, Warnings, JobModifyIndex, ...; item is the payload itself
+                     when it has no job ID
+        """
+        def register(payload):
+            if enforce_index:
+                payload = dict(payload, EnforceIndex=True)
+                payload.setdefault("JobModifyIndex", payload["Job"].get("JobModifyIndex") or 0)
+            return self.register_job(payload)
+
+        for outcome in run_concurrently(
+            register, jobs, max_workers=max_workers, fail_fast=fail_fast, meter=meter, limiter=self.concurrency_limiter
+        ):
+            yield outcome._replace(item=_job_label(outcome.item))
+
     def parse(self, hcl, canonicalize=False):
         """ Parse a HCL Job file. Returns a dict with the JSON formatted job.
             This API endpoint is only supported from Nomad version 0.8.3.
@@ -121,3 +151,17 @@ class Jobs(Requester):
         return self.request(
             "parse", json={"JobHCL": hcl, "Canonicalize": canonicalize}, method="post", allow_redirects=True
         ).json()
+
+    def hydrate(self, stubs=None, max_workers=8, meter=None):
+        """ Fetch the full objects of job stubs concurrently as they arrive, all jobs if stubs is None.
+
+            returns: generator of nomad.api.concurrency.BulkResult(item=stub, result=dict, error=Exception)
+        """
+        return self._hydrate(Job, self.get_jobs() if stubs is None else stubs, max_workers, meter)
+
+
+def _job_label(payload):
+    job = payload.get("Job") if isinstance(payload, dict) else None
+    if isinstance(job, dict) and job.get("ID"):
+        return job["ID"]
+    return payload
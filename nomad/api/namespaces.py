@@ -71,4 +71,4 @@ class Namespaces(Requester):
               - nomad.api.exceptions.URLNotFoundNomadException
         """
         params = {"prefix": prefix}
-        return self.request(method="get", params=params).json()
+        return self.request(method="get", params=params, cacheable=True).json()
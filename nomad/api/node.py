@@ -1,7 +1,14 @@
 """Nomad Node: https://developer.hashicorp.com/nomad/api-docs/nodes"""
+import collections
+import math
+
 import nomad.api.exceptions
 
 from nomad.api.base import Requester
+from nomad.api.concurrency import run_concurrently
+
+# one hour, in nanoseconds as expected by Nomad
+DEFAULT_DRAIN_SPEC = {"Deadline": 3600 * 10**9, "IgnoreSystemJobs": False}
 
 
 class Node(Requester):
@@ -49,17 +56,23 @@ class Node(Requester):
         except nomad.api.exceptions.URLNotFoundNomadException as exc:
             raise KeyError from exc
 
-    def get_node(self, _id):
+    def get_node(self, _id, index=None, wait=None):
         """ Query the status of a client node registered with Nomad.
 
            https://www.nomadproject.io/docs/http/node.html
 
+            arguments:
+              - _id (str uuid): node id
+            optional_arguments:
+              - index (int): blocking query, wait for a ModifyIndex newer than index
+              - wait (int): maximum number of seconds a blocking query waits, default 300
             returns: dict
             raises:
               - nomad.api.exceptions.BaseNomadException
               - nomad.api.exceptions.URLNotFoundNomadException
         """
-        return self.request(_id, method="get").json()
+        params, timeout = self._blocking_query(index, wait)
+        return self.request(_id, method="get", params=params, timeout=timeout).json()
 
     def get_allocations(self, _id):
         """ Query the allocations belonging to a single node.
@@ -193,3 +206,70 @@ class Node(Requester):
         """
 
         return self.request(_id, "purge", method="post").json()
+
+    def wait_for_drain(self, _id, index=0, wait=None):
+        """ Block until the drain of a node is complete, using blocking queries instead of polling.
+
+            arguments:
+              - _id (str uuid): node id
+              - index (int): index to start waiting from, e.g. NodeModifyIndex returned by a drain
+              - wait (int): maximum number of seconds a single blocking query waits, default 300
+            returns: dict, the drained node
+            raises:
+              - nomad.api.exceptions.BaseNomadException
+              - nomad.api.exceptions.URLNotFoundNomadException
+        """
+        return self._wait_until(
+            lambda index, wait: self.get_node(_id, index=index, wait=wait),
+            lambda node: node.get("DrainStrategy") is None,
+            index=index,
+            wait=wait,
+        )
+
+    def drain_nodes(self, nodes, drain_spec=None, wave_by=None, wave_percent=100,  # pylint: disable=too-many-arguments
+                    max_concurrent_drains=4, mark_eligible=True, wait=None):
+        """ Drain a fleet of nodes in waves, e.g. during OS patching.
+
+            Nodes are split into waves (one wave_by group after the other, wave_percent of a group
+            per wave), waves run one after the other. The nodes of a wave are
+            drained concurrently (at most max_concurrent_drains at a time), drain completion is
+            tracked through blocking queries and eligibility is restored once a node is drained.
+
+            arguments:
+              - nodes: iterable of node stubs as returned by nomad.api.Nodes.get_nodes
+            optional_arguments:
+              - drain_spec (dict): https://www.nomadproject.io/api/nodes.html#drainspec,
+                                   defaults to a one hour deadline
+              - wave_by (str): node stub field to group waves by, e.g. "Datacenter" or "NodeClass"
+              - wave_percent (int): percentage of each group drained per wave, default 100
+              - max_concurrent_drains (int): maximum number of nodes draining at once, default 4
+              - mark_eligible (bool): mark nodes eligible again once drained, default True
+              - wait (int): maximum number of seconds a single blocking query waits, default 300
+            returns: generator of nomad.api.concurrency.BulkResult(item=node id, result=dict, error=Exception)
+        """
+        drain_spec = DEFAULT_DRAIN_SPEC if drain_spec is None else drain_spec
+
+        def drain(_id):
+            response = self.drain_node_with_spec(_id, drain_spec)
+            node = self.wait_for_drain(_id, index=response.get("NodeModifyIndex", 0), wait=wait)
+            if mark_eligible:
+                self.eligible_node(_id, eligible=True)
+                node["SchedulingEligibility"] = "eligible"
+            return node
+
+        for wave in _plan_waves(nodes, wave_by, wave_percent):
+            yield from run_concurrently(drain, wave, max_workers=max_concurrent_drains)
+
+
+def _plan_waves(nodes, wave_by=None, wave_percent=100):
+    """ Split node stubs into waves of node ids: one group (e.g. datacenter) after the other,
+        each group cut into slices of wave_percent of its nodes. """
+    groups = collections.OrderedDict()
+    for node in nodes:
+        groups.setdefault(node.get(wave_by) if wave_by else None, []).append(node["ID"])
+
+    waves = []
+    for node_ids in groups.values():
+        size = max(1, math.ceil(len(node_ids) * wave_percent / 100))
+        waves.extend(node_ids[start:start + size] for start in range(0, len(node_ids), size))
+    return waves
@@ -2,6 +2,7 @@
 import nomad.api.exceptions
 
 from nomad.api.base import Requester
+from nomad.api.node import Node
 
 
 class Nodes(Requester):
@@ -75,3 +76,10 @@ class Nodes(Requester):
         """
         params = {"prefix": prefix}
         return self.request(method="get", params=params).json()
+
+    def hydrate(self, stubs=None, max_workers=8, meter=None):
+        """ Fetch the full objects of node stubs concurrently as they arrive, all nodes if stubs is None.
+
+            returns: generator of nomad.api.concurrency.BulkResult(item=stub, result=dict, error=Exception)
+        """
+        return self._hydrate(Node, self.get_nodes() if stubs is None else stubs, max_workers, meter, namespaced=False)
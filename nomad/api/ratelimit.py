@@ -0,0 +1,117 @@
+"""Client side rate limiting of the requests sent to Nomad"""
+import fnmatch
+import threading
+import time
+
+import nomad.api.exceptions
+
+
+class TokenBucket():
+    """
+    Token bucket refilled with `rate` tokens per second, holding at most `burst` tokens.
+    Not thread safe on its own, RateLimiter serializes the access.
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise nomad.api.exceptions.InvalidParameters("rate must be positive")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def __str__(self):
+        return f"{self.__dict__}"
+
+    def __repr__(self):
+        return f"{self.__dict__}"
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """ Seconds until one token is available, 0 if there is one now. """
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        """ Consume one token, delay() must have returned 0 just before. """
+        self.tokens -= 1
+
+
+class RateLimiter():
+    """
+    Token bucket rate limits applied to every request of a client: a global one, and
+    rules per endpoint family and HTTP method.
+
+    Rules are keyed by a fnmatch pattern on the path after the API version, optionally
+    prefixed by the method, e.g. "job/*/dispatch" or "POST job/*" or "DELETE *". The value
+    is a rate in requests per second, or a (rate, burst) tuple. A request needs a token
+    from the global bucket and from every matching rule.
+
+    When a limit is reached the request waits for a token (block=True) or raises
+    nomad.api.exceptions.RateLimitExceeded (block=False). Responses served from the
+    persistent cache do not consume tokens.
+
+    Usage:
+        limiter = nomad.api.RateLimiter(rate=50, burst=100, rules={"job/*/dispatch": 5})
+        n = nomad.Nomad(rate_limiter=limiter)
+    """
+
+    def __init__(self, rate=None, burst=None, rules=None, block=True):
+        self.block = block
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._global = TokenBucket(rate, burst) if rate is not None else None
+        self._rules = []
+        for key, limit in (rules or {}).items():
+            method, _, pattern = key.rpartition(" ")
+            rate, burst = limit if isinstance(limit, (tuple, list)) else (limit, None)
+            self._rules.append((method.upper() or None, pattern, TokenBucket(rate, burst)))
+
+    def __str__(self):
+        return f"{self.__dict__}"
+
+    def __repr__(self):
+        return f"{self.__dict__}"
+
+    def _buckets(self, method, path):
+        buckets = [self._global] if self._global is not None else []
+        for rule_method, pattern, bucket in self._rules:
+            if rule_method in (None, method) and fnmatch.fnmatchcase(path, pattern):
+                buckets.append(bucket)
+        return buckets
+
+    def acquire(self, method, path, block=None):
+        """ Take a token for one request, from every bucket or from none of them.
+
+            arguments:
+              - method: (str) HTTP method of the request
+              - path: (str) endpoint path after the API version, e.g. job/example/dispatch
+              - block: (bool) overrides the limiter setting for this call
+            raises:
+              - nomad.api.exceptions.RateLimitExceeded
+        """
+        block = self.block if block is None else block
+        method = method.upper()
+        buckets = self._buckets(method, path)
+        if not buckets:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = max(bucket.delay(now) for bucket in buckets)
+                if not delay:
+                    for bucket in buckets:
+                        bucket.take()
+                    return
+                if not block:
+                    self.rejected += 1
+                    raise nomad.api.exceptions.RateLimitExceeded(
+                        f"rate limit reached for {method} {path}, retry in {delay:.3f}s", retry_after=delay
+                    )
+            time.sleep(delay)
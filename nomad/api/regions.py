@@ -64,4 +64,4 @@ class Regions(Requester):
               - nomad.api.exceptions.BaseNomadException
               - nomad.api.exceptions.URLNotFoundNomadException
         """
-        return self.request(method="get").json()
+        return self.request(method="get", cacheable=True).json()
@@ -0,0 +1,166 @@
+"""Direct routing of the client agent endpoints to the node running the allocation"""
+import collections
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+import urllib3
+
+import nomad.api.exceptions
+from nomad.api.allocation import Allocation
+from nomad.api.node import Node
+from nomad.api.sessions import SessionPool
+
+
+class ClientRouter():  # pylint: disable=too-many-instance-attributes
+    """
+    Send the client/fs, client/allocation, client/stats and client/gc requests straight to
+    the client agent of the node concerned instead of having a server forward them.
+
+    The node of an allocation is looked up with Allocation.get_allocation and its HTTP address
+    with Node.get_node, through the servers. Allocations never move, their node is cached
+    for as long as it is among the `max_entries` most recently used ones; node addresses are
+    cached for `ttl` seconds. Direct requests use their own connection pool and connect
+    timeout. When a client agent cannot be reached, or its address cannot be looked up,
+    requests go through the servers again and the node is skipped for `retry_after` seconds.
+    Only GET requests, or requests which never got a connection, are sent again to the servers:
+    another request may already have been applied by the client agent when its connection broke.
+
+    Usage:
+        n = nomad.Nomad(client_router=nomad.api.ClientRouter())
+        n.client.cat.read_file(alloc_id, "/alloc/logs/web.stdout.0")
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, scheme=None, ttl=300, retry_after=30, connect_timeout=2, max_entries=4096, session=None
+    ):
+        self.scheme = scheme
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.connect_timeout = connect_timeout
+        self.max_entries = max_entries
+        self.session = session or SessionPool()
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+        self._alloc_nodes = collections.OrderedDict()
+        self._node_addresses = {}
+        self._unreachable = {}
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(allocations={len(self._alloc_nodes)}, nodes={len(self._node_addresses)})"
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(allocations={len(self._alloc_nodes)}, nodes={len(self._node_addresses)})"
+
+    def route(self, requester, endpoint, params=None):
+        """ Base URL of the client agent serving an endpoint, None to send it to the servers.
+
+            arguments:
+              - requester: nomad.api.base.Requester sending the request, used for the lookups
+              - endpoint: (str) endpoint path including the API version, e.g. v1/client/fs/cat/<alloc id>
+              - params: (dict) query string of the request
+            returns: (str) e.g. http://10.0.0.5:4646, or None
+        """
+        parts = endpoint.split("/")[1:]
+        if len(parts) < 2 or parts[0] != "client":
+            return None
+
+        node_id = None
+        if parts[1] == "fs" and len(parts) > 3:
+            node_id = self._alloc_node(requester, parts[3])
+        elif parts[1] == "allocation" and len(parts) > 2:
+            node_id = self._alloc_node(requester, parts[2])
+        elif params:
+            node_id = params.get("node_id")
+        if node_id is None:
+            return None
+
+        address = self._node_address(requester, node_id)
+        if address is None:
+            return None
+        scheme = self.scheme or urlparse(requester.address or requester.uri).scheme or "http"
+        return f"{scheme}://{address}"
+
+    def unreachable(self, base_url):
+        """ Send the requests for the node at base_url to the servers for the next `retry_after` seconds. """
+        address = base_url.split("://", 1)[-1]
+        with self._lock:
+            self.fallbacks += 1
+            self._unreachable[address] = time.monotonic() + self.retry_after
+
+    @staticmethod
+    def resendable(method, error):
+        """ True when a request which failed with a ConnectionError can be sent to the servers instead.
+
+            arguments:
+              - method: (str) HTTP method of the request
+              - error: (requests.exceptions.ConnectionError) error of the direct request
+            returns: bool
+        """
+        if method.lower() in ("get", "head"):
+            return True
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        # refused connections and failed name resolutions are NewConnectionError, a ConnectTimeoutError
+        reason = getattr(error.args[0] if error.args else None, "reason", None)
+        return isinstance(reason, urllib3.exceptions.ConnectTimeoutError)
+
+    def invalidate(self, node_id=None):
+        """ Forget the cached address of a node, or everything cached without node_id. """
+        with self._lock:
+            if node_id is None:
+                self._alloc_nodes.clear()
+                self._node_addresses.clear()
+                self._unreachable.clear()
+            else:
+                self._node_addresses.pop(node_id, None)
+
+    def _alloc_node(self, requester, alloc_id):
+        with self._lock:
+            node_id = self._alloc_nodes.get(alloc_id)
+            if node_id is not None:
+                self._alloc_nodes.move_to_end(alloc_id)
+                return node_id
+
+        try:
+            node_id = requester._sibling(Allocation).get_allocation(alloc_id).get("NodeID")  # pylint: disable=protected-access
+        except nomad.api.exceptions.BaseNomadException:
+            return None
+        if not node_id:
+            return None
+
+        with self._lock:
+            self._alloc_nodes[alloc_id] = node_id
+            while len(self._alloc_nodes) > self.max_entries:
+                self._alloc_nodes.popitem(last=False)
+        return node_id
+
+    def _node_address(self, requester, node_id):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._node_addresses.get(node_id)
+        if cached is not None and cached[1] > now:
+            address = cached[0]
+        else:
+            address = self._lookup_address(requester, node_id)
+            with self._lock:
+                self._node_addresses[node_id] = (address, now + (self.ttl if address else self.retry_after))
+
+        if address is None:
+            return None
+        with self._lock:
+            if self._unreachable.get(address, 0) > now:
+                return None
+            self._unreachable.pop(address, None)
+        return address
+
+    @staticmethod
+    def _lookup_address(requester, node_id):
+        try:
+            node = requester._sibling(Node).get_node(node_id)  # pylint: disable=protected-access
+        except nomad.api.exceptions.BaseNomadException:
+            return None
+        if node.get("Status") == "down":
+            return None
+        return node.get("HTTPAddr") or None
@@ -0,0 +1,275 @@
+"""Resource usage samples of allocations and nodes stored in array.array columns"""
+import array
+import csv
+import heapq
+import threading
+import time
+
+from nomad.api.concurrency import run_concurrently
+
+DEFAULT_METRICS = {
+    "cpu_percent": ("ResourceUsage", "CpuStats", "Percent"),
+    "cpu_ticks": ("ResourceUsage", "CpuStats", "TotalTicks"),
+    "memory_rss": ("ResourceUsage", "MemoryStats", "RSS"),
+    "memory_usage": ("ResourceUsage", "MemoryStats", "Usage"),
+}
+
+HOST_COLUMNS = (
+    "timestamp", "uptime", "cores", "cpu_percent", "cpu_ticks",
+    "memory_total", "memory_used", "memory_available", "disk_size", "disk_used",
+)
+
+
+class RingBuffer():
+    """
+    Fixed capacity series of floats backed by a preallocated array.array, once full
+    the oldest value is overwritten.
+    """
+
+    def __init__(self, capacity, typecode="d"):
+        self.capacity = capacity
+        self.data = array.array(typecode, bytes(array.array(typecode).itemsize * capacity))
+        self.head = 0
+        self.count = 0
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(capacity={self.capacity}, count={self.count})"
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(capacity={self.capacity}, count={self.count})"
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        """ Add a value, overwriting the oldest one when full. """
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def values(self):
+        """ Values from the oldest to the newest, as a new array.array. """
+        if self.count < self.capacity:
+            return self.data[:self.count]
+        return self.data[self.head:] + self.data[:self.head]
+
+
+def percentile(values, rank):
+    """ rank-th percentile (0-100) of values with linear interpolation, None when empty. """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * rank / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class StatsSampler():  # pylint: disable=too-many-instance-attributes
+    """
+    Poll the resource usage of many allocations concurrently on a schedule and keep the last
+    `window` samples of every metric in ring buffers, one per allocation and metric plus one
+    for the sample timestamps.
+
+    Usage:
+        sampler = n.client.allocation.sampler(lambda: running_alloc_ids(), interval=10, window=360)
+        sampler.start()
+        ...
+        for alloc_id, value in sampler.top("memory_rss", k=10, stat="p95"):
+            print(alloc_id, value)
+        sampler.stop()
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, fetch, ids, interval=10, window=360, max_workers=16, metrics=None, limiter=None
+    ):
+        self.fetch = fetch
+        self.ids = ids
+        self.interval = interval
+        self.window = window
+        self.max_workers = max_workers
+        self.metrics = dict(DEFAULT_METRICS if metrics is None else metrics)
+        self.limiter = limiter
+        self.errors = {}
+        self._series = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(allocations={len(self._series)}, window={self.window})"
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(allocations={len(self._series)}, window={self.window})"
+
+    @property
+    def allocations(self):
+        """ Ids of the allocations with samples. """
+        with self._lock:
+            return list(self._series)
+
+    def sample(self):
+        """ Poll every allocation once.
+
+            The series of allocations that are no longer listed are dropped.
+
+            returns: (int) number of allocations sampled
+        """
+        ids = list(self.ids() if callable(self.ids) else self.ids)
+        sampled = 0
+        errors = {}
+        outcomes = run_concurrently(self.fetch, ids, max_workers=self.max_workers, limiter=self.limiter)
+        for outcome in outcomes:
+            if outcome.error is not None:
+                errors[outcome.item] = outcome.error
+                continue
+            self.record(outcome.item, outcome.result)
+            sampled += 1
+
+        with self._lock:
+            for alloc_id in set(self._series) - set(ids):
+                del self._series[alloc_id]
+        self.errors = errors
+        return sampled
+
+    def record(self, alloc_id, stats):
+        """ Store one read_allocation_stats response of an allocation. """
+        timestamp = stats.get("Timestamp")
+        timestamp = timestamp / 1e9 if timestamp else time.time()
+        with self._lock:
+            series = self._series.get(alloc_id)
+            if series is None:
+                series = self._series[alloc_id] = {
+                    name: RingBuffer(self.window) for name in ["timestamp"] + list(self.metrics)
+                }
+            series["timestamp"].append(timestamp)
+            for name, path in self.metrics.items():
+                series[name].append(_lookup(stats, path))
+
+    def series(self, alloc_id, metric):
+        """ (timestamps, values) arrays of a metric, oldest first. """
+        with self._lock:
+            series = self._series[alloc_id]
+            return series["timestamp"].values(), series[metric].values()
+
+    def aggregate(self, alloc_id, metric):
+        """ p50, p95, max, mean, last value and rate of change per second of a metric over the window.
+
+            returns: dict, or None without samples
+        """
+        timestamps, values = self.series(alloc_id, metric)
+        if not values:
+            return None
+        elapsed = timestamps[-1] - timestamps[0]
+        return {
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "max": max(values),
+            "mean": sum(values) / len(values),
+            "last": values[-1],
+            "rate": (values[-1] - values[0]) / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def aggregates(self, metric):
+        """ aggregate() of a metric for every allocation, keyed by allocation id. """
+        return {alloc_id: self.aggregate(alloc_id, metric) for alloc_id in self.allocations}
+
+    def top(self, metric, k=10, stat="p95"):
+        """ The k allocations with the highest `stat` (p50, p95, max, mean, last, rate) of a metric.
+
+            returns: list of (alloc_id, value), highest first
+        """
+        values = ((alloc_id, aggregate[stat]) for alloc_id, aggregate in self.aggregates(metric).items() if aggregate)
+        return heapq.nlargest(k, values, key=lambda item: item[1])
+
+    def start(self):
+        """ Sample every `interval` seconds in a background thread. """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stop the background sampling. """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        deadline = time.monotonic()
+        while not self._stop.wait(max(0.0, deadline - time.monotonic())):
+            self.sample()
+            # a round longer than the interval delays the next one instead of bursting
+            deadline = max(deadline + self.interval, time.monotonic())
+
+
+class HostStatsSnapshot():
+    """
+    Host stats of many nodes in columns: node_ids[i] is the node of row i of every column,
+    each column being an array.array of floats (numpy.frombuffer can wrap one without copying).
+
+    Columns, see HOST_COLUMNS:
+      - timestamp, uptime: seconds
+      - cores, cpu_percent: number of cores and their mean usage, cpu_ticks: CPUTicksConsumed
+      - memory_total, memory_used, memory_available: bytes
+      - disk_size, disk_used: bytes, summed over the mountpoints
+
+    Nodes whose stats could not be read are in `errors` instead, keyed by node id.
+    """
+
+    def __init__(self):
+        self.node_ids = []
+        self.columns = {name: array.array("d") for name in HOST_COLUMNS}
+        self.errors = {}
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(nodes={len(self.node_ids)}, errors={len(self.errors)})"
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(nodes={len(self.node_ids)}, errors={len(self.errors)})"
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def add(self, node_id, stats):
+        """ Append the row of one client.stats.read_stats response. """
+        cpus = stats.get("CPU") or []
+        memory = stats.get("Memory") or {}
+        disks = stats.get("DiskStats") or []
+        row = {
+            "timestamp": (stats.get("Timestamp") or 0) / 1e9,
+            "uptime": stats.get("Uptime") or 0,
+            "cores": len(cpus),
+            "cpu_percent": sum(cpu.get("Total") or 0 for cpu in cpus) / len(cpus) if cpus else 0,
+            "cpu_ticks": stats.get("CPUTicksConsumed") or 0,
+            "memory_total": memory.get("Total") or 0,
+            "memory_used": memory.get("Used") or 0,
+            "memory_available": memory.get("Available") or 0,
+            "disk_size": sum(disk.get("Size") or 0 for disk in disks),
+            "disk_used": sum(disk.get("Used") or 0 for disk in disks),
+        }
+        self.node_ids.append(node_id)
+        for name, column in self.columns.items():
+            column.append(float(row[name]))
+
+    def row(self, node_id):
+        """ Values of every column for one node, as a dict. """
+        index = self.node_ids.index(node_id)
+        return {name: column[index] for name, column in self.columns.items()}
+
+    def write_csv(self, fileobj):
+        """ Write a header and one line per node to a text file object. """
+        writer = csv.writer(fileobj)
+        writer.writerow(("node_id",) + HOST_COLUMNS)
+        writer.writerows(zip(self.node_ids, *(self.columns[name] for name in HOST_COLUMNS)))
+
+
+def _lookup(stats, path):
+    for key in path:
+        stats = (stats or {}).get(key)
+    return float(stats or 0)
@@ -53,7 +53,7 @@ class Scaling(Requester):
 
         params = {"job": job, "type": type}
 
-        return self.request("policies", method="get", params=params).json()
+        return self.request("policies", method="get", params=params, cacheable=True).json()
 
     def get_scaling_policy(self, _id):
         """
@@ -0,0 +1,103 @@
+"""Connection pools safe to share between threads and across os.fork()"""
+import os
+import threading
+import weakref
+
+import requests
+
+_POOLS = weakref.WeakSet()
+
+
+class SessionPool():
+    """
+    Stand-in for requests.Session used by default by every endpoint.
+
+    requests.Session is not documented as thread safe, so each request checks a session out
+    of the pool for its duration and puts it back afterwards. The pool grows to the number of
+    requests in flight at once (the size of the thread pool using the client) and sessions,
+    with their keep-alive connections, are reused across threads, including short lived ones.
+
+    Sessions created before os.fork() are dropped in the child, which opens new connections
+    instead of sharing the parent's sockets (pre-fork servers like gunicorn).
+
+    Usage:
+        def factory():
+            session = requests.Session()
+            session.headers["User-Agent"] = "my-tool"
+            return session
+
+        n = nomad.Nomad(session=nomad.api.SessionPool(factory))
+    """
+
+    def __init__(self, factory=None):
+        self.factory = factory or requests.Session
+        self.created = 0
+        self._reset()
+        _POOLS.add(self)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(created={self.created}, idle={len(self._idle)}, pid={self._pid})"
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(created={self.created}, idle={len(self._idle)}, pid={self._pid})"
+
+    def _reset(self):
+        # a lock held by another thread at fork time would never be released in the child
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+
+    def _checkout(self):
+        if self._pid != os.getpid():
+            self._reset()
+        try:
+            return self._idle.pop()
+        except IndexError:
+            with self._lock:
+                self.created += 1
+            return self.factory()
+
+    def _checkin(self, session):
+        if self._pid == os.getpid():
+            self._idle.append(session)
+
+    def _send(self, method, url, **kwargs):
+        session = self._checkout()
+        try:
+            return getattr(session, method)(url, **kwargs)
+        finally:
+            self._checkin(session)
+
+    def get(self, url, **kwargs):
+        """ requests.Session.get on a session of the pool """
+        return self._send("get", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """ requests.Session.post on a session of the pool """
+        return self._send("post", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        """ requests.Session.put on a session of the pool """
+        return self._send("put", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        """ requests.Session.delete on a session of the pool """
+        return self._send("delete", url, **kwargs)
+
+    def close(self):
+        """ Close the idle sessions, sessions in use are put back in the pool when their request ends. """
+        while True:
+            try:
+                session = self._idle.pop()
+            except IndexError:
+                return
+            session.close()
+
+
+def _reset_pools_in_child():
+    for pool in list(_POOLS):
+        pool._reset()  # pylint: disable=protected-access
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_in_child)
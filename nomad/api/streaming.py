@@ -0,0 +1,627 @@
+"""Incremental readers of the streaming client fs endpoints (logs and stream file)"""
+import base64
+import codecs
+import collections
+import json
+import queue
+import re
+import threading
+import time
+
+import requests
+import urllib3
+
+import nomad.api.exceptions
+
+
+def decode_frames(chunks):
+    """ Decode the stream frames sent back to back by Nomad, as the bytes arrive.
+
+        Heartbeat frames ({}) are yielded too, Data is left base64 encoded.
+
+        arguments:
+          - chunks: iterable of bytes, e.g. response.iter_content()
+        returns: generator of dict
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    for chunk in chunks:
+        buffer += text.decode(chunk)
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            try:
+                frame, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield frame
+        buffer = buffer[position:]
+
+
+def _writable_view(sink):
+    """ Byte view of a sink supporting the buffer protocol (bytearray, memoryview, mmap, array), else None """
+    try:
+        view = memoryview(sink)
+    except TypeError:
+        return None
+    if view.readonly:  # pylint: disable=using-constant-test
+        raise nomad.api.exceptions.InvalidParameters("the sink buffer is read only")
+    return view.cast("B")
+
+
+def _writer(sink):
+    for name in ("sendall", "write"):
+        if callable(getattr(sink, name, None)):
+            return getattr(sink, name)
+    if callable(sink):
+        return sink
+    raise nomad.api.exceptions.InvalidParameters(
+        "the sink must be a writable buffer, a file object, a socket or a callable"
+    )
+
+
+def copy_chunks(chunks, sink, limit=None):
+    """ Write chunks of bytes to a sink.
+
+        A writable buffer (bytearray, memoryview, mmap) is filled from its start and the copy
+        stops once it is full, file objects are written to, sockets sent to and callables called
+        with every chunk.
+
+        arguments:
+          - chunks: iterable of bytes
+          - sink: writable buffer, file object, socket or callable
+          - limit: (int) optional, stop after this many bytes
+        returns: (int) number of bytes written
+    """
+    view = _writable_view(sink)
+    if view is not None:
+        with view:
+            return _fill(chunks, view, len(view) if limit is None else min(limit, len(view)))
+
+    write = _writer(sink)
+    total = 0
+    if limit == 0:
+        return total
+    for data in chunks:
+        if limit is not None:
+            data = data[:limit - total]
+        write(data)
+        total += len(data)
+        if total == limit:
+            break
+    return total
+
+
+def _fill(chunks, view, size):
+    total = 0
+    if not size:
+        return total
+    for data in chunks:
+        data = data[:size - total]
+        view[total:total + len(data)] = data
+        total += len(data)
+        if total == size:
+            break
+    return total
+
+
+def copy_response(response, sink, chunk_size=64 * 1024):
+    """ Copy the body of a response opened with stream=True to a sink, see copy_chunks.
+
+        The body is never decoded to str nor held in memory as a whole. A writable buffer is
+        filled with readinto, up to its size. The response is closed afterwards.
+
+        returns: (int) number of bytes written
+        raises:
+          - nomad.api.exceptions.BaseNomadException
+          - nomad.api.exceptions.InvalidParameters
+    """
+    try:
+        view = _writable_view(sink)
+        if view is None:
+            return copy_chunks(response.iter_content(chunk_size), sink)
+        with view:
+            return _readinto(response.raw, view)
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as error:
+        # readinto goes straight to urllib3, whose errors requests only wraps in iter_content
+        raise nomad.api.exceptions.BaseNomadException(error)
+    finally:
+        response.close()
+
+
+def _readinto(raw, view):
+    raw.decode_content = True
+    total = 0
+    while total < len(view):
+        with view[total:] as rest:
+            count = raw.readinto(rest)
+        if not count:
+            break
+        total += count
+    return total
+
+
+class FrameStream():
+    """
+    Iterator over a streaming response of the client fs endpoints yielding (offset, bytes).
+
+    Framed responses are decoded on the fly, plain ones are passed through. `offset` is the
+    position right after the last data yielded, the value to resume the stream from. For plain
+    responses it is counted from the requested offset, so it is absolute only for origin "start".
+
+    The response is closed when the iteration ends or on close(), the stream is also a
+    context manager.
+    """
+
+    def __init__(self, response, offset=0, plain=False, chunk_size=64 * 1024):
+        self.response = response
+        self.offset = offset
+        self.plain = plain
+        self.chunk_size = chunk_size
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(url={self.response.url}, offset={self.offset})"
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(url={self.response.url}, offset={self.offset})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        if self.plain:
+            chunks = self._chunks()
+        else:
+            chunks = ((frame["Offset"], frame["Data"]) for frame in self.frames() if frame["Data"])
+
+        for offset, data in chunks:
+            self.offset = offset
+            yield offset - len(data), data
+
+    def _chunks(self):
+        offset = self.offset
+        for data in self._content():
+            offset += len(data)
+            yield offset, data
+
+    def _content(self):
+        try:
+            yield from self.response.iter_content(self.chunk_size)
+        except requests.exceptions.RequestException as error:
+            raise nomad.api.exceptions.BaseNomadException(error)
+        finally:
+            self.close()
+
+    def frames(self, heartbeats=False):
+        """ Decoded frames of a framed response, Data as bytes.
+
+            arguments:
+              - heartbeats: (bool) also yield the heartbeats Nomad sends on idle streams,
+                            as frames without data, default False
+            returns: generator of dict with Offset, Data and optionally File and FileEvent
+        """
+        for frame in decode_frames(self._content()):
+            if not frame and not heartbeats:
+                continue
+            frame["Data"] = base64.b64decode(frame.get("Data") or "")
+            frame.setdefault("Offset", self.offset)
+            yield frame
+
+    def copy_to(self, sink, limit=None):
+        """ Write the data of the stream to a sink, see copy_chunks.
+
+            returns: (int) number of bytes written
+        """
+        try:
+            return copy_chunks((data for _, data in self), sink, limit=limit)
+        finally:
+            self.close()
+
+    def close(self):
+        """ Close the underlying response. """
+        self.response.close()
+
+
+LogChunk = collections.namedtuple("LogChunk", ["alloc_id", "type", "offset", "data"])
+LogChunk.__doc__ = """Complete log lines of one allocation stream, offset is the position of data in the log file"""
+
+
+class _LogSource():  # pylint: disable=too-few-public-methods
+    """ One followed (allocation, stream type) of a LogMultiplexer """
+
+    def __init__(self, alloc_id, _type, buffer_size):
+        self.alloc_id = alloc_id
+        self.type = _type
+        self.buffer = queue.Queue(maxsize=buffer_size)
+        self.stopped = threading.Event()
+        self.stream = None
+
+    def stop(self):
+        """ Stop reading, closing the stream to interrupt a pending read. """
+        self.stopped.set()
+        if self.stream is not None:
+            self.stream.close()
+
+
+class LogMultiplexer():  # pylint: disable=too-many-instance-attributes
+    """
+    Follow the logs of a task in many allocations at once and merge them into one iterator of
+    LogChunk, each holding complete lines labelled with the allocation id and stream type.
+
+    Every stream is read by its own thread into a bounded buffer: a stream whose lines are not
+    consumed fast enough stalls alone. With follow=True the allocations are watched with blocking
+    queries, running ones are attached as they appear and stopped ones are detached, the
+    iteration only ends on close(). Without follow the current logs of the allocations are read
+    once and the iteration ends with the last of them.
+
+    Built by nomad.api.Job.tail_logs.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, list_allocations, open_stream, task, types=("stdout", "stderr"), origin="end", follow=True,
+        buffer_size=64, retry_delay=1,
+    ):
+        self.task = task
+        self.types = types
+        self.origin = origin
+        self.follow = follow
+        self.buffer_size = buffer_size
+        self.retry_delay = retry_delay
+        self._list_allocations = list_allocations
+        self._open_stream = open_stream
+        self._sources = {}
+        self._following = 0
+        self._ready = queue.Queue()
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(task={self.task}, attached={self.attached})"
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(task={self.task}, attached={self.attached})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def attached(self):
+        """ Ids of the allocations currently followed. """
+        with self._lock:
+            return sorted({source.alloc_id for source in self._sources.values()})
+
+    def start(self):
+        """ Attach to the allocations, called by the first iteration. """
+        if self._started:
+            return
+        self._started = True
+        if self.follow:
+            self._spawn(self._watch)
+        else:
+            allocations, _ = self._list_allocations(None)
+            self._update(allocations, attach_all=True)
+            self._ready.put(None)
+
+    def __iter__(self):
+        self.start()
+        while True:
+            source = self._ready.get()
+            if source is None:
+                with self._lock:
+                    done = self._closed.is_set() or not self.follow and not self._following
+                if done:
+                    return
+                continue
+            yield source.buffer.get_nowait()
+
+    def close(self):
+        """ Detach from every allocation and end the iteration. """
+        self._closed.set()
+        with self._lock:
+            sources, self._sources = list(self._sources.values()), {}
+        for source in sources:
+            source.stop()
+        self._ready.put(None)
+
+    @staticmethod
+    def _spawn(target, *args):
+        threading.Thread(target=target, args=args, daemon=True).start()
+
+    def _watch(self):
+        index = None
+        while not self._closed.is_set():
+            try:
+                allocations, index = self._list_allocations(index)
+            except nomad.api.exceptions.BaseNomadException:
+                self._closed.wait(self.retry_delay)
+                continue
+            self._update(allocations)
+
+    def _update(self, allocations, attach_all=False):
+        for alloc in allocations:
+            task_states = alloc.get("TaskStates")
+            if task_states is not None and self.task not in task_states:
+                continue
+            running = attach_all or alloc.get("ClientStatus") == "running"
+            for _type in self.types:
+                key = (alloc["ID"], _type)
+                with self._lock:
+                    if self._closed.is_set():
+                        return
+                    source = self._sources.get(key)
+                    if running and source is None:
+                        source = self._sources[key] = _LogSource(alloc["ID"], _type, self.buffer_size)
+                        self._following += 1
+                        self._spawn(self._follow, source)
+                    elif not running and source is not None:
+                        del self._sources[key]
+                        source.stop()
+
+    def _follow(self, source):
+        offset, origin = 0, self.origin
+        try:
+            while not source.stopped.is_set():
+                try:
+                    source.stream = self._open_stream(source.alloc_id, source.type, offset, origin)
+                    if source.stopped.is_set():
+                        source.stream.close()
+                    self._read_lines(source)
+                except nomad.api.exceptions.BaseNomadException:
+                    pass
+                except (AttributeError, OSError, ValueError):
+                    # reading a response closed by stop() from another thread
+                    if not source.stopped.is_set():
+                        raise
+                if source.stream is not None and source.stream.offset != offset:
+                    # resume after the data delivered, until then keep the requested origin
+                    offset, origin = source.stream.offset, "start"
+                if not self.follow:
+                    return
+                source.stopped.wait(self.retry_delay)
+        finally:
+            with self._lock:
+                self._following -= 1
+            self._ready.put(None)
+
+    def _read_lines(self, source):
+        pending = b""
+        for offset, data in source.stream:
+            start = offset - len(pending)
+            data = pending + data
+            cut = data.rfind(b"\n") + 1
+            if cut:
+                self._emit(source, LogChunk(source.alloc_id, source.type, start, data[:cut]))
+            pending = data[cut:]
+        if pending:
+            self._emit(source, LogChunk(source.alloc_id, source.type, source.stream.offset - len(pending), pending))
+
+    def _emit(self, source, chunk):
+        while not source.stopped.is_set():
+            try:
+                source.buffer.put(chunk, timeout=self.retry_delay)
+            except queue.Full:
+                continue
+            self._ready.put(source)
+            return
+
+
+FileChunk = collections.namedtuple("FileChunk", ["path", "offset", "data"])
+FileChunk.__doc__ = """Data of a followed file, offset is the position of data in the file at path"""
+
+TRUNCATE_EVENT = "file truncated"
+DELETE_EVENT = "file deleted"
+ROTATE_EVENT = "file rotated"
+
+
+class FileFollower():  # pylint: disable=too-many-instance-attributes
+    """
+    tail -F of a file in an allocation directory, iterating over FileChunk.
+
+    The stream is reopened from the last delivered offset when the connection drops or stays
+    silent (no data nor heartbeat) for `read_timeout` seconds, data already delivered is never
+    sent again. A truncated file is followed from its new start, a deleted one is waited for
+    until it is created again. Rotated files ending with a number, like the task logs
+    `alloc/logs/<task>.stdout.<N>`, are followed into the next index once the current file
+    is deleted, or idle while the next one exists and every byte of the current one was read.
+
+    `path` and `offset` are the position to resume from, e.g. after a restart of the process.
+
+    Built by nomad.api.client.stream_file.follow.
+    """
+
+    ROTATED = re.compile(r"^(.*\.)(\d+)$")
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, open_stream, stat_file, path, offset=0, origin="start", rotate=True, retry_delay=1, rotation_check=5,
+    ):
+        self.path = path
+        self.offset = offset
+        self.origin = origin
+        self.rotate = rotate
+        self.retry_delay = retry_delay
+        self.rotation_check = rotation_check
+        self._open_stream = open_stream
+        self._stat_file = stat_file
+        self._stream = None
+        self._closed = threading.Event()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(path={self.path}, offset={self.offset})"
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path={self.path}, offset={self.offset})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Stop following, interrupting a pending read. """
+        self._closed.set()
+        if self._stream is not None:
+            self._stream.close()
+
+    def __iter__(self):
+        while not self._closed.is_set():
+            try:
+                self._stream = self._open_stream(self.path, self.offset, self.origin)
+            except nomad.api.exceptions.URLNotFoundNomadException:
+                if not self._rotated():
+                    self._closed.wait(self.retry_delay)
+                continue
+            except nomad.api.exceptions.BaseNomadException:
+                self._closed.wait(self.retry_delay)
+                continue
+
+            try:
+                ended = yield from self._read(self._stream)
+            except (nomad.api.exceptions.BaseNomadException, AttributeError, OSError, ValueError):
+                # dropped connection, or a response closed by close() from another thread
+                ended = None
+            finally:
+                self._stream.close()
+
+            if ended == DELETE_EVENT and not self._rotated():
+                # tail -F: wait for the file to be created again
+                self.offset = 0
+            elif ended in (DELETE_EVENT, ROTATE_EVENT):
+                continue
+            self._closed.wait(self.retry_delay)
+
+    def _read(self, stream):
+        """ Yield the chunks of one connection, returns how it ended: DELETE_EVENT, ROTATE_EVENT or None. """
+        idle_since = time.monotonic()
+        for frame in stream.frames(heartbeats=True):
+            event = frame.get("FileEvent")
+            if event == DELETE_EVENT:
+                return DELETE_EVENT
+            if event == TRUNCATE_EVENT:
+                self.offset = 0
+
+            data = frame["Data"]
+            start = frame["Offset"] - len(data)
+            if start < self.offset:
+                data = data[self.offset - start:]
+                start = self.offset
+            if data:
+                self.offset, self.origin = frame["Offset"], "start"
+                idle_since = time.monotonic()
+                yield FileChunk(self.path, start, data)
+            elif time.monotonic() - idle_since > self.rotation_check:
+                idle_since = time.monotonic()
+                if self._rotated(require_read=True):
+                    return ROTATE_EVENT
+        return None
+
+    def _rotated(self, require_read=False):
+        """ Move to the next file of a rotated series if it exists. """
+        match = self.ROTATED.match(self.path) if self.rotate else None
+        if match is None:
+            return False
+        following = f"{match.group(1)}{int(match.group(2)) + 1}"
+        try:
+            self._stat_file(following)
+            if require_read and self._stat_file(self.path)["Size"] > self.offset:
+                return False
+        except nomad.api.exceptions.URLNotFoundNomadException:
+            return False
+        self.path, self.offset, self.origin = following, 0, "start"
+        return True
+
+
+LogMatch = collections.namedtuple("LogMatch", ["alloc_id", "type", "path", "offset", "line", "before", "after"])
+LogMatch.__doc__ = """Line matched by stream_logs.grep with its context lines, in file order.
+path is the log file for reverse scans and None for the log stream, offset the position of line in it"""
+
+
+def iter_lines(chunks):
+    """ Split (offset, bytes) chunks into (offset, line) without the line endings. """
+    pending, pending_offset = b"", 0
+    for offset, data in chunks:
+        if not pending:
+            pending_offset = offset
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield pending_offset, line
+            pending_offset += len(line) + 1
+    if pending:
+        yield pending_offset, pending
+
+
+def iter_lines_reversed(read, size, block_size=256 * 1024):
+    """ Lines of a file from the last to the first, reading blocks backwards.
+
+        arguments:
+          - read: callable(offset, limit) returning bytes
+          - size: (int) size of the file
+          - block_size: (int) bytes read at once
+        returns: generator of (offset, line) without the line endings
+    """
+    position, carry = size, b""
+    while position > 0:
+        start = max(0, position - block_size)
+        lines = (read(start, position - start) + carry).split(b"\n")
+        offsets = [start]
+        for line in lines[:-1]:
+            offsets.append(offsets[-1] + len(line) + 1)
+        if position == size and lines[-1] == b"":
+            # nothing after the final line ending
+            lines.pop()
+        # the first line may begin in the previous block
+        first = 1 if start > 0 else 0
+        carry = lines[0] if first else b""
+        for index in range(len(lines) - 1, first - 1, -1):
+            yield offsets[index], lines[index]
+        position = start
+
+
+def grep_lines(lines, regex, context=0, reverse=False, stop=None):
+    """ Search lines with a compiled regex, yielding (offset, line, before, after).
+
+        arguments:
+          - lines: iterable of (offset, bytes line)
+          - regex: compiled pattern, a str pattern gets lines decoded as utf-8
+          - context: (int) number of lines kept before and after each match
+          - reverse: (bool) the lines come last to first, context is given back in file order
+          - stop: threading.Event ending the search early
+    """
+    decode = isinstance(regex.pattern, str)
+    previous = collections.deque(maxlen=context)
+    waiting = []
+    for offset, line in lines:
+        if stop is not None and stop.is_set():
+            break
+        if decode:
+            line = line.decode("utf-8", errors="replace")
+        for match in waiting:
+            match[3].append(line)
+        while waiting and len(waiting[0][3]) == context:
+            yield _in_file_order(waiting.pop(0), reverse)
+        if regex.search(line):
+            match = (offset, line, list(previous), [])
+            if context:
+                waiting.append(match)
+            else:
+                yield _in_file_order(match, reverse)
+        previous.append(line)
+    for match in waiting:
+        yield _in_file_order(match, reverse)
+
+
+def _in_file_order(match, reverse):
+    offset, line, before, after = match
+    if reverse:
+        return offset, line, after[::-1], before[::-1]
+    return offset, line, before, after
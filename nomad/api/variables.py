@@ -1,5 +1,12 @@
 """Nomad Valiables API: https://developer.hashicorp.com/nomad/api-docs/variables"""
+import hashlib
+import json
+
+import nomad.api.exceptions
+
 from nomad.api.base import Requester
+from nomad.api.concurrency import run_concurrently
+from nomad.api.variable import Variable
 
 
 class Variables(Requester):
@@ -64,3 +71,94 @@ class Variables(Requester):
             params["namespace"] = namespace
 
         return self.request(params=params, method="get").json()
+
+    def export_variables(self, fileobj, prefix="", namespace=None, max_workers=8):
+        """
+        Export the variables under a prefix to a NDJSON file, one variable (with its Items) per line.
+        Variables are listed once and fetched concurrently, lines are written as they arrive.
+
+        arguments:
+            - fileobj, text file object the NDJSON lines are written to
+        optional_arguments:
+            - prefix, (default "") only export variables under this path prefix
+            - namespace :(str) optional, namespace to export, * for every authorized namespace
+            - max_workers :(int) maximum number of concurrent fetches, default 8
+        returns: dict, {"exported": int, "failed": {path: exception}}
+        raises:
+            - nomad.api.exceptions.BaseNomadException
+        """
+        variable = self._sibling(Variable)
+        report = {"exported": 0, "failed": {}}
+
+        def fetch(stub):
+            return variable.get_variable(stub["Path"], namespace=stub.get("Namespace"))
+
+        stubs = self.get_variables(prefix=prefix, namespace=namespace)
+        for outcome in run_concurrently(fetch, stubs, max_workers=max_workers, limiter=self.concurrency_limiter):
+            if outcome.error is not None:
+                report["failed"][outcome.item["Path"]] = outcome.error
+                continue
+            fileobj.write(json.dumps(outcome.result, sort_keys=True) + "\n")
+            report["exported"] += 1
+
+        return report
+
+    def import_variables(self, fileobj, namespace=None, max_workers=8):
+        """
+        Import variables from a NDJSON file written by export_variables.
+
+        Variables are written concurrently with cas set to the ModifyIndex read just before,
+        so a variable changed in the meantime is reported as a conflict instead of being
+        overwritten. Variables whose Items are unchanged (same hash) are not written.
+
+        arguments:
+            - fileobj, text file object to read the NDJSON lines from
+        optional_arguments:
+            - namespace :(str) optional, import every variable into this namespace instead of its own
+            - max_workers :(int) maximum number of concurrent writes, default 8
+        returns: dict, {"created": [paths], "updated": [paths], "unchanged": [paths],
+                        "conflicts": [paths], "failed": {path: exception}}
+        """
+        variable = self._sibling(Variable)
+        report = {"created": [], "updated": [], "unchanged": [], "conflicts": [], "failed": {}}
+
+        def records(fileobj):
+            for line in fileobj:
+                if line.strip():
+                    yield json.loads(line)
+
+        def write(record):
+            target_namespace = namespace or record.get("Namespace")
+            try:
+                current = variable.get_variable(record["Path"], namespace=target_namespace)
+            except nomad.api.exceptions.URLNotFoundNomadException:
+                current = None
+
+            if current is not None and _items_hash(current.get("Items")) == _items_hash(record.get("Items")):
+                return "unchanged"
+
+            variable.create_variable(
+                record["Path"],
+                {"Items": record.get("Items") or {}},
+                namespace=target_namespace,
+                cas=current["ModifyIndex"] if current is not None else 0,
+            )
+            return "created" if current is None else "updated"
+
+        outcomes = run_concurrently(
+            write, records(fileobj), max_workers=max_workers, limiter=self.concurrency_limiter
+        )
+        for outcome in outcomes:
+            path = outcome.item["Path"]
+            if isinstance(outcome.error, nomad.api.exceptions.VariableConflict):
+                report["conflicts"].append(path)
+            elif outcome.error is not None:
+                report["failed"][path] = outcome.error
+            else:
+                report[outcome.result].append(path)
+
+        return report
+
+
+def _items_hash(items):
+    return hashlib.sha256(json.dumps(items or {}, sort_keys=True).encode("utf-8")).hexdigest()
@@ -0,0 +1,110 @@
+import pytest
+import responses
+
+import nomad
+import tests.common as common
+from nomad.api import cache as cache_module
+from nomad.api import exceptions
+
+
+SELF_URL = "http://{ip}:{port}/v1/acl/token/self".format(ip=common.IP, port=common.NOMAD_PORT)
+POLICY_URL = "http://{ip}:{port}/v1/acl/policy/readonly".format(ip=common.IP, port=common.NOMAD_PORT)
+
+TOKEN = {"AccessorID": "accessor", "SecretID": "secret", "Policies": ["readonly"], "ExpirationTime": None}
+POLICY = {"Name": "readonly", "Rules": 'namespace "default" { policy = "read" }'}
+
+
+@responses.activate
+def test_acl_cache_resolve_served_locally(nomad_setup):
+    responses.add(responses.GET, SELF_URL, status=200, json=TOKEN)
+    responses.add(responses.GET, POLICY_URL, status=200, json=POLICY)
+    cache = nomad.api.AclCache(nomad_setup)
+
+    for _ in range(3):
+        token, policies = cache.resolve("secret")
+        assert token["AccessorID"] == "accessor"
+        assert policies[0]["Rules"] == POLICY["Rules"]
+
+    assert len(responses.calls) == 2
+    assert responses.calls[0].request.headers["X-Nomad-Token"] == "secret"
+
+
+@responses.activate
+def test_acl_cache_negative_caching(nomad_setup):
+    responses.add(responses.GET, SELF_URL, status=403, body="ACL token not found")
+    cache = nomad.api.AclCache(nomad_setup)
+
+    for _ in range(3):
+        with pytest.raises(exceptions.URLNotAuthorizedNomadException):
+            cache.get_token("invalid")
+
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_acl_cache_token_expiration_time(nomad_setup):
+    expired = dict(TOKEN, ExpirationTime="2001-01-01T00:00:00.123456789Z")
+    responses.add(responses.GET, SELF_URL, status=200, json=expired)
+    cache = nomad.api.AclCache(nomad_setup)
+
+    cache.get_token("secret")
+    cache.get_token("secret")
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_acl_cache_invalidated_by_events(nomad_setup):
+    responses.add(responses.GET, SELF_URL, status=200, json=TOKEN)
+    responses.add(responses.GET, POLICY_URL, status=200, json=POLICY)
+    cache = nomad.api.AclCache(nomad_setup)
+    cache.resolve("secret")
+
+    cache.handle_event({"Topic": "ACLToken", "Type": "ACLTokenUpserted", "Key": "accessor"})
+    cache.handle_event({"Topic": "ACLPolicy", "Type": "ACLPolicyUpserted", "Key": "readonly"})
+    cache.resolve("secret")
+
+    assert len(responses.calls) == 4
+
+
+@responses.activate
+@pytest.mark.parametrize("secret_id", ["", None])
+def test_acl_cache_rejects_missing_secret(secret_id):
+    responses.add(responses.GET, SELF_URL, status=200, json=dict(TOKEN, Policies=["management"]))
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, token="gateway-management-token")
+    cache = nomad.api.AclCache(n)
+
+    with pytest.raises(exceptions.URLNotAuthorizedNomadException):
+        cache.resolve(secret_id)
+    assert len(responses.calls) == 0
+
+
+@responses.activate
+def test_explicit_empty_token_does_not_use_client_token():
+    responses.add(responses.GET, SELF_URL, status=403, body="ACL token not found")
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, token="gateway-management-token")
+
+    with pytest.raises(exceptions.URLNotAuthorizedNomadException):
+        n.acl.get_self_token(token="")
+    assert "X-Nomad-Token" not in responses.calls[0].request.headers
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2001-01-01T00:00:00.5Z", 978307200.5),
+    ("2001-01-01T00:00:00.12345Z", 978307200.12345),
+    ("2001-01-01T00:00:00.123456789Z", 978307200.123456),
+    ("2001-01-01T02:00:00.1+02:00", 978307200.1),
+    ("2001-01-01T00:00:00Z", 978307200),
+])
+def test_acl_cache_parse_go_time(value, expected):
+    assert cache_module._parse_time(value) == pytest.approx(expected)
+
+
+@responses.activate
+def test_acl_cache_token_expiration_time_short_fraction(nomad_setup):
+    expired = dict(TOKEN, ExpirationTime="2001-01-01T00:00:00.5Z")
+    responses.add(responses.GET, SELF_URL, status=200, json=expired)
+    cache = nomad.api.AclCache(nomad_setup)
+
+    cache.get_token("secret")
+    cache.get_token("secret")
+    assert len(responses.calls) == 2
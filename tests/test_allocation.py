@@ -4,6 +4,9 @@ import uuid
 import responses
 import tests.common as common
 import os
+import time
+
+import nomad
 
 
 # integration tests requires nomad Vagrant VM or Binary running
@@ -74,3 +77,76 @@ def test_get_allocation_with_namespace(nomad_setup_with_namespace):
         json={"ID": "a8198d79-cfdb-6593-a999-1e9adabcba2e","EvalID": "5456bd7a-9fc0-c0dd-6131-cbee77f57577","Namespace": common.NOMAD_NAMESPACE, "Name": "example.cache[0]","NodeID": "fb2170a8-257d-3c64-b14d-bc06cc94e34c","PreviousAllocation": "516d2753-0513-cfc7-57ac-2d6fac18b9dc","NextAllocation": "cd13d9b9-4f97-7184-c88b-7b451981616b"}
     )
     assert common.NOMAD_NAMESPACE in nomad_setup_with_namespace.allocation.get_allocation("a8198d79-cfdb-6593-a999-1e9adabcba2e")["Namespace"]
+
+
+@responses.activate
+def test_stop_allocations_tracks_replacements(nomad_setup):
+    base = "http://{ip}:{port}/v1".format(ip=common.IP, port=common.NOMAD_PORT)
+    for alloc_id in ["a1", "a2"]:
+        responses.add(responses.POST, base + "/allocation/{}/stop".format(alloc_id), status=200,
+                      json={"EvalID": "eval-" + alloc_id, "Index": 20})
+        responses.add(responses.GET, base + "/evaluation/eval-" + alloc_id, status=200,
+                      json={"ID": "eval-" + alloc_id, "Status": "pending", "ModifyIndex": 20})
+        responses.add(responses.GET, base + "/evaluation/eval-{}?index=20&wait=1s".format(alloc_id), status=200,
+                      json={"ID": "eval-" + alloc_id, "Status": "complete", "ModifyIndex": 21})
+        responses.add(responses.GET, base + "/evaluation/eval-{}/allocations".format(alloc_id), status=200,
+                      json=[{"ID": "new-" + alloc_id, "PreviousAllocation": alloc_id, "DesiredStatus": "run"}])
+        responses.add(responses.GET, base + "/allocation/new-" + alloc_id, status=200,
+                      json={"ID": "new-" + alloc_id, "ClientStatus": "pending", "ModifyIndex": 22})
+        responses.add(responses.GET, base + "/allocation/new-{}?index=22&wait=1s".format(alloc_id), status=200,
+                      json={"ID": "new-" + alloc_id, "ClientStatus": "running", "ModifyIndex": 23})
+    stages = []
+
+    outcomes = list(nomad_setup.allocation.stop_allocations(
+        ["a1", "a2"], wait=1, progress=lambda _id, stage, data: stages.append((_id, stage))
+    ))
+
+    assert sorted(outcome.item for outcome in outcomes) == ["a1", "a2"]
+    for outcome in outcomes:
+        assert outcome.error is None
+        assert outcome.result["Evaluation"]["Status"] == "complete"
+        assert outcome.result["Replacements"][0]["ClientStatus"] == "running"
+    assert [stage for _id, stage in stages if _id == "a1"] == ["stopped", "evaluated", "replaced"]
+
+
+@responses.activate
+def test_restart_allocations(nomad_setup):
+    base = "http://{ip}:{port}/v1".format(ip=common.IP, port=common.NOMAD_PORT)
+    responses.add(responses.POST, base + "/client/allocation/a1/restart", status=200, json={})
+    responses.add(responses.POST, base + "/client/allocation/a2/restart", status=404, body="not found")
+
+    outcomes = {o.item: o for o in nomad_setup.client.allocation.restart_allocations(["a1", "a2"])}
+
+    assert outcomes["a1"].error is None
+    assert outcomes["a2"].error is not None
+
+
+@responses.activate
+def test_wait_for_client_status_timeout(nomad_setup):
+    url = "http://{ip}:{port}/v1/allocation/stuck".format(ip=common.IP, port=common.NOMAD_PORT)
+
+    def pending(request):
+        time.sleep(0.2)
+        return 200, {}, json.dumps({"ID": "stuck", "ClientStatus": "pending", "ModifyIndex": 5})
+
+    responses.add_callback(responses.GET, url, callback=pending)
+
+    with pytest.raises(nomad.api.exceptions.TimeoutNomadException):
+        nomad_setup.allocation.wait_for_client_status("stuck", wait=1, timeout=0.5)
+    assert 2 <= len(responses.calls) <= 4
+    assert "wait=1s" in responses.calls[1].request.url
+
+
+@responses.activate
+def test_stop_allocations_ignores_unrelated_placements(nomad_setup):
+    base = "http://{ip}:{port}/v1".format(ip=common.IP, port=common.NOMAD_PORT)
+    responses.add(responses.POST, base + "/allocation/a1/stop", status=200, json={"EvalID": "e1", "Index": 20})
+    responses.add(responses.GET, base + "/evaluation/e1", status=200,
+                  json={"ID": "e1", "Status": "complete", "ModifyIndex": 20})
+    responses.add(responses.GET, base + "/evaluation/e1/allocations", status=200,
+                  json=[{"ID": "other", "PreviousAllocation": "", "DesiredStatus": "run"}])
+
+    outcomes = list(nomad_setup.allocation.stop_allocations(["a1"], timeout=5))
+
+    assert outcomes[0].error is None
+    assert outcomes[0].result["Replacements"] == []
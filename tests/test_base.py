@@ -1,4 +1,6 @@
 import os
+import subprocess
+import sys
 
 import mock
 import pytest
@@ -129,3 +131,89 @@ def test_base_use_address_instead_on_host_port():
     nomad_address = "https://nomad.service.consul:4646"
     n = nomad.Nomad(address=nomad_address, host=common.IP, port=common.NOMAD_PORT, verify=False, token=common.NOMAD_TOKEN)
     n.jobs.get_jobs()
+
+
+def test_base_endpoints_share_one_session():
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, verify=False, token=common.NOMAD_TOKEN)
+
+    assert n.jobs.session is n.job.session
+    assert n.client.cat.session is n.allocations.session
+
+
+def test_base_scoped_views_share_session():
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, verify=False, token="parent", region="global")
+    view = n.with_token("child").with_namespace("team").with_region("eu")
+
+    assert view.jobs.session is n.jobs.session
+    assert view.get_token() == "child"
+    assert view.get_namespace() == "team"
+    assert view.jobs.region == "eu"
+    assert view.client.cat.token == "child"
+    assert n.get_token() == "parent"
+    assert n.get_namespace() is None
+    assert n.jobs.region == "global"
+
+
+@responses.activate
+def test_base_scoped_view_token_header():
+    responses.add(responses.GET, "http://{ip}:{port}/v1/jobs".format(ip=common.IP, port=common.NOMAD_PORT), status=200, json=[])
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, verify=False, token="parent")
+
+    n.with_token("child").jobs.get_jobs()
+    n.jobs.with_token("per-call").get_jobs()
+    n.jobs.get_jobs()
+
+    assert [call.request.headers["X-Nomad-Token"] for call in responses.calls] == ["child", "per-call", "parent"]
+
+
+@responses.activate
+def test_base_endpoint_with_namespace_and_region():
+    responses.add(
+        responses.GET,
+        "http://{ip}:{port}/v1/jobs?namespace=team&region=eu".format(ip=common.IP, port=common.NOMAD_PORT),
+        status=200,
+        json=[],
+    )
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, verify=False)
+
+    n.jobs.with_namespace("team").with_region("eu").get_jobs()
+    assert n.jobs.namespace is None
+
+
+def test_base_endpoints_created_lazily():
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, verify=False, token=common.NOMAD_TOKEN)
+
+    assert n._endpoints == {}
+    assert n.jobs is n.jobs
+    assert list(n._endpoints) == ["Jobs"]
+
+
+def test_base_import_is_lazy():
+    code = (
+        "import sys, nomad; nomad.Nomad(); "
+        "print(sorted(m for m in sys.modules if m == 'requests' or m.startswith('nomad.api.')))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(__file__)))
+    assert output.strip() == b"[]"
+
+
+@responses.activate
+def test_base_fan_out_tags_results_with_origin():
+    base = "http://{ip}:{port}/v1".format(ip=common.IP, port=common.NOMAD_PORT)
+    responses.add(responses.GET, base + "/regions", status=200, json=["eu", "us"])
+    responses.add(responses.GET, base + "/namespaces", status=200, json=[{"Name": "default"}, {"Name": "team"}])
+    for region in ["eu", "us"]:
+        for namespace in ["default", "team"]:
+            responses.add(
+                responses.GET,
+                base + "/jobs?namespace={}&region={}".format(namespace, region),
+                status=200 if (region, namespace) != ("us", "team") else 500,
+                json=[{"ID": "{}-{}".format(region, namespace)}],
+            )
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, verify=False)
+
+    outcomes = {o.item: o for o in n.fan_out(lambda c: c.jobs.get_jobs(), regions="*", namespaces="*", timeout=1)}
+
+    assert set(outcomes) == {("eu", "default"), ("eu", "team"), ("us", "default"), ("us", "team")}
+    assert outcomes[("eu", "team")].result == [{"ID": "eu-team"}]
+    assert isinstance(outcomes[("us", "team")].error, nomad.api.exceptions.BaseNomadException)
@@ -0,0 +1,111 @@
+import os
+import time
+
+import responses
+
+import nomad
+import tests.common as common
+
+
+REGIONS_URL = "http://{ip}:{port}/v1/regions".format(ip=common.IP, port=common.NOMAD_PORT)
+
+
+def _nomad(cache, token=common.NOMAD_TOKEN):
+    return nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, verify=False, token=token, cache=cache)
+
+
+@responses.activate
+def test_cache_served_without_round_trip(tmp_path):
+    responses.add(responses.GET, REGIONS_URL, status=200, json=["global"], headers={"X-Nomad-Index": "7"})
+    cache = nomad.api.DiskCache(path=str(tmp_path), ttl=60)
+
+    assert _nomad(cache).regions.get_regions() == ["global"]
+    assert _nomad(cache).regions.get_regions() == ["global"]
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_cache_shared_between_instances(tmp_path):
+    responses.add(responses.GET, REGIONS_URL, status=200, json=["global"])
+
+    _nomad(nomad.api.DiskCache(path=str(tmp_path), ttl=60)).regions.get_regions()
+    # a new process only shares the directory
+    assert _nomad(nomad.api.DiskCache(path=str(tmp_path), ttl=60)).regions.get_regions() == ["global"]
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_cache_revalidates_when_expired(tmp_path):
+    responses.add(responses.GET, REGIONS_URL, status=200, json=["global"], headers={"X-Nomad-Index": "7"})
+    responses.add(responses.GET, REGIONS_URL, status=200, json=["global", "eu"], headers={"X-Nomad-Index": "8"})
+    cache = nomad.api.DiskCache(path=str(tmp_path), ttl=0)
+
+    assert _nomad(cache).regions.get_regions() == ["global"]
+    assert _nomad(cache).regions.get_regions() == ["global", "eu"]
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_cache_keeps_entry_with_higher_index(tmp_path):
+    responses.add(responses.GET, REGIONS_URL, status=200, json=["global", "eu"], headers={"X-Nomad-Index": "8"})
+    responses.add(responses.GET, REGIONS_URL, status=200, json=["global"], headers={"X-Nomad-Index": "7"})
+    cache = nomad.api.DiskCache(path=str(tmp_path), ttl=0)
+
+    assert _nomad(cache).regions.get_regions() == ["global", "eu"]
+    assert _nomad(cache).regions.get_regions() == ["global", "eu"]
+
+
+@responses.activate
+def test_cache_key_depends_on_token(tmp_path):
+    responses.add(responses.GET, REGIONS_URL, status=200, json=["global"])
+    cache = nomad.api.DiskCache(path=str(tmp_path), ttl=60)
+
+    _nomad(cache, token="token-a").regions.get_regions()
+    _nomad(cache, token="token-b").regions.get_regions()
+    assert len(responses.calls) == 2
+    for entry in tmp_path.iterdir():
+        assert "token-a" not in entry.read_text()
+
+
+@responses.activate
+def test_cache_not_used_for_uncacheable_endpoints(tmp_path):
+    responses.add(responses.GET, "http://{ip}:{port}/v1/jobs".format(ip=common.IP, port=common.NOMAD_PORT), status=200, json=[])
+    cache = nomad.api.DiskCache(path=str(tmp_path), ttl=60)
+
+    _nomad(cache).jobs.get_jobs()
+    _nomad(cache).jobs.get_jobs()
+    assert len(responses.calls) == 2
+
+
+def test_cache_clear(tmp_path):
+    cache = nomad.api.DiskCache(path=str(tmp_path), ttl=60)
+    cache.put("key", {"url": "http://x", "index": 1, "body": "[]"})
+    assert cache.get("key")["body"] == "[]"
+
+    cache.clear()
+    assert cache.get("key") is None
+
+
+def test_cache_prune_removes_stale_entries(tmp_path):
+    cache = nomad.api.DiskCache(path=str(tmp_path), ttl=60, max_age=3600)
+    cache.put("old", {"url": "http://x", "index": 1, "body": "[]"})
+    cache.put("new", {"url": "http://x", "index": 2, "body": "[]"})
+    stale = time.time() - 7200
+    os.utime(str(tmp_path / "old.json"), (stale, stale))
+
+    assert cache.prune() == 1
+    assert cache.get("old") is None
+    assert cache.get("new")["index"] == 2
+
+
+@responses.activate
+def test_evaluations_hydrate_not_cached(tmp_path):
+    url = "http://{ip}:{port}/v1/evaluation/e1".format(ip=common.IP, port=common.NOMAD_PORT)
+    responses.add(responses.GET, url, status=200, json={"ID": "e1", "ModifyIndex": 3})
+    cache = nomad.api.DiskCache(path=str(tmp_path), ttl=60)
+
+    for _ in range(2):
+        outcomes = list(_nomad(cache).evaluations.hydrate([{"ID": "e1", "ModifyIndex": 3}]))
+        assert outcomes[0].result["ID"] == "e1"
+    assert len(responses.calls) == 2
+    assert not list(tmp_path.iterdir())
@@ -2,8 +2,19 @@ import pytest
 import json
 import time
 import os
+import base64
+import io
+import hashlib
+import re
+from urllib.parse import parse_qs, urlparse
+
+import requests
+import responses
+import urllib3
 
 import nomad
+import tests.common as common
+from nomad.api.streaming import copy_response, decode_frames
 
 from flaky import flaky
 
@@ -95,3 +106,433 @@ def test_dunder_getattr(nomad_setup):
 
     with pytest.raises(AttributeError):
         d = nomad_setup.client.stat.does_not_exist
+
+
+LOGS_URL = "http://{ip}:{port}/v1/client/fs/logs/a1".format(ip=common.IP, port=common.NOMAD_PORT)
+
+
+def _frame(offset, data, **extra):
+    return json.dumps(dict({"Offset": offset, "Data": base64.b64encode(data).decode()}, **extra))
+
+
+def test_decode_frames_across_chunk_boundaries():
+    body = (_frame(5, b"hello") + "{}" + "\n" + _frame(11, b" world")).encode()
+    chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+
+    frames = list(decode_frames(chunks))
+
+    assert [frame.get("Offset") for frame in frames] == [5, None, 11]
+
+
+@pytest.mark.parametrize("sink", [bytearray(10), io.BytesIO()])
+def test_copy_response_dropped_connection(sink):
+    # the server announced 10 bytes and closed the connection after 3
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = urllib3.HTTPResponse(
+        body=io.BytesIO(b"abc"), headers={"content-length": "10"}, preload_content=False,
+        enforce_content_length=True,
+    )
+
+    with pytest.raises(nomad.api.exceptions.BaseNomadException):
+        copy_response(response, sink)
+
+
+@responses.activate
+def test_iter_logs_decodes_frames(nomad_setup):
+    responses.add(responses.GET, LOGS_URL, status=200, body=_frame(5, b"hello") + "{}" + _frame(11, b" world"))
+
+    stream = nomad_setup.client.stream_logs.iter_logs("a1", "redis", "stdout")
+    chunks = list(stream)
+
+    assert chunks == [(0, b"hello"), (5, b" world")]
+    assert stream.offset == 11
+    assert "follow=False" in responses.calls[0].request.url
+
+
+@responses.activate
+def test_iter_logs_plain_counts_offset(nomad_setup):
+    responses.add(responses.GET, LOGS_URL, status=200, body=b"line 1\nline 2\n")
+
+    with nomad_setup.client.stream_logs.iter_logs("a1", "redis", "stderr", offset=100, plain=True) as stream:
+        data = b"".join(chunk for _, chunk in stream)
+
+    assert data == b"line 1\nline 2\n"
+    assert stream.offset == 114
+
+
+READAT_URL = "http://{ip}:{port}/v1/client/fs/readat/a1".format(ip=common.IP, port=common.NOMAD_PORT)
+STAT_URL = "http://{ip}:{port}/v1/client/fs/stat/a1".format(ip=common.IP, port=common.NOMAD_PORT)
+
+
+def _serve_file(content, fail_offsets=()):
+    fail_offsets = set(fail_offsets)
+    requested = []
+
+    def read_at(request):
+        query = parse_qs(urlparse(request.url).query)
+        offset, limit = int(query["offset"][0]), int(query["limit"][0])
+        requested.append(offset)
+        if offset in fail_offsets:
+            fail_offsets.discard(offset)
+            return 500, {}, "boom"
+        return 200, {}, content[offset:offset + limit]
+
+    responses.add(responses.GET, STAT_URL, status=200, json={"Name": "dump", "Size": len(content), "ModTime": "t1"})
+    responses.add_callback(responses.GET, READAT_URL, callback=read_at)
+    return requested
+
+
+@responses.activate
+def test_download_file_fetches_ranges(nomad_setup, tmp_path):
+    content = bytes(range(256)) * 40
+    requested = _serve_file(content)
+    destination = str(tmp_path / "dump")
+
+    result = nomad_setup.client.read_at.download_file(
+        "a1", "/alloc/dump", destination, chunk_size=1000,
+        checksum="sha256:" + hashlib.sha256(content).hexdigest(),
+    )
+
+    assert open(destination, "rb").read() == content
+    assert result["Chunks"] == 11 and result["Resumed"] == 0
+    assert sorted(requested) == list(range(0, len(content), 1000))
+    assert not os.path.exists(destination + ".progress")
+
+
+@responses.activate
+def test_download_file_resumes(nomad_setup, tmp_path):
+    content = os.urandom(5000)
+    requested = _serve_file(content, fail_offsets=[3000])
+    destination = str(tmp_path / "dump")
+
+    with pytest.raises(nomad.api.exceptions.BaseNomadException):
+        nomad_setup.client.read_at.download_file("a1", "/alloc/dump", destination, chunk_size=1000)
+    assert os.path.exists(destination + ".progress")
+
+    del requested[:]
+    result = nomad_setup.client.read_at.download_file("a1", "/alloc/dump", destination, chunk_size=1000)
+
+    assert requested == [3000]
+    assert result["Resumed"] == 4
+    assert open(destination, "rb").read() == content
+
+
+@responses.activate
+def test_download_file_checksum_mismatch(nomad_setup, tmp_path):
+    _serve_file(b"payload")
+
+    with pytest.raises(nomad.api.exceptions.InvalidParameters):
+        nomad_setup.client.read_at.download_file(
+            "a1", "/alloc/dump", str(tmp_path / "dump"), checksum="sha256:" + "0" * 64
+        )
+
+
+@responses.activate
+def test_download_empty_file_changed(nomad_setup, tmp_path):
+    responses.add(responses.GET, STAT_URL, status=200, json={"Name": "empty", "Size": 0, "ModTime": "t1"})
+    responses.add(responses.GET, STAT_URL, status=200, json={"Name": "empty", "Size": 0, "ModTime": "t2"})
+    destination = str(tmp_path / "empty")
+
+    with pytest.raises(nomad.api.exceptions.InvalidParameters):
+        nomad_setup.client.read_at.download_file("a1", "/alloc/empty", destination)
+    assert not os.path.exists(destination + ".progress")
+
+
+CAT_URL = "http://{ip}:{port}/v1/client/fs/cat/a1".format(ip=common.IP, port=common.NOMAD_PORT)
+STREAM_URL = "http://{ip}:{port}/v1/client/fs/stream/a1".format(ip=common.IP, port=common.NOMAD_PORT)
+
+
+@responses.activate
+def test_read_file_into_sinks(nomad_setup, tmp_path):
+    content = bytes(range(256)) * 1000
+    responses.add(responses.GET, CAT_URL, status=200, body=content)
+
+    with open(str(tmp_path / "copy"), "wb") as file:
+        assert nomad_setup.client.cat.read_file_into("a1", file, path="/alloc/dump", chunk_size=1000) == len(content)
+    assert open(str(tmp_path / "copy"), "rb").read() == content
+
+    chunks = []
+    assert nomad_setup.client.cat.read_file_into("a1", chunks.append, chunk_size=4096) == len(content)
+    assert max(len(chunk) for chunk in chunks) <= 4096
+    assert b"".join(chunks) == content
+
+
+@responses.activate
+def test_read_file_offset_into_buffer(nomad_setup):
+    responses.add(responses.GET, READAT_URL, status=200, body=b"0123456789")
+    buffer = bytearray(16)
+
+    count = nomad_setup.client.read_at.read_file_offset_into("a1", 0, 10, memoryview(buffer)[2:], path="/f")
+
+    assert count == 10
+    assert bytes(buffer[2:12]) == b"0123456789"
+    with pytest.raises(nomad.api.exceptions.InvalidParameters):
+        nomad_setup.client.read_at.read_file_offset_into("a1", 0, 10, b"read only", path="/f")
+
+
+@responses.activate
+def test_stream_into_stops_at_limit(nomad_setup):
+    responses.add(responses.GET, STREAM_URL, status=200, body=_frame(5, b"hello") + "{}" + _frame(11, b" world"))
+    chunks = []
+
+    assert nomad_setup.client.stream_file.stream_into("a1", 0, "start", chunks.append, path="/f", limit=7) == 7
+    assert b"".join(chunks) == b"hello w"
+
+
+def _serve_tree(trees):
+    ls_url = re.compile(r"http://.*/v1/client/fs/ls/(\w+)\?.*")
+
+    def list_files(request):
+        alloc_id = ls_url.match(request.url).group(1)
+        path = parse_qs(urlparse(request.url).query)["path"][0]
+        if path not in trees[alloc_id]:
+            return 404, {}, "no such directory"
+        return 200, {}, json.dumps([
+            {"Name": name, "IsDir": "." not in name, "Size": 1}
+            for name in trees[alloc_id][path]
+        ])
+
+    responses.add_callback(responses.GET, ls_url, callback=list_files)
+
+
+@responses.activate
+def test_walk_allocations(nomad_setup):
+    _serve_tree({
+        "a1": {"/": ["alloc", "web"], "/alloc": ["core.1", "logs"], "/alloc/logs": ["web.stdout.0"], "/web": ["a.txt"]},
+        "a2": {"/": ["alloc"], "/alloc": ["tmp", "core.2"], "/alloc/tmp": ["core.3"]},
+    })
+
+    entries = list(nomad_setup.client.ls.walk(["a1", "a2"], include=["core.*"], exclude=["/alloc/tmp"]))
+
+    walked = sorted((entry.alloc_id, entry.path) for entry in entries)
+    assert walked == [
+        ("a1", "/"), ("a1", "/alloc"), ("a1", "/alloc/logs"), ("a1", "/web"), ("a2", "/"), ("a2", "/alloc"),
+    ]
+    cores = sorted(f["Name"] for entry in entries for f in entry.files)
+    assert cores == ["core.1", "core.2"]
+
+
+@responses.activate
+def test_walk_depth_and_errors(nomad_setup):
+    _serve_tree({"a1": {"/": ["alloc", "gone"], "/alloc": ["logs"], "/alloc/logs": []}})
+    errors = []
+
+    entries = list(nomad_setup.client.ls.walk("a1", max_depth=1, onerror=lambda *args: errors.append(args[:2])))
+
+    assert sorted(entry.path for entry in entries) == ["/", "/alloc"]
+    assert errors == [("a1", "/gone")]
+
+
+@responses.activate
+def test_follow_resumes_after_drop_and_truncate(nomad_setup):
+    for body in (_frame(5, b"hello"), _frame(11, b" world") + "{}", _frame(3, b"new", FileEvent="file truncated")):
+        responses.add(responses.GET, STREAM_URL, status=200, body=body)
+    follower = nomad_setup.client.stream_file.follow("a1", "/alloc/data/app.log", rotate=False)
+    follower.retry_delay = 0
+
+    chunks = []
+    for chunk in follower:
+        chunks.append(chunk)
+        if len(chunks) == 3:
+            follower.close()
+
+    assert [(c.offset, c.data) for c in chunks] == [(0, b"hello"), (5, b" world"), (0, b"new")]
+    offsets = [parse_qs(urlparse(call.request.url).query)["offset"][0] for call in responses.calls[:3]]
+    assert offsets == ["0", "5", "11"]
+    assert follower.offset == 3
+
+
+@responses.activate
+def test_follow_rotates_after_delete(nomad_setup):
+    responses.add(
+        responses.GET, STREAM_URL, status=200, body=_frame(4, b"old\n") + _frame(4, b"", FileEvent="file deleted")
+    )
+    responses.add(responses.GET, STAT_URL, status=200, json={"Name": "web.stdout.1", "Size": 0})
+    responses.add(responses.GET, STREAM_URL, status=200, body=_frame(4, b"new\n"))
+
+    follower = nomad_setup.client.stream_file.follow("a1", "/alloc/logs/web.stdout.0")
+    chunks = []
+    for chunk in follower:
+        chunks.append(chunk)
+        if len(chunks) == 2:
+            follower.close()
+
+    assert chunks == [("/alloc/logs/web.stdout.0", 0, b"old\n"), ("/alloc/logs/web.stdout.1", 0, b"new\n")]
+    assert "path=%2Falloc%2Flogs%2Fweb.stdout.1" in responses.calls[-1].request.url
+
+
+@responses.activate
+def test_grep_logs_forward_with_context(nomad_setup):
+    logs_url = "http://{ip}:{port}/v1/client/fs/logs/".format(ip=common.IP, port=common.NOMAD_PORT)
+    responses.add(responses.GET, logs_url + "a1", status=200, body=_frame(30, b"start\nERROR one\nnext\nok\n"))
+    responses.add(responses.GET, logs_url + "a2", status=200, body=_frame(6, b"fine\n"))
+
+    matches = list(
+        nomad_setup.client.stream_logs.grep(["a1", "a2"], "web", r"ERROR \w+", types=("stdout",), context=1)
+    )
+
+    assert len(matches) == 1
+    assert matches[0].alloc_id == "a1" and matches[0].offset == 12
+    assert (matches[0].line, matches[0].before, matches[0].after) == ("ERROR one", ["start"], ["next"])
+
+
+@responses.activate
+def test_grep_logs_limit_stops_requests(nomad_setup):
+    logs_url = re.compile(r"http://{ip}:{port}/v1/client/fs/logs/a\d+".format(ip=common.IP, port=common.NOMAD_PORT))
+    responses.add(responses.GET, logs_url, status=200, body=_frame(9, b"ERROR hit"))
+
+    matches = list(nomad_setup.client.stream_logs.grep(
+        ["a{}".format(i) for i in range(50)], "web", "ERROR", limit=1, max_workers=4
+    ))
+
+    assert len(matches) == 1
+    assert len(responses.calls) <= 4
+
+
+@responses.activate
+def test_grep_logs_reverse_stops_at_limit(nomad_setup):
+    files = {
+        "/alloc/logs/web.stderr.0": b"ERROR oldest\n",
+        "/alloc/logs/web.stderr.1": b"ERROR old\nERROR recent\nlast\n",
+    }
+    responses.add(
+        responses.GET, "http://{ip}:{port}/v1/client/fs/ls/a1".format(ip=common.IP, port=common.NOMAD_PORT),
+        status=200, json=[
+            {"Name": path.rsplit("/", 1)[1], "IsDir": False, "Size": len(data)} for path, data in files.items()
+        ] + [{"Name": "web.stdout.0", "IsDir": False, "Size": 1}],
+    )
+    reads = []
+
+    def read_at(request):
+        query = parse_qs(urlparse(request.url).query)
+        path, offset, limit = query["path"][0], int(query["offset"][0]), int(query["limit"][0])
+        reads.append(path)
+        return 200, {}, files[path][offset:offset + limit]
+
+    responses.add_callback(responses.GET, READAT_URL, callback=read_at)
+
+    matches = list(nomad_setup.client.stream_logs.grep(
+        "a1", "web", re.compile(b"ERROR"), types=("stderr",), context=1, limit=2, reverse=True
+    ))
+
+    assert [(m.path, m.offset, m.line, m.before, m.after) for m in matches] == [
+        ("/alloc/logs/web.stderr.1", 10, b"ERROR recent", [b"ERROR old"], [b"last"]),
+        ("/alloc/logs/web.stderr.1", 0, b"ERROR old", [], [b"ERROR recent"]),
+    ]
+    assert set(reads) == {"/alloc/logs/web.stderr.1"}
+
+
+def _alloc_stats(cpu, rss, ticks, timestamp):
+    return {
+        "ResourceUsage": {
+            "CpuStats": {"Percent": cpu, "TotalTicks": ticks},
+            "MemoryStats": {"RSS": rss, "Usage": rss},
+        },
+        "Timestamp": int(timestamp * 1e9),
+    }
+
+
+@responses.activate
+def test_allocation_sampler_aggregates(nomad_setup):
+    rounds = {"a1": iter([10, 20, 30, 40, 50]), "a2": iter([1, 1, 1, 1, 90])}
+    now = {"a1": 0, "a2": 0}
+
+    def read_stats(request):
+        alloc_id = request.url.rsplit("/", 2)[-2]
+        cpu = next(rounds[alloc_id])
+        now[alloc_id] += 10
+        return 200, {}, json.dumps(_alloc_stats(cpu, cpu * 1024, cpu * 100, now[alloc_id]))
+
+    url = re.compile(r"http://{ip}:{port}/v1/client/allocation/a\d/stats".format(ip=common.IP, port=common.NOMAD_PORT))
+    responses.add_callback(responses.GET, url, callback=read_stats)
+
+    sampler = nomad_setup.client.allocation.sampler(["a1", "a2"], window=4)
+    assert [sampler.sample() for _ in range(5)] == [2] * 5
+
+    timestamps, values = sampler.series("a1", "cpu_percent")
+    assert list(values) == [20, 30, 40, 50]
+    assert list(timestamps) == [20, 30, 40, 50]
+    aggregate = sampler.aggregate("a1", "cpu_percent")
+    assert aggregate["p50"] == 35 and aggregate["max"] == 50 and aggregate["last"] == 50
+    assert aggregate["p95"] == pytest.approx(48.5)
+    assert sampler.aggregate("a1", "cpu_ticks")["rate"] == pytest.approx(100)
+    assert sampler.top("cpu_percent", k=1, stat="max") == [("a2", 90)]
+    assert sampler.top("memory_rss", k=2, stat="p50") == [("a1", 35 * 1024), ("a2", 1024)]
+
+
+@responses.activate
+def test_allocation_sampler_drops_gone_allocations(nomad_setup):
+    url = re.compile(r"http://{ip}:{port}/v1/client/allocation/a\d/stats".format(ip=common.IP, port=common.NOMAD_PORT))
+    responses.add(responses.GET, url, status=200, json=_alloc_stats(5, 100, 1, time.time()))
+    listed = [["a1", "a2"], ["a1"]]
+
+    sampler = nomad_setup.client.allocation.sampler(lambda: listed.pop(0))
+    sampler.sample()
+    assert sorted(sampler.allocations) == ["a1", "a2"]
+    sampler.sample()
+    assert sampler.allocations == ["a1"]
+    assert len(sampler.series("a1", "cpu_percent")[1]) == 2
+
+
+def _host_stats(cpus, memory_used, disks):
+    return {
+        "CPU": [{"CPU": f"cpu{i}", "Total": total} for i, total in enumerate(cpus)],
+        "CPUTicksConsumed": 1000.0,
+        "Memory": {"Total": 8192, "Used": memory_used, "Available": 8192 - memory_used, "Free": 0},
+        "DiskStats": [{"Mountpoint": f"/d{i}", "Size": size, "Used": used} for i, (size, used) in enumerate(disks)],
+        "Timestamp": 1700000000 * 10**9,
+        "Uptime": 3600,
+    }
+
+
+@responses.activate
+def test_stats_collect_ready_nodes(nomad_setup):
+    responses.add(
+        responses.GET, "http://{ip}:{port}/v1/nodes".format(ip=common.IP, port=common.NOMAD_PORT), status=200,
+        json=[{"ID": "n1", "Status": "ready"}, {"ID": "n2", "Status": "ready"}, {"ID": "n3", "Status": "down"}],
+    )
+    stats = {"n1": _host_stats([10, 30], 1024, [(100, 40), (50, 10)])}
+
+    def read_stats(request):
+        node_id = parse_qs(urlparse(request.url).query)["node_id"][0]
+        if node_id not in stats:
+            return 500, {}, "unreachable"
+        return 200, {}, json.dumps(stats[node_id])
+
+    responses.add_callback(
+        responses.GET, "http://{ip}:{port}/v1/client/stats".format(ip=common.IP, port=common.NOMAD_PORT),
+        callback=read_stats,
+    )
+
+    snapshot = nomad_setup.client.stats.collect(deadline=1)
+
+    assert snapshot.node_ids == ["n1"] and list(snapshot.errors) == ["n2"]
+    assert snapshot.row("n1") == {
+        "timestamp": 1700000000, "uptime": 3600, "cores": 2, "cpu_percent": 20, "cpu_ticks": 1000,
+        "memory_total": 8192, "memory_used": 1024, "memory_available": 7168, "disk_size": 150, "disk_used": 50,
+    }
+    assert snapshot["memory_used"].tolist() == [1024]
+
+    out = io.StringIO()
+    snapshot.write_csv(out)
+    assert out.getvalue().splitlines()[0].startswith("node_id,timestamp,uptime,cores,cpu_percent")
+    assert out.getvalue().splitlines()[1].startswith("n1,")
+
+
+@responses.activate
+def test_stats_collect_enforces_deadline_per_node(nomad_setup):
+    def read_stats(request):
+        if parse_qs(urlparse(request.url).query)["node_id"][0] == "slow":
+            time.sleep(0.3)
+        return 200, {}, json.dumps(_host_stats([10], 1024, [(100, 40)]))
+
+    responses.add_callback(
+        responses.GET, "http://{ip}:{port}/v1/client/stats".format(ip=common.IP, port=common.NOMAD_PORT),
+        callback=read_stats,
+    )
+
+    snapshot = nomad_setup.client.stats.collect(["fast", "slow"], deadline=0.2)
+
+    assert snapshot.node_ids == ["fast"]
+    assert isinstance(snapshot.errors["slow"], nomad.api.exceptions.TimeoutNomadException)
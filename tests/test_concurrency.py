@@ -0,0 +1,126 @@
+import threading
+import time
+
+import requests
+import responses
+
+import nomad
+import tests.common as common
+from nomad.api import exceptions
+from nomad.api.concurrency import AdaptiveLimiter, run_concurrently
+
+
+def _response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+def test_adaptive_limiter_grows_additively():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=4)
+    for _ in range(10):
+        assert limiter.acquire()
+        limiter.release(time.monotonic())
+
+    assert limiter.limit == 4
+    assert limiter.metrics()["in_flight"] == 0
+
+
+def test_adaptive_limiter_backs_off_on_429_and_timeouts():
+    limiter = AdaptiveLimiter(initial_limit=16)
+    limiter.acquire()
+    limiter.release(time.monotonic(), exceptions.BaseNomadException(_response(429)))
+    assert limiter.limit == 8
+
+    limiter.acquire()
+    limiter.release(time.monotonic(), exceptions.BaseNomadException(requests.exceptions.ReadTimeout()))
+    assert limiter.limit == 4
+
+    limiter.acquire()
+    limiter.release(time.monotonic(), exceptions.URLNotFoundNomadException(_response(404)))
+    assert limiter.limit == 4
+
+
+def test_adaptive_limiter_ignores_calls_started_before_a_decrease():
+    limiter = AdaptiveLimiter(initial_limit=16)
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    for _ in range(3):
+        limiter.release(started, exceptions.BaseNomadException(_response(429)))
+
+    assert limiter.limit == 8
+
+
+def test_adaptive_limiter_backs_off_on_latency_increase():
+    limiter = AdaptiveLimiter(initial_limit=16, smoothing=1.0)
+    limiter.acquire()
+    limiter.release(time.monotonic() - 0.01)
+    limiter.acquire()
+    limiter.release(time.monotonic() - 1)
+
+    assert limiter.limit == 8
+
+
+def test_adaptive_limiter_rejects_without_blocking():
+    limiter = AdaptiveLimiter(initial_limit=1)
+    assert limiter.acquire(block=False)
+    assert not limiter.acquire(block=False)
+    assert limiter.metrics()["rejected"] == 1
+
+
+def test_run_concurrently_respects_adaptive_limit():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=2)
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def work(item):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.01)
+        with lock:
+            state["running"] -= 1
+        return item
+
+    results = list(run_concurrently(work, range(20), max_workers=8, limiter=limiter))
+
+    assert sorted(outcome.result for outcome in results) == list(range(20))
+    assert state["peak"] <= 2
+    assert limiter.in_flight == 0
+
+
+@responses.activate
+def test_adaptive_limiter_is_used_by_bulk_helpers():
+    url = "http://{ip}:{port}/v1/job/".format(ip=common.IP, port=common.NOMAD_PORT)
+    responses.add(responses.GET, url + "a", status=200, json={"ID": "a"})
+    responses.add(responses.GET, url + "b", status=429)
+    limiter = AdaptiveLimiter(initial_limit=4)
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, concurrency_limiter=limiter)
+
+    outcomes = list(n.jobs.hydrate([{"ID": "a"}, {"ID": "b"}]))
+
+    assert len(outcomes) == 2
+    assert limiter.limit < 4
+
+
+@responses.activate
+def test_nested_helpers_do_not_deadlock_on_shared_limiter():
+    url = "http://{ip}:{port}/v1/job/".format(ip=common.IP, port=common.NOMAD_PORT)
+    for job_id in ("a", "b"):
+        responses.add(responses.GET, url + job_id, status=200, json={"ID": job_id})
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, concurrency_limiter=limiter)
+    outcomes = []
+
+    def run():
+        outcomes.extend(n.fan_out(lambda c: list(c.jobs.hydrate([{"ID": "a"}, {"ID": "b"}]))))
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    worker.join(5)
+
+    assert not worker.is_alive()
+    assert outcomes[0].error is None
+    assert sorted(outcome.result["ID"] for outcome in outcomes[0].result) == ["a", "b"]
+    assert limiter.in_flight == 0
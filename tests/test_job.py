@@ -1,5 +1,8 @@
+import base64
 import json
 import os
+import re
+import time
 import uuid
 
 import pytest
@@ -202,3 +205,163 @@ def test_delete_job_with_purge(nomad_setup):
 
     # Reregister job
     test_register_job(nomad_setup)
+
+
+def _dispatch_callback(request):
+    body = json.loads(request.body)
+    return (200, {}, json.dumps({"DispatchedJobID": "batch/dispatch-1", "EvalID": "eval", "Request": body, "URL": request.url}))
+
+
+@responses.activate
+def test_dispatch_job_encodes_bytes_and_sends_idempotency_token(nomad_setup):
+    responses.add_callback(
+        responses.POST,
+        "http://{ip}:{port}/v1/job/batch/dispatch".format(ip=common.IP, port=common.NOMAD_PORT),
+        callback=_dispatch_callback,
+    )
+    result = nomad_setup.job.dispatch_job("batch", payload=b"\x00binary", idempotency_token="token-1")
+
+    assert result["Request"]["Payload"] == "AGJpbmFyeQ=="
+    assert "idempotency_token=token-1" in result["URL"]
+
+
+def test_dispatch_job_payload_limit(nomad_setup, tmp_path):
+    big = tmp_path / "payload"
+    big.write_bytes(b"x" * (16 * 1024 + 1))
+
+    with pytest.raises(nomad.api.exceptions.InvalidParameters):
+        nomad_setup.job.dispatch_job("batch", payload=b"x" * (16 * 1024 + 1))
+    with big.open("rb") as payload, pytest.raises(nomad.api.exceptions.InvalidParameters):
+        nomad_setup.job.dispatch_job("batch", payload=payload)
+    with pytest.raises(nomad.api.exceptions.InvalidParameters):
+        nomad_setup.job.dispatch_job("batch", payload=base64.b64encode(b"x" * (16 * 1024 + 1)).decode())
+
+    for size in (16 * 1024, 16 * 1024 - 1, 16 * 1024 - 2):
+        encoded = base64.b64encode(b"x" * size).decode()
+        assert nomad.api.job._encode_payload(encoded) == encoded
+
+
+@responses.activate
+def test_dispatch_jobs(nomad_setup, tmp_path):
+    responses.add_callback(
+        responses.POST,
+        "http://{ip}:{port}/v1/job/batch/dispatch".format(ip=common.IP, port=common.NOMAD_PORT),
+        callback=_dispatch_callback,
+    )
+    small = tmp_path / "payload"
+    small.write_bytes(b"file")
+    meter = nomad.api.concurrency.Meter()
+
+    with small.open("rb") as payload:
+        dispatches = [{"payload": payload}, {"payload": b"x" * (16 * 1024 + 1)}, {"meta": {"a": "b"}, "idempotency_token": "t"}]
+        outcomes = list(nomad_setup.job.dispatch_jobs("batch", dispatches, max_workers=2, meter=meter))
+
+    assert len(responses.calls) == 2
+    assert meter.succeeded == 2
+    assert meter.failed == 1
+    assert all(outcome.item["idempotency_token"] for outcome in outcomes)
+    assert sum(isinstance(o.error, nomad.api.exceptions.InvalidParameters) for o in outcomes) == 1
+    assert any(o.result and o.result["Request"]["Payload"] == "ZmlsZQ==" for o in outcomes)
+
+
+def _log_frame(offset, data):
+    return json.dumps({"Offset": offset, "Data": base64.b64encode(data).decode()})
+
+
+@responses.activate
+def test_tail_logs_merges_allocations(nomad_setup):
+    allocations_url = "http://{ip}:{port}/v1/job/web/allocations".format(ip=common.IP, port=common.NOMAD_PORT)
+    logs_url = "http://{ip}:{port}/v1/client/fs/logs/".format(ip=common.IP, port=common.NOMAD_PORT)
+    responses.add(
+        responses.GET, allocations_url, status=200, headers={"X-Nomad-Index": "5"},
+        json=[
+            {"ID": "a1", "ClientStatus": "running", "TaskStates": {"web": {}}},
+            {"ID": "a2", "ClientStatus": "complete", "TaskStates": {"web": {}}},
+            {"ID": "a3", "ClientStatus": "running", "TaskStates": {"sidecar": {}}},
+        ],
+    )
+    responses.add(responses.GET, logs_url + "a1", status=200, body=_log_frame(6, b"one\ntw") + _log_frame(8, b"o\n"))
+    responses.add(responses.GET, logs_url + "a2", status=200, body=_log_frame(4, b"end"))
+
+    with nomad_setup.job.tail_logs("web", "web", types=("stdout",), follow=False) as logs:
+        chunks = sorted(logs)
+
+    assert chunks == [
+        ("a1", "stdout", 0, b"one\n"),
+        ("a1", "stdout", 4, b"two\n"),
+        ("a2", "stdout", 1, b"end"),
+    ]
+    assert all("origin=start" in call.request.url for call in responses.calls if "/logs/" in call.request.url)
+
+
+@responses.activate
+def test_tail_logs_follows_new_allocations(nomad_setup):
+    allocations_url = "http://{ip}:{port}/v1/job/web/allocations".format(ip=common.IP, port=common.NOMAD_PORT)
+    logs_url = re.compile(r"http://.*/v1/client/fs/logs/(a\d)\?.*")
+    states = iter([
+        [{"ID": "a1", "ClientStatus": "running"}],
+        [{"ID": "a1", "ClientStatus": "complete"}, {"ID": "a2", "ClientStatus": "running"}],
+    ])
+
+    def allocations(request):
+        time.sleep(0.05)
+        body = next(states, [{"ID": "a1", "ClientStatus": "complete"}, {"ID": "a2", "ClientStatus": "running"}])
+        return 200, {"X-Nomad-Index": "7"}, json.dumps(body)
+
+    def logs(request):
+        alloc_id = logs_url.match(request.url).group(1)
+        if "offset=0" in request.url:
+            return 200, {}, _log_frame(6, alloc_id.encode() + b"-up\n")
+        time.sleep(0.05)
+        return 200, {}, ""
+
+    responses.add_callback(responses.GET, allocations_url, callback=allocations)
+    responses.add_callback(responses.GET, logs_url, callback=logs)
+
+    seen = set()
+    with nomad_setup.job.tail_logs("web", "web", types=("stderr",)) as tail:
+        for chunk in tail:
+            seen.add((chunk.alloc_id, chunk.data))
+            if len(seen) == 2:
+                break
+        deadline = time.monotonic() + 5
+        while tail.attached != ["a2"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert tail.attached == ["a2"]
+
+    assert seen == {("a1", b"a1-up\n"), ("a2", b"a2-up\n")}
+
+
+class _FakeLogResponse():
+    def __init__(self, body):
+        self.body = body
+        self.url = "fake"
+
+    def iter_content(self, chunk_size):
+        if self.body:
+            yield self.body
+
+    def close(self):
+        pass
+
+
+def test_log_multiplexer_keeps_origin_until_data():
+    bodies = iter([b"", b"", _log_frame(1004, b"new\n").encode()])
+    opened = []
+
+    def open_stream(alloc_id, _type, offset, origin):
+        opened.append((offset, origin))
+        return nomad.api.FrameStream(_FakeLogResponse(next(bodies, b"")), offset=offset)
+
+    allocations = [{"ID": "a1", "ClientStatus": "running"}]
+    logs = nomad.api.LogMultiplexer(
+        lambda index: (allocations, 1), open_stream, "web", types=("stdout",), origin="end", retry_delay=0.01
+    )
+    with logs:
+        chunk = next(iter(logs))
+        deadline = time.monotonic() + 5
+        while len(opened) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert chunk == ("a1", "stdout", 1000, b"new\n")
+    assert opened[:4] == [(0, "end"), (0, "end"), (0, "end"), (1004, "start")]
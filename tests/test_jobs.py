@@ -2,6 +2,8 @@ import os
 import pytest
 import json
 import responses
+
+import nomad
 import tests.common as common
 
 
@@ -123,4 +125,103 @@ def test_get_jobs_with_namespace_override_namespace_declared_on_create(nomad_set
         json=[{"Region": "global","ID": "my-job", "ParentID": "", "Name": "my-job","Namespace": common.NOMAD_NAMESPACE, "Type": "batch", "Priority": 50}]
     )
 
-    nomad_setup_with_namespace.jobs.get_jobs(namespace="override-namespace")
\ No newline at end of file
+    nomad_setup_with_namespace.jobs.get_jobs(namespace="override-namespace")
+
+def _register_callback(request):
+    payload = json.loads(request.body)
+    if payload["Job"].get("ID") in (None, "broken"):
+        return (400, {}, "invalid job")
+    return (200, {}, json.dumps({"EvalID": "eval-" + payload["Job"]["ID"], "Warnings": "", "Payload": payload}))
+
+
+@responses.activate
+def test_register_jobs_reports_each_job(nomad_setup):
+    responses.add_callback(
+        responses.POST,
+        "http://{ip}:{port}/v1/jobs".format(ip=common.IP, port=common.NOMAD_PORT),
+        callback=_register_callback,
+    )
+    jobs = ({"Job": {"ID": job_id}} for job_id in ["a", "broken", "b", "c"])
+
+    outcomes = {outcome.item: outcome for outcome in nomad_setup.jobs.register_jobs(jobs, max_workers=2)}
+
+    assert set(outcomes) == {"a", "broken", "b", "c"}
+    assert outcomes["a"].result["EvalID"] == "eval-a"
+    assert outcomes["a"].error is None
+    assert isinstance(outcomes["broken"].error, BaseNomadException)
+
+
+@responses.activate
+def test_register_jobs_reports_job_without_id(nomad_setup):
+    responses.add_callback(
+        responses.POST,
+        "http://{ip}:{port}/v1/jobs".format(ip=common.IP, port=common.NOMAD_PORT),
+        callback=_register_callback,
+    )
+    malformed = {"Job": {"Name": "no-id"}}
+
+    outcomes = list(nomad_setup.jobs.register_jobs([{"Job": {"ID": "a"}}, malformed, {"Job": {"ID": "b"}}]))
+
+    assert len(outcomes) == 3
+    failed = [outcome for outcome in outcomes if outcome.error is not None]
+    assert [outcome.item for outcome in failed] == [malformed]
+    assert sorted(outcome.item for outcome in outcomes if outcome.error is None) == ["a", "b"]
+
+
+@responses.activate
+def test_register_jobs_fail_fast(nomad_setup):
+    responses.add_callback(
+        responses.POST,
+        "http://{ip}:{port}/v1/jobs".format(ip=common.IP, port=common.NOMAD_PORT),
+        callback=_register_callback,
+    )
+    jobs = [{"Job": {"ID": job_id}} for job_id in ["broken"] + ["job-{}".format(i) for i in range(10)]]
+
+    outcomes = list(nomad_setup.jobs.register_jobs(jobs, max_workers=1, fail_fast=True))
+
+    assert [outcome.item for outcome in outcomes] == ["broken"]
+
+
+@responses.activate
+def test_register_jobs_enforce_index(nomad_setup):
+    responses.add_callback(
+        responses.POST,
+        "http://{ip}:{port}/v1/jobs".format(ip=common.IP, port=common.NOMAD_PORT),
+        callback=_register_callback,
+    )
+    jobs = [{"Job": {"ID": "new"}}, {"Job": {"ID": "existing", "JobModifyIndex": 42}}]
+
+    outcomes = {o.item: o.result["Payload"] for o in nomad_setup.jobs.register_jobs(jobs, enforce_index=True)}
+
+    assert outcomes["new"]["EnforceIndex"] is True
+    assert outcomes["new"]["JobModifyIndex"] == 0
+    assert outcomes["existing"]["JobModifyIndex"] == 42
+
+
+@responses.activate
+def test_hydrate_jobs(nomad_setup):
+    base = "http://{ip}:{port}/v1".format(ip=common.IP, port=common.NOMAD_PORT)
+    for job_id in ["a", "b"]:
+        responses.add(responses.GET, base + "/job/{}?namespace=default".format(job_id), status=200,
+                      json={"ID": job_id, "ModifyIndex": 5, "TaskGroups": []})
+    stubs = [{"ID": "a", "Namespace": "default", "ModifyIndex": 5}] * 3 + [{"ID": "b", "Namespace": "default", "ModifyIndex": 5}]
+
+    outcomes = list(nomad_setup.jobs.hydrate(stubs, max_workers=4))
+
+    assert sorted(outcome.result["ID"] for outcome in outcomes) == ["a", "b"]
+    assert all("TaskGroups" in outcome.result for outcome in outcomes)
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_hydrate_jobs_uses_cache(nomad_setup, tmp_path):
+    base = "http://{ip}:{port}/v1".format(ip=common.IP, port=common.NOMAD_PORT)
+    responses.add(responses.GET, base + "/job/a?namespace=default", status=200, json={"ID": "a", "ModifyIndex": 5})
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, verify=False, cache=nomad.api.DiskCache(path=str(tmp_path)))
+
+    list(n.jobs.hydrate([{"ID": "a", "Namespace": "default", "ModifyIndex": 5}]))
+    list(n.jobs.hydrate([{"ID": "a", "Namespace": "default", "ModifyIndex": 5}]))
+    assert len(responses.calls) == 1
+
+    list(n.jobs.hydrate([{"ID": "a", "Namespace": "default", "ModifyIndex": 6}]))
+    assert len(responses.calls) == 2
@@ -1,7 +1,13 @@
+import json
 import os
+import re
 import pytest
+import requests
+import responses
 import uuid
 
+import nomad
+import tests.common as common
 from nomad.api import exceptions as nomad_exceptions
 
 
@@ -92,3 +98,90 @@ def test_dunder_getattr(nomad_setup):
 
     with pytest.raises(AttributeError):
         _ = nomad_setup.node.does_not_exist
+
+
+def _fake_fleet(node_ids):
+    """ Register responses simulating nodes which finish draining on the first blocking query """
+    state = {_id: {"ID": _id, "ModifyIndex": 10, "DrainStrategy": None, "SchedulingEligibility": "eligible"}
+             for _id in node_ids}
+    base = "http://{ip}:{port}/v1/node/".format(ip=common.IP, port=common.NOMAD_PORT)
+
+    def drain(request):
+        _id = request.url[len(base):].split("/")[0]
+        state[_id].update(DrainStrategy=json.loads(request.body)["DrainSpec"], SchedulingEligibility="ineligible")
+        state[_id]["ModifyIndex"] += 1
+        return (200, {}, json.dumps({"NodeModifyIndex": state[_id]["ModifyIndex"]}))
+
+    def get(request):
+        _id = request.url[len(base):].split("?")[0]
+        if "index=" in request.url:
+            state[_id].update(DrainStrategy=None)
+            state[_id]["ModifyIndex"] += 1
+        return (200, {}, json.dumps(state[_id]))
+
+    def eligibility(request):
+        _id = request.url[len(base):].split("/")[0]
+        state[_id]["SchedulingEligibility"] = json.loads(request.body)["Eligibility"]
+        return (200, {}, "{}")
+
+    responses.add_callback(responses.POST, re.compile(base + ".*/drain"), callback=drain)
+    responses.add_callback(responses.POST, re.compile(base + ".*/eligibility"), callback=eligibility)
+    responses.add_callback(responses.GET, re.compile(base + "[^/]*$"), callback=get)
+    return state
+
+
+@responses.activate
+def test_wait_for_drain_uses_blocking_queries(nomad_setup):
+    _fake_fleet(["n1"])
+    response = nomad_setup.node.drain_node_with_spec("n1", {"Deadline": 1})
+
+    node = nomad_setup.node.wait_for_drain("n1", index=response["NodeModifyIndex"], wait=1)
+
+    assert node["DrainStrategy"] is None
+    assert "index=11" in responses.calls[-1].request.url
+    assert "wait=1s" in responses.calls[-1].request.url
+
+
+@responses.activate
+def test_drain_nodes_in_waves(nomad_setup):
+    stubs = [{"ID": "a1", "Datacenter": "a"}, {"ID": "a2", "Datacenter": "a"}, {"ID": "b1", "Datacenter": "b"}]
+    state = _fake_fleet([stub["ID"] for stub in stubs])
+
+    outcomes = list(nomad_setup.node.drain_nodes(stubs, wave_by="Datacenter", wave_percent=50, wait=1))
+
+    assert [outcome.error for outcome in outcomes] == [None, None, None]
+    assert sorted(outcome.item for outcome in outcomes[:2]) == ["a1", "a2"]
+    assert outcomes[2].item == "b1"
+    assert all(node["SchedulingEligibility"] == "eligible" for node in state.values())
+    assert all(node["DrainStrategy"] is None for node in state.values())
+
+
+def test_plan_waves():
+    stubs = [{"ID": str(i), "Datacenter": "dc{}".format(i % 2)} for i in range(6)]
+
+    assert nomad.api.node._plan_waves(stubs) == [["0", "1", "2", "3", "4", "5"]]
+    assert nomad.api.node._plan_waves(stubs, wave_by="Datacenter", wave_percent=50) == [
+        ["0", "2"], ["4"], ["1", "3"], ["5"]
+    ]
+
+
+@responses.activate
+def test_wait_for_drain_retries_timed_out_blocking_query(nomad_setup):
+    url = "http://{ip}:{port}/v1/node/n1".format(ip=common.IP, port=common.NOMAD_PORT)
+    draining = {"ID": "n1", "ModifyIndex": 11, "DrainStrategy": {"Deadline": 1}}
+    responses.add(responses.GET, url, status=200, json=draining)
+    responses.add(responses.GET, url, body=requests.exceptions.ReadTimeout("no change"))
+    responses.add(responses.GET, url, status=200, json=dict(draining, ModifyIndex=12, DrainStrategy=None))
+
+    node = nomad_setup.node.wait_for_drain("n1", index=11, wait=1)
+
+    assert node["DrainStrategy"] is None
+    assert len(responses.calls) == 3
+    assert all("index=11" in call.request.url for call in responses.calls[1:])
+
+
+def test_blocking_query_timeout_covers_jitter(nomad_setup):
+    params, timeout = nomad_setup.node._blocking_query(5, 300)
+
+    assert params == {"index": 5, "wait": "300s"}
+    assert timeout == 300 + 300 / 16 + nomad_setup.node.timeout
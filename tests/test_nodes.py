@@ -1,4 +1,7 @@
 import pytest
+import responses
+
+import tests.common as common
 
 
 # integration tests requires nomad Vagrant VM or Binary running
@@ -53,3 +56,15 @@ def test_dunder_iter(nomad_setup):
 
 def test_dunder_len(nomad_setup):
     assert len(nomad_setup.nodes) >= 0
+
+
+@responses.activate
+def test_hydrate_nodes(nomad_setup):
+    base = "http://{ip}:{port}/v1".format(ip=common.IP, port=common.NOMAD_PORT)
+    responses.add(responses.GET, base + "/nodes", status=200, json=[{"ID": "n1", "ModifyIndex": 3}])
+    responses.add(responses.GET, base + "/node/n1", status=200, json={"ID": "n1", "ModifyIndex": 3, "Attributes": {}})
+
+    outcomes = list(nomad_setup.nodes.hydrate())
+
+    assert outcomes[0].item == {"ID": "n1", "ModifyIndex": 3}
+    assert "Attributes" in outcomes[0].result
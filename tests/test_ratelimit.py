@@ -0,0 +1,73 @@
+import time
+
+import pytest
+import responses
+
+import nomad
+import tests.common as common
+from nomad.api import exceptions
+
+
+JOBS_URL = "http://{ip}:{port}/v1/jobs".format(ip=common.IP, port=common.NOMAD_PORT)
+DISPATCH_URL = "http://{ip}:{port}/v1/job/batch/dispatch".format(ip=common.IP, port=common.NOMAD_PORT)
+
+
+def _client(limiter):
+    return nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, rate_limiter=limiter)
+
+
+def test_rate_limiter_fail_fast_after_burst():
+    limiter = nomad.api.RateLimiter(rate=1, burst=2, block=False)
+    limiter.acquire("GET", "jobs")
+    limiter.acquire("GET", "jobs")
+
+    with pytest.raises(exceptions.RateLimitExceeded) as error:
+        limiter.acquire("GET", "jobs")
+    assert 0 < error.value.retry_after <= 1
+    assert limiter.rejected == 1
+
+
+def test_rate_limiter_blocks_until_refill():
+    limiter = nomad.api.RateLimiter(rate=20, burst=1)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire("GET", "jobs")
+
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_limiter_rules_match_family_and_method():
+    limiter = nomad.api.RateLimiter(rules={"job/*/dispatch": (1, 1), "DELETE *": (1, 1)}, block=False)
+    limiter.acquire("POST", "job/batch/dispatch")
+    limiter.acquire("GET", "job/batch")
+    limiter.acquire("DELETE", "job/batch")
+
+    with pytest.raises(exceptions.RateLimitExceeded):
+        limiter.acquire("POST", "job/other/dispatch")
+    with pytest.raises(exceptions.RateLimitExceeded):
+        limiter.acquire("DELETE", "allocation/1")
+    limiter.acquire("GET", "job/batch")
+
+
+def test_rate_limiter_is_all_or_nothing():
+    limiter = nomad.api.RateLimiter(rate=100, burst=2, rules={"job/*": (1, 1)}, block=False)
+    limiter.acquire("GET", "job/a")
+    with pytest.raises(exceptions.RateLimitExceeded):
+        limiter.acquire("GET", "job/b")
+
+    # the rejected request did not consume the global token
+    limiter.acquire("GET", "jobs")
+
+
+@responses.activate
+def test_rate_limiter_applies_to_client_requests():
+    responses.add(responses.GET, JOBS_URL, status=200, json=[])
+    responses.add(responses.POST, DISPATCH_URL, status=200, json={})
+    n = _client(nomad.api.RateLimiter(rules={"POST job/*/dispatch": (1, 1)}, block=False))
+
+    n.job.dispatch_job("batch")
+    with pytest.raises(exceptions.RateLimitExceeded):
+        n.job.with_token("other").dispatch_job("batch")
+    n.jobs.get_jobs()
+
+    assert len(responses.calls) == 2
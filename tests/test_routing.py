@@ -0,0 +1,145 @@
+import base64
+import http.server
+import json
+import threading
+
+import pytest
+import requests
+import responses
+import urllib3
+
+import nomad
+import tests.common as common
+
+
+SERVER = "http://{ip}:{port}/v1".format(ip=common.IP, port=common.NOMAD_PORT)
+AGENT = "http://10.0.0.5:4646/v1"
+
+
+def _client(router):
+    return nomad.Nomad(host=common.IP, port=common.NOMAD_PORT, client_router=router)
+
+
+def _add_lookups(status="ready"):
+    responses.add(responses.GET, SERVER + "/allocation/a1", status=200, json={"ID": "a1", "NodeID": "n1"})
+    responses.add(
+        responses.GET, SERVER + "/node/n1", status=200, json={"ID": "n1", "Status": status, "HTTPAddr": "10.0.0.5:4646"}
+    )
+
+
+@responses.activate
+def test_client_router_sends_to_client_agent():
+    _add_lookups()
+    responses.add(responses.GET, AGENT + "/client/fs/cat/a1", status=200, body="hello")
+    responses.add(responses.GET, AGENT + "/client/allocation/a1/stats", status=200, json={"ResourceUsage": {}})
+    responses.add(responses.GET, AGENT + "/client/stats", status=200, json={"CPU": []})
+    router = nomad.api.ClientRouter()
+    n = _client(router)
+
+    assert n.client.cat.read_file("a1", "/alloc/file") == "hello"
+    assert n.client.allocation.read_allocation_stats("a1") == {"ResourceUsage": {}}
+    assert n.client.stats.read_stats("n1") == {"CPU": []}
+
+    lookups = [call.request.url for call in responses.calls if call.request.url.startswith(SERVER)]
+    assert [url.split("?")[0] for url in lookups] == [SERVER + "/allocation/a1", SERVER + "/node/n1"]
+    assert router.fallbacks == 0
+
+
+@responses.activate
+def test_client_router_falls_back_to_servers():
+    _add_lookups()
+    responses.add(responses.GET, AGENT + "/client/fs/cat/a1", body=requests.exceptions.ConnectionError("refused"))
+    responses.add(responses.GET, SERVER + "/client/fs/cat/a1", status=200, body="forwarded")
+    router = nomad.api.ClientRouter(retry_after=60)
+    n = _client(router)
+
+    assert n.client.cat.read_file("a1", "/alloc/file") == "forwarded"
+    assert n.client.cat.read_file("a1", "/alloc/file") == "forwarded"
+
+    direct = [call for call in responses.calls if call.request.url.startswith(AGENT)]
+    assert len(direct) == 1
+    assert router.fallbacks == 1
+
+
+@responses.activate
+def test_client_router_does_not_resend_sent_posts():
+    _add_lookups()
+    aborted = requests.exceptions.ConnectionError(urllib3.exceptions.ProtocolError("Connection aborted."))
+    responses.add(responses.POST, AGENT + "/client/allocation/a1/restart", body=aborted)
+    responses.add(responses.POST, SERVER + "/client/allocation/a1/restart", status=200, json={})
+    router = nomad.api.ClientRouter()
+    n = _client(router)
+
+    with pytest.raises(nomad.api.exceptions.BaseNomadException):
+        n.client.allocation.restart_allocation("a1")
+
+    assert not [call for call in responses.calls if call.request.url.startswith(SERVER + "/client")]
+    assert router.fallbacks == 1
+
+
+@responses.activate
+def test_client_router_resends_posts_never_connected():
+    _add_lookups()
+    refused = requests.exceptions.ConnectionError(urllib3.exceptions.MaxRetryError(
+        None, AGENT, reason=urllib3.exceptions.NewConnectionError(None, "Connection refused")
+    ))
+    responses.add(responses.POST, AGENT + "/client/allocation/a1/restart", body=refused)
+    responses.add(responses.POST, SERVER + "/client/allocation/a1/restart", status=200, json={"Index": 3})
+    n = _client(nomad.api.ClientRouter())
+
+    assert n.client.allocation.restart_allocation("a1") == {"Index": 3}
+
+
+@responses.activate
+def test_client_router_skips_down_nodes_and_other_endpoints():
+    _add_lookups(status="down")
+    responses.add(responses.GET, SERVER + "/client/fs/cat/a1", status=200, body="forwarded")
+    responses.add(responses.GET, SERVER + "/jobs", status=200, json=[])
+    n = _client(nomad.api.ClientRouter())
+
+    assert n.client.cat.read_file("a1", "/alloc/file") == "forwarded"
+    assert n.jobs.get_jobs() == []
+    assert not [call for call in responses.calls if call.request.url.startswith(AGENT)]
+
+
+class _FrameHandler(http.server.BaseHTTPRequestHandler):
+    body = json.dumps({"Offset": 5, "Data": base64.b64encode(b"hello").decode()}).encode()
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def client_agent():
+    server = http.server.HTTPServer(("127.0.0.1", 0), _FrameHandler)
+    server.paths = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@responses.activate
+def test_client_router_streams_with_read_timeout(client_agent):
+    address = "127.0.0.1:{}".format(client_agent.server_port)
+    # the direct request goes through the real transport, which validates the timeout
+    responses.add_passthru("http://" + address)
+    responses.add(responses.GET, SERVER + "/allocation/a1", status=200, json={"ID": "a1", "NodeID": "n1"})
+    responses.add(responses.GET, SERVER + "/node/n1", status=200, json={"ID": "n1", "Status": "ready", "HTTPAddr": address})
+    router = nomad.api.ClientRouter()
+    n = _client(router)
+
+    chunks = list(n.client.stream_file.iter_file("a1", 0, "start", path="/alloc/file", timeout=(5, 10)))
+    followed = list(n.client.stream_logs.iter_logs("a1", "web", "stdout", follow=True))
+
+    assert chunks == [(0, b"hello")] and followed == [(0, b"hello")]
+    assert [path.split("?")[0] for path in client_agent.paths] == ["/v1/client/fs/stream/a1", "/v1/client/fs/logs/a1"]
+    assert router.fallbacks == 0
@@ -0,0 +1,112 @@
+import concurrent.futures
+import gc
+import json
+import os
+import re
+
+import pytest
+import requests
+import responses
+
+import nomad
+import tests.common as common
+
+
+JOB_URL = re.compile(r"http://{ip}:{port}/v1/job/.*".format(ip=re.escape(common.IP), port=common.NOMAD_PORT))
+
+
+def _echo(request):
+    job_id = request.path_url.split("?")[0].split("/")[-1]
+    return 200, {}, json.dumps({"ID": job_id, "Token": request.headers.get("X-Nomad-Token")})
+
+
+@responses.activate
+def test_session_pool_no_response_mixups_under_load():
+    responses.add_callback(responses.GET, JOB_URL, callback=_echo)
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT)
+
+    def query(i):
+        job = n.job.with_token(f"token-{i}").get_job(f"job-{i}")
+        return job == {"ID": f"job-{i}", "Token": f"token-{i}"}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=64) as executor:
+        results = list(executor.map(query, range(2000)))
+
+    assert all(results)
+    assert n.session.created <= 64
+    assert n.session.created == len(n.session._idle)
+
+
+@responses.activate
+def test_session_pool_reuses_sessions_across_threads():
+    responses.add_callback(responses.GET, JOB_URL, callback=_echo)
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT)
+
+    for _ in range(3):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda i: n.job.get_job(f"job-{i}"), range(8)))
+
+    assert n.session.created <= 4
+
+
+def test_session_pool_is_shared_by_default():
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT)
+
+    assert isinstance(n.session, nomad.api.SessionPool)
+    assert n.jobs.session is n.with_token("other").job.session
+
+
+def test_session_pool_resets_in_forked_child():
+    pool = nomad.api.SessionPool()
+    session = pool._checkout()
+    pool._checkin(session)
+    pool._pid = -1  # as seen from a forked child
+
+    assert pool._checkout() is not session
+    assert pool.created == 2
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork")
+def test_session_pool_after_fork():
+    pool = nomad.api.SessionPool()
+    pool._checkin(pool._checkout())
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        os.write(write_fd, str(len(pool._idle)).encode())
+        os._exit(0)
+
+    os.close(write_fd)
+    child_idle = os.read(read_fd, 16).decode()
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+
+    assert child_idle == "0"
+    assert len(pool._idle) == 1
+
+
+def test_session_pools_do_not_accumulate_fork_hooks():
+    from nomad.api import sessions
+
+    gc.collect()
+    before = len(sessions._POOLS)
+    pools = [nomad.api.SessionPool() for _ in range(100)]
+    assert len(sessions._POOLS) == before + 100
+
+    del pools
+    gc.collect()
+    assert len(sessions._POOLS) == before
+
+
+def test_session_can_be_replaced():
+    n = nomad.Nomad(host=common.IP, port=common.NOMAD_PORT)
+    assert isinstance(n.jobs.session, nomad.api.SessionPool)
+
+    session = requests.Session()
+    n.session = session
+
+    assert n.session is session
+    assert n.jobs.session is session
+    assert n.with_token("other").job.session is session
@@ -1,5 +1,11 @@
 import pytest
 import os
+import io
+import json
+
+import responses
+
+import tests.common as common
 
 @pytest.mark.skipif(tuple(int(i) for i in os.environ.get("NOMAD_VERSION").split(".")) < (1, 4, 0), reason="Not supported in version")
 def test_get_variables(nomad_setup):
@@ -52,4 +58,54 @@ def test_variables_getitem_not_exist(nomad_setup):
 @pytest.mark.skipif(tuple(int(i) for i in os.environ.get("NOMAD_VERSION").split(".")) < (1, 4, 0), reason="Not supported in version")
 def test_variables_getattr(nomad_setup):
     with pytest.raises(AttributeError):
-        nomad_setup.variables.does_not_exist
\ No newline at end of file
+        nomad_setup.variables.does_not_exist
+
+def _variable_url(path):
+    return "http://{ip}:{port}/v1/var/{path}".format(ip=common.IP, port=common.NOMAD_PORT, path=path)
+
+
+@responses.activate
+def test_export_variables_writes_ndjson(nomad_setup):
+    responses.add(
+        responses.GET, "http://{ip}:{port}/v1/vars".format(ip=common.IP, port=common.NOMAD_PORT), status=200,
+        json=[{"Namespace": "default", "Path": "app/a"}, {"Namespace": "default", "Path": "app/b"}],
+    )
+    responses.add(responses.GET, _variable_url("app/a"), status=200,
+                  json={"Namespace": "default", "Path": "app/a", "ModifyIndex": 3, "Items": {"k": "a"}})
+    responses.add(responses.GET, _variable_url("app/b"), status=404)
+
+    out = io.StringIO()
+    report = nomad_setup.variables.export_variables(out, prefix="app/")
+
+    assert report["exported"] == 1
+    assert list(report["failed"]) == ["app/b"]
+    assert [json.loads(line)["Items"] for line in out.getvalue().splitlines()] == [{"k": "a"}]
+
+
+@responses.activate
+def test_import_variables_reports_outcomes(nomad_setup):
+    responses.add(responses.GET, _variable_url("app/same"), status=200,
+                  json={"Path": "app/same", "ModifyIndex": 5, "Items": {"k": "v"}})
+    responses.add(responses.GET, _variable_url("app/new"), status=404)
+    responses.add(responses.GET, _variable_url("app/old"), status=200,
+                  json={"Path": "app/old", "ModifyIndex": 7, "Items": {"k": "old"}})
+    responses.add(responses.GET, _variable_url("app/raced"), status=200,
+                  json={"Path": "app/raced", "ModifyIndex": 9, "Items": {"k": "old"}})
+    responses.add(responses.PUT, _variable_url("app/new"), status=200, json={})
+    responses.add(responses.PUT, _variable_url("app/old"), status=200, json={})
+    responses.add(responses.PUT, _variable_url("app/raced"), status=409, json={})
+
+    lines = [
+        {"Namespace": "default", "Path": path, "Items": {"k": "v"}}
+        for path in ("app/same", "app/new", "app/old", "app/raced")
+    ]
+    report = nomad_setup.variables.import_variables(io.StringIO("\n".join(json.dumps(line) for line in lines)))
+
+    assert report["unchanged"] == ["app/same"]
+    assert report["created"] == ["app/new"]
+    assert report["updated"] == ["app/old"]
+    assert report["conflicts"] == ["app/raced"]
+    assert not report["failed"]
+    puts = {call.request.url.split("?")[0]: call.request.url for call in responses.calls if call.request.method == "PUT"}
+    assert "cas=0" in puts[_variable_url("app/new")]
+    assert "cas=7" in puts[_variable_url("app/old")]
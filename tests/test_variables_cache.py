@@ -0,0 +1,76 @@
+import pytest
+import responses
+
+import nomad
+import tests.common as common
+from nomad.api import exceptions
+
+
+VAR_URL = "http://{ip}:{port}/v1/var/app/config".format(ip=common.IP, port=common.NOMAD_PORT)
+VARS_URL = "http://{ip}:{port}/v1/vars".format(ip=common.IP, port=common.NOMAD_PORT)
+
+
+def _variable(modify_index, **items):
+    return {"Namespace": "default", "Path": "app/config", "ModifyIndex": modify_index, "Items": items}
+
+
+@responses.activate
+def test_variables_cache_reads_locally(nomad_setup):
+    responses.add(responses.GET, VAR_URL, status=200, json=_variable(10, debug="true"))
+    cache = nomad.api.VariablesCache(nomad_setup, prefix="app/")
+
+    assert cache["app/config"]["Items"]["debug"] == "true"
+    assert cache.get("app/config")["ModifyIndex"] == 10
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_variables_cache_refresh_drops_changed_paths(nomad_setup):
+    responses.add(responses.GET, VAR_URL, status=200, json=_variable(10, debug="true"))
+    responses.add(
+        responses.GET, VARS_URL, status=200, headers={"X-Nomad-Index": "11"},
+        json=[{"Path": "app/config", "ModifyIndex": 11}],
+    )
+    cache = nomad.api.VariablesCache(nomad_setup, prefix="app/")
+    cache.get("app/config")
+
+    assert cache.refresh() == 11
+    responses.replace(responses.GET, VAR_URL, status=200, json=_variable(11, debug="false"))
+    assert cache.get("app/config")["Items"]["debug"] == "false"
+
+
+@responses.activate
+def test_variables_cache_blocking_refresh_sends_index(nomad_setup):
+    responses.add(responses.GET, VARS_URL, status=200, headers={"X-Nomad-Index": "11"}, json=[])
+    cache = nomad.api.VariablesCache(nomad_setup, prefix="app/", wait=1)
+    cache.refresh()
+    cache.refresh(block=True)
+
+    assert "index=11" in responses.calls[1].request.url
+    assert "wait=1s" in responses.calls[1].request.url
+
+
+@responses.activate
+def test_variables_cache_put_uses_cached_modify_index(nomad_setup):
+    responses.add(responses.GET, VAR_URL, status=200, json=_variable(10, debug="true"))
+    responses.add(responses.PUT, VAR_URL + "?cas=10", status=200, json=_variable(12, debug="false"))
+    cache = nomad.api.VariablesCache(nomad_setup, prefix="app/")
+    cache.get("app/config")
+
+    cache.put("app/config", {"debug": "false"})
+    assert cache.get("app/config")["ModifyIndex"] == 12
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_variables_cache_conflict_refetches_path(nomad_setup):
+    responses.add(responses.PUT, VAR_URL + "?cas=0", status=409, json=_variable(15, debug="true"))
+    responses.add(responses.GET, VAR_URL, status=200, json=_variable(15, debug="true"))
+    cache = nomad.api.VariablesCache(nomad_setup, prefix="app/")
+
+    with pytest.raises(exceptions.VariableConflict):
+        cache.put("app/config", {"debug": "false"})
+
+    assert cache.get("app/config")["ModifyIndex"] == 15
+    responses.add(responses.PUT, VAR_URL + "?cas=15", status=200, json=_variable(16, debug="false"))
+    assert cache.put("app/config", {"debug": "false"})["ModifyIndex"] == 16